@@ -2,9 +2,13 @@ import asyncio
 import collections.abc
 import json
 import logging
+import os
+import re
+import time
 from typing import Optional
 
 import bspump.asab as asab
+import bspump.asab.proactor as proactor
 
 from .lookupprovider import LookupProviderABC
 
@@ -14,6 +18,49 @@ L = logging.getLogger(__name__)
 
 ###
 
+_JSONDecoder = json.JSONDecoder()
+_Whitespace = re.compile(r"[ \t\n\r]*")
+_missing = object()
+
+
+def iter_json_object(text):
+    """
+    Description: Yields (key, value) pairs of a JSON object one by one, instead of building it at once.
+
+    Parsing in a thread this way lets the event loop run between the items.
+
+    |
+
+    """
+    decode = _JSONDecoder.raw_decode
+    skip = _Whitespace.match
+
+    pos = skip(text, 0).end()
+    if text[pos : pos + 1] != "{":
+        raise ValueError("Expecting a JSON object")
+    pos = skip(text, pos + 1).end()
+    if text[pos : pos + 1] == "}":
+        return
+
+    while True:
+        if text[pos : pos + 1] != '"':
+            raise ValueError("Expecting a key at {}".format(pos))
+        key, pos = decode(text, pos)
+        pos = skip(text, pos).end()
+        if text[pos : pos + 1] != ":":
+            raise ValueError("Expecting ':' at {}".format(pos))
+        pos = skip(text, pos + 1).end()
+        value, pos = decode(text, pos)
+        yield key, value
+
+        pos = skip(text, pos).end()
+        delimiter = text[pos : pos + 1]
+        if delimiter == "}":
+            return
+        if delimiter != ",":
+            raise ValueError("Expecting ',' or '}}' at {}".format(pos))
+        pos = skip(text, pos + 1).end()
+
 
 class Lookup(asab.Configurable):
     """
@@ -37,6 +84,8 @@ class Lookup(asab.Configurable):
         "master_lookup_id": "",  # If not empty, it specify the lookup id that will be used for loading from master
     }
 
+    DeltaSupported = False
+
     def __init__(self, app, id=None, config=None, lazy=False):
         """
         Description:
@@ -53,6 +102,16 @@ class Lookup(asab.Configurable):
 
         self.MasterURL = None
         self.Provider: Optional[LookupProviderABC] = None
+        self.Version = None
+
+        self.OffLoopDuration = 0.0
+        self.OnLoopDuration = 0.0
+        metrics_service = app.get_service("asab.MetricsService")
+        self.LoadGauge = metrics_service.create_gauge(
+            "lookup.load",
+            tags={"lookup": self.Id},
+            init_values={"duration": 0.0, "offloop": 0.0, "onloop": 0.0},
+        )
 
         url = self.Config.get("source_url", "").strip()
         if len(url) == 0:
@@ -158,16 +217,88 @@ class Lookup(asab.Configurable):
 
     async def load(self) -> bool:
         """
-        Description:
+        Description: Loads the data from the provider.
+
+        A slave lookup that supports deltas (see `apply_delta()`) obtains only changes since its `Version`,
+        if the provider has them.
 
         """
+        delta_supported = self.DeltaSupported and not self.is_master()
+        if delta_supported and self.Version is not None:
+            delta = await self.Provider.load_delta(self.Version)
+            if delta is not None:
+                if len(delta["upserts"]) == 0 and len(delta["deletes"]) == 0:
+                    self.Version = delta["version"]
+                    return False
+                self.apply_delta(delta)
+                return True
+
         data = await self.Provider.load()
         if data is None or data is False:
             L.warning("No data loaded from {}.".format(self.Provider.Id))
             return False
-        self.deserialize(data)
+
+        self.OffLoopDuration = 0.0
+        self.OnLoopDuration = 0.0
+        start = time.perf_counter()
+        await self.deserialize_async(data)
+        self.LoadGauge.set("duration", time.perf_counter() - start)
+        self.LoadGauge.set("offloop", self.OffLoopDuration)
+        self.LoadGauge.set("onloop", self.OnLoopDuration)
+
+        if delta_supported:
+            self.Version = self.Provider.Version
         return True
 
+    async def deserialize_async(self, data):
+        """
+        Description: Deserializes the data loaded by `load()`.
+        Lookups with large data should override it to build the data off the event loop (see `execute_off_loop()`)
+        and swap them in at once, the default calls `deserialize()` on the loop.
+        The time spent on the loop is reported by the "onloop" value of the "lookup.load" metric.
+
+        |
+
+        """
+        self.execute_on_loop(self.deserialize, data)
+
+    def execute_on_loop(self, func, *args):
+        """
+        Description: Executes `func(*args)` and adds its duration to the "onloop" value of the "lookup.load" metric.
+
+        :return: result of the call
+
+        |
+
+        """
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.OnLoopDuration += time.perf_counter() - start
+
+    async def execute_off_loop(self, func, *args):
+        """
+        Description: Executes `func(*args)` in the thread pool of the ProactorService.
+        The time spent there is reported by the "offloop" value of the "lookup.load" metric.
+
+        :return: result of the call
+
+        |
+
+        """
+        self.App.add_module(proactor.Module)
+        proactor_service = self.App.get_service("asab.ProactorService")
+
+        def timed():
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.OffLoopDuration += time.perf_counter() - start
+
+        return await proactor_service.execute(timed)
+
     def serialize(self):
         """
         Description:
@@ -188,6 +319,18 @@ class Lookup(asab.Configurable):
             "Lookup '{}' deserialize() method not implemented".format(self.Id)
         )
 
+    def apply_delta(self, delta):
+        """
+        Description: Applies changes obtained by `LookupProviderABC.load_delta()` in place
+        and sets `Version` to the version of the delta. Lookups that implement it set `DeltaSupported`.
+
+        |
+
+        """
+        raise NotImplementedError(
+            "Lookup '{}' apply_delta() method not implemented".format(self.Id)
+        )
+
     def rest_get(self):
         """
         Description:
@@ -199,6 +342,8 @@ class Lookup(asab.Configurable):
             response["ETag"] = self.Provider.ETag
         if self.MasterURL is not None:
             response["MasterURL"] = self.MasterURL
+        if self.Version is not None:
+            response["Version"] = self.Version
         return response
 
     def is_master(self):
@@ -226,20 +371,147 @@ class MappingLookup(Lookup, collections.abc.Mapping):
 
 class AsyncLookupMixin(Lookup):
     """
-    Description:
+    Description: Lookup that obtains values asynchronously, typically from a database.
+
+    Values that are not cached should be obtained by `fetch()`.
+    Concurrent fetches of the same key share one query, so that only one query per key is outstanding.
+    If "batch_window" is set and the lookup implements `_find_many()`, keys fetched during the window
+    are obtained by a single query of up to "batch_size" keys.
 
     """
 
+    ConfigDefaults = {
+        "batch_window": 0,  # Seconds to collect keys for a single query, 0 disables batching
+        "batch_size": 100,  # Maximum number of keys in a single query
+    }
+
+    def __init__(self, app, id=None, config=None, lazy=False):
+        super().__init__(app, id=id, config=config, lazy=lazy)
+        self.BatchWindow = float(self.Config["batch_window"])
+        self.BatchSize = int(self.Config["batch_size"])
+
+        self.InFlight = {}  # Key -> future of the outstanding query
+        self.PendingKeys = []
+        self.BatchHandle = None
+
+        metrics_service = app.get_service("asab.MetricsService")
+        self.FetchCounter = metrics_service.create_counter(
+            "lookup.fetch",
+            tags={"lookup": self.Id},
+            init_values={"query": 0, "key": 0, "coalesced": 0},
+        )
+        self.BatchHistogram = metrics_service.create_histogram(
+            "lookup.batch",
+            buckets=[1, 2, 5, 10, 20, 50, 100, 200, 500, 1000],
+            tags={"lookup": self.Id},
+        )
+
     async def get(self, key):
         raise NotImplementedError()
 
+    async def _find_one(self, key):
+        raise NotImplementedError()
+
+    async def _find_many(self, keys):
+        """
+        Override this method to obtain many keys by a single query.
+
+        :return: dictionary of found values by their keys, missing keys are not found
+        """
+        raise NotImplementedError()
+
+    async def _fetch_one(self, key):
+        return await self._find_one(key)
+
+    def _batching(self):
+        return (
+            self.BatchWindow > 0
+            and type(self)._find_many is not AsyncLookupMixin._find_many
+        )
+
+    async def fetch(self, key):
+        """
+        Obtains the value of the `key` by a query, that is shared with concurrent fetches of the same key.
+
+        :return: value or None if not found
+        """
+        future = self.InFlight.get(key)
+        if future is not None:
+            self.FetchCounter.add("coalesced", 1)
+            return await asyncio.shield(future)
+
+        batching = self._batching()
+        if batching:
+            future = self.Loop.create_future()
+        else:
+            future = asyncio.ensure_future(self._fetch_one(key))
+            self.FetchCounter.add("query", 1)
+            self.FetchCounter.add("key", 1)
+
+        self.InFlight[key] = future
+        future.add_done_callback(lambda f: self._on_fetched(key, f))
+
+        if batching:
+            self.PendingKeys.append(key)
+            if len(self.PendingKeys) >= self.BatchSize:
+                self._flush_batch()
+            elif self.BatchHandle is None:
+                self.BatchHandle = self.Loop.call_later(
+                    self.BatchWindow, self._flush_batch
+                )
+
+        return await asyncio.shield(future)
+
+    def _on_fetched(self, key, future):
+        if self.InFlight.get(key) is future:
+            del self.InFlight[key]
+        if not future.cancelled():
+            # The exception is delivered to waiters, if there are any
+            future.exception()
+
+    def _flush_batch(self):
+        if self.BatchHandle is not None:
+            self.BatchHandle.cancel()
+            self.BatchHandle = None
+
+        keys = self.PendingKeys
+        self.PendingKeys = []
+        if len(keys) > 0:
+            futures = {key: self.InFlight[key] for key in keys}
+            asyncio.ensure_future(self._fetch_many(futures))
+
+    async def _fetch_many(self, futures):
+        self.FetchCounter.add("query", 1)
+        self.FetchCounter.add("key", len(futures))
+        self.BatchHistogram.set("size", len(futures))
+        try:
+            values = await self._find_many(list(futures.keys()))
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in futures.items():
+            if not future.done():
+                future.set_result(values.get(key))
+
 
 class DictionaryLookup(MappingLookup):
     """
-    Description:
+    Description: Lookup with the data in a dictionary.
+
+    The master lookup keeps a journal of the last "delta_journal_size" changes,
+    so that slave lookups can obtain only the changes since their version (see `get_delta()`).
 
     """
 
+    ConfigDefaults = {
+        "delta_journal_size": 100,  # Number of changes kept for delta updates of slave lookups
+    }
+
+    DeltaSupported = True
+
     def __init__(self, app, id=None, config=None, lazy=False):
         """
         Description:
@@ -249,8 +521,17 @@ class DictionaryLookup(MappingLookup):
         """
 
         self.Dictionary = {}
+        self.Mutated = (
+            None  # Keys changed on the loop while the data are built off the loop
+        )
         super().__init__(app, id, config=config, lazy=lazy)
 
+        self.Journal = collections.deque(maxlen=int(self.Config["delta_journal_size"]))
+        self.Epoch = os.urandom(4).hex()  # Distinguishes versions of restarted masters
+        self.Sequence = 0
+        if self.is_master():
+            self.Version = "{}:{}".format(self.Epoch, self.Sequence)
+
     def __getitem__(self, key):
         return self.Dictionary.__getitem__(key)
 
@@ -277,7 +558,129 @@ class DictionaryLookup(MappingLookup):
         |
 
         """
-        self.Dictionary.update(json.loads(data.decode("utf-8")))
+        dictionary = json.loads(data.decode("utf-8"))
+        if self.is_master():
+            self._record(self._changed(dictionary), [])
+            self.Dictionary.update(dictionary)
+        else:
+            # A slave mirrors the master, keys deleted there disappear
+            self.Dictionary = dictionary
+
+    async def deserialize_async(self, data):
+        """
+        Description: Parses the data and builds the new dictionary in a thread, then swaps it in.
+
+        The master merges the data into a snapshot of its dictionary taken on the loop, a slave replaces
+        its dictionary by the data. Keys changed on the loop (by `set()` or `apply_delta()`) meanwhile
+        are newer than the data, so their current values are replayed into the new dictionary.
+
+        |
+
+        """
+        if type(self).deserialize is not DictionaryLookup.deserialize:
+            # A custom deserialization
+            await super().deserialize_async(data)
+            return
+
+        master = self.is_master()
+        snapshot = self.execute_on_loop(dict, self.Dictionary) if master else {}
+
+        def build():
+            dictionary = snapshot
+            changed = {}
+            for key, value in iter_json_object(data.decode("utf-8")):
+                if master and dictionary.get(key, _missing) != value:
+                    changed[key] = value
+                dictionary[key] = value
+            return dictionary, changed
+
+        self.Mutated = set()
+        try:
+            dictionary, changed = await self.execute_off_loop(build)
+            mutated = self.Mutated
+        finally:
+            self.Mutated = None
+
+        self.execute_on_loop(self._swap, dictionary, changed, mutated)
+
+    def _swap(self, dictionary, changed, mutated):
+        for key in mutated:
+            changed.pop(key, None)  # Already recorded, when it was changed
+            value = self.Dictionary.get(key, _missing)
+            if value is _missing:
+                dictionary.pop(key, None)
+            else:
+                dictionary[key] = value
+
+        if self.is_master():
+            self._record(changed, [])
+        self.Dictionary = dictionary
+
+    def _changed(self, dictionary):
+        return {
+            key: value
+            for key, value in dictionary.items()
+            if self.Dictionary.get(key, _missing) != value
+        }
+
+    def _record(self, upserts, deletes):
+        if len(upserts) == 0 and len(deletes) == 0:
+            return
+        base = self.Version
+        self.Sequence += 1
+        self.Version = "{}:{}".format(self.Epoch, self.Sequence)
+        self.Journal.append((base, self.Version, upserts, deletes))
+
+    def get_delta(self, since):
+        """
+        Description: Merges changes since the version `since` into a delta, see `LookupProviderABC.load_delta()`.
+
+        :return: the delta or None if the version is not in the journal
+
+        |
+        """
+        if since == self.Version:
+            return {"version": self.Version, "upserts": {}, "deletes": []}
+
+        journal = list(self.Journal)
+        for start, (base, _, _, _) in enumerate(journal):
+            if base == since:
+                break
+        else:
+            return None
+
+        upserts = {}
+        deletes = set()
+        for _, _, changed, deleted in journal[start:]:
+            for key in deleted:
+                upserts.pop(key, None)
+                deletes.add(key)
+            for key, value in changed.items():
+                deletes.discard(key)
+                upserts[key] = value
+
+        return {"version": self.Version, "upserts": upserts, "deletes": list(deletes)}
+
+    def apply_delta(self, delta):
+        """
+        Description:
+
+        |
+
+        """
+        upserts = delta["upserts"]
+        deletes = [key for key in delta["deletes"] if key in self.Dictionary]
+        self.Dictionary.update(upserts)
+        for key in deletes:
+            del self.Dictionary[key]
+        if self.Mutated is not None:
+            self.Mutated.update(upserts)
+            self.Mutated.update(deletes)
+
+        if self.is_master():
+            self._record(upserts, deletes)
+        else:
+            self.Version = delta["version"]
 
     # REST
 
@@ -302,6 +705,12 @@ class DictionaryLookup(MappingLookup):
         """
         if self.is_master() is False:
             L.warning("'master_url' provided, set() method can not be used")
+        else:
+            deletes = [key for key in self.Dictionary if key not in dictionary]
+            self._record(self._changed(dictionary), deletes)
 
+        if self.Mutated is not None:
+            self.Mutated.update(self.Dictionary)
+            self.Mutated.update(dictionary)
         self.Dictionary.clear()
         self.Dictionary.update(dictionary)
@@ -24,6 +24,7 @@ class LookupProviderABC(abc.ABC, asab.Configurable):
         self.App = lookup.App
         self.URL = url
         self.ETag = None
+        self.Version = None  # Version of the data obtained by the last `load()`, if the source provides it
 
     async def load(self):
         """
@@ -34,6 +35,25 @@ class LookupProviderABC(abc.ABC, asab.Configurable):
         """
         raise NotImplementedError()
 
+    async def load_delta(self, version):
+        """
+        Description: Obtains changes of the lookup data since the `version`.
+
+        The delta is a dictionary:
+
+                {
+                        "version": "<version of the data after the changes>",
+                        "upserts": {"key": "value", ...},
+                        "deletes": ["key", ...]
+                }
+
+        :return: the delta or None if the changes are not available and the data have to be loaded completely
+
+        |
+
+        """
+        return None
+
 
 class LookupBatchProviderABC(LookupProviderABC, abc.ABC):
     """
@@ -44,6 +44,9 @@ class ProcessorBase(asab.Configurable):
 
         self.EventCount = 0
 
+        # The pipeline replaces the profiler when the processor is added
+        self.Profiler = ProcessorProfiler()
+
     def time(self):
         """
         Accurate representation of a time in the :meth:`Pipeline <bspump.Pipeline()>`.
@@ -98,6 +101,31 @@ class ProcessorBase(asab.Configurable):
         """
         raise NotImplementedError()
 
+    def process_batch(self, context, events):
+        """
+        Can be implemented to process a whole batch of events at once, see :meth:`Pipeline.process_batch() <bspump.Pipeline.process_batch()>`.
+        The default implementation calls the process method for each event.
+
+        **Parameters**
+
+        context :
+                        Additional information shared by all events in the batch.
+
+        events : list
+                        List of events that are passed to the method.
+
+        :return: list of events that were not consumed by the processor.
+
+        :note: If an overridden method raises an exception, the whole batch is discarded.
+
+        """
+        result = []
+        for event in events:
+            event = self.process(context, event)
+            if event is not None:
+                result.append(event)
+        return result
+
     def locate_address(self):
         """
         Returns an ID of a :meth:`processor <bspump.Processor()>` and a :meth:`Pipeline <bspump.Pipeline()>`.
@@ -134,3 +162,49 @@ class Processor(ProcessorBase):
     """
 
     pass
+
+
+class ProcessorProfiler(object):
+    """
+    Plain accumulators of processor's runs, drops and durations.
+
+    The :meth:`Pipeline <bspump.Pipeline()>` updates them on every event without any dictionary work
+    and moves them into the metrics in `flush_profiler()`.
+
+    """
+
+    __slots__ = (
+        "Run",
+        "EventDrop",
+        "Duration",
+        "Sampled",
+        "SamplingRate",
+        "Countdown",
+    )
+
+    def __init__(self, sampling_rate=1):
+        self.Run = 0
+        self.EventDrop = 0
+        self.Duration = 0.0
+        self.Sampled = 0
+        self.SamplingRate = sampling_rate
+        self.Countdown = sampling_rate
+
+    def flush(self):
+        """
+        Resets the accumulators.
+
+        :return: tuple (run, drop, duration) accumulated since the last flush, the duration is extrapolated from sampled runs.
+
+        """
+        run, drop = self.Run, self.EventDrop
+        if self.Sampled > 0:
+            duration = self.Duration * run / self.Sampled
+        else:
+            duration = 0.0
+
+        self.Run = 0
+        self.EventDrop = 0
+        self.Duration = 0.0
+        self.Sampled = 0
+        return run, drop, duration
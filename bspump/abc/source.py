@@ -77,6 +77,29 @@ class Source(asab.Configurable):
 
         await self.Pipeline.process(event, context=context)
 
+    async def process_batch(self, events, context=None):
+        """
+        This method is used to emit a batch of events into a :meth:`Pipeline <bspump.Pipeline()>`.
+
+        **Parameters**
+
+        events : list
+                        List of events that are emitted into a :meth:`Pipeline <bspump.Pipeline()>`.
+
+        context : default None
+                        Additional information shared by all events in the batch.
+
+        """
+        self.EventCount += len(events)
+        if self.MQTTService and self.EventsToPublish > 0:
+            for event in events[: self.EventsToPublish]:
+                self.MQTTService.publish_event(
+                    self.Pipeline.Id, self, event, self.EventsToPublish
+                )
+                self.EventsToPublish -= 1
+
+        await self.Pipeline.process_batch(events, context=context)
+
     def start(self, loop):
         """
         Starts the :meth:`Pipeline <bspump.Pipeline()>` through the _main method, but if main method is implemented
@@ -1,5 +1,6 @@
-from .hyperloglog import HyperLogLog
+from .hyperloglog import HyperLogLog, SparseRegisters
 
 __all__ = [
     "HyperLogLog",
+    "SparseRegisters",
 ]
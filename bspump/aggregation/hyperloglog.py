@@ -1,5 +1,94 @@
+import hashlib
+
 import numpy as np
-import zlib
+
+
+_U64 = np.uint64
+
+
+def _splitmix64(x):
+    """
+    Finalizer of the SplitMix64 generator, mixes 64-bit integers (NumPy uint64 array) into hashes.
+    """
+    with np.errstate(over="ignore"):
+        x = x + _U64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> _U64(30))) * _U64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> _U64(27))) * _U64(0x94D049BB133111EB)
+        return x ^ (x >> _U64(31))
+
+
+def _splitmix64_int(x):
+    """
+    `_splitmix64()` of a single Python integer.
+    """
+    x = (x + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return x ^ (x >> 31)
+
+
+def _bit_length(x):
+    """
+    Number of bits of every item of the NumPy uint64 array `x`, i.e. position of the leftmost 1 + 1.
+    """
+    length = np.zeros(x.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        upper = x >> _U64(shift)
+        mask = upper != 0
+        length += mask * shift
+        x = np.where(mask, upper, x)
+    return length + (x != 0)
+
+
+class SparseRegisters(object):
+    """
+    Sparse registers of HyperLogLog for low cardinalities.
+    Non-zero registers are stored in a sorted uint32 array of `position << 8 | rho`,
+    i.e. 4 bytes per register that was set, see `HyperLogLog.create_sparse()`.
+    """
+
+    __slots__ = ("Entries",)
+
+    def __init__(self, entries=None):
+        if entries is None:
+            entries = np.zeros(0, dtype=np.uint32)
+        self.Entries = entries
+
+    def __len__(self):
+        return self.Entries.shape[0]
+
+    def positions(self):
+        return (self.Entries >> np.uint32(8)).astype(np.intp)
+
+    def values(self):
+        return (self.Entries & np.uint32(0xFF)).astype(np.uint8)
+
+    def set(self, position, rho):
+        """
+        Sets the register at `position` to `rho`, if it is higher, without sorting the entries again.
+        """
+        entry = (position << 8) | rho
+        index = int(np.searchsorted(self.Entries, position << 8))
+        if index < self.Entries.shape[0] and int(self.Entries[index]) >> 8 == position:
+            if int(self.Entries[index]) < entry:
+                self.Entries[index] = entry
+            return
+        self.Entries = np.insert(self.Entries, index, np.uint32(entry))
+
+    def update(self, positions, rhos):
+        positions = np.concatenate([self.positions(), positions.astype(np.intp)])
+        rhos = np.concatenate([self.values(), rhos.astype(np.uint8)])
+
+        # The maximum of every position is the last one, when sorted by the position and the value
+        order = np.lexsort((rhos, positions))
+        positions = positions[order]
+        rhos = rhos[order]
+        last = np.ones(positions.shape[0], dtype=bool)
+        last[:-1] = positions[1:] != positions[:-1]
+
+        self.Entries = (positions[last].astype(np.uint32) << np.uint32(8)) | rhos[
+            last
+        ].astype(np.uint32)
 
 
 class HyperLogLog(object):
@@ -8,6 +97,20 @@ class HyperLogLog(object):
     which estimates cardinality of the set with average 2%,
     described in http://algo.inria.fr/flajolet/Publications/FlFuGaMe07.pdf
     and https://storage.googleapis.com/pub-tools-public-publication-data/pdf/40671.pdf
+
+    Registers are a NumPy array of `m` small integers (see `dtype`) or `SparseRegisters` for low cardinalities.
+    Values are hashed into 64 bits: integers by the SplitMix64 finalizer, other values by BLAKE2b of their `str()`,
+    so that `add()` and `add_many()` produce the same registers.
+
+    The registers can be stored in a matrix with the `dtype` of the HyperLogLog, for instance
+    in a `TimeWindowMatrix`, where `Array[row, column]` are registers of one time window:
+
+            hll = HyperLogLog()
+            matrix = TimeWindowMatrix(app, dtype=hll.dtype, ...)
+            hll.add_many(values, matrix.Array[row, column])
+            hll.add_to_rows(values, rows, matrix.Array[:, column])
+            distinct = hll.count_many(matrix.Array[:, column])  # Per row
+            distinct = hll.count_many(matrix.Array.max(axis=1))  # Per row over the whole window
     """
 
     alphas = {16: 0.673, 32: 0.697, 64: 0.709}
@@ -22,10 +125,14 @@ class HyperLogLog(object):
         `alpha` is the parameter from papers above.
         """
 
-        self.num_bits = 32
+        self.num_bits = 64
         self.b = int(np.ceil(np.log2(m)))
         self.max = 2**self.num_bits
         self.m = m
+        self.dtype = "({},)u1".format(m)
+
+        # Sparse registers take 4 bytes per register, dense ones 1 byte
+        self.sparse_limit = m // 4
 
         if m >= 128:
             self.alpha = 0.7213 / (1 + 1.079 / m)
@@ -37,37 +144,160 @@ class HyperLogLog(object):
                 "Incorrect m, it should be 16, 32 or 64, or powers of 2 >= 128"
             )
 
+    def create_dense(self):
+        return np.zeros(self.m, dtype=np.uint8)
+
+    def create_sparse(self):
+        return SparseRegisters()
+
     def add(self, value, array):
         """
         `value` might be string or number.
         `array` is a storage to 'add' the value.
+
+        :return: registers, which are new dense registers, if sparse `array` grew over `sparse_limit`
         """
 
         hashed_value = self.hash_data(value)
         position = self._compute_position(hashed_value)
         rho = self._compute_rho(hashed_value)
-        array[position] = np.max([array[position], rho])
+        if isinstance(array, SparseRegisters):
+            array.set(position, rho)
+            if len(array) > self.sparse_limit:
+                return self.to_dense(array)
+        elif array[position] < rho:
+            array[position] = rho
+        return array
+
+    def add_many(self, values, array):
+        """
+        Adds all `values` (a list or a NumPy array) to the registers `array` at once.
+
+        :return: registers, which are new dense registers, if sparse `array` grew over `sparse_limit`
+        """
+        hashes = self.hash_many(values)
+        positions = self._compute_positions(hashes)
+        rhos = self._compute_rhos(hashes)
+
+        if isinstance(array, SparseRegisters):
+            array.update(positions, rhos)
+            if len(array) > self.sparse_limit:
+                return self.to_dense(array)
+            return array
+
+        np.maximum.at(array, positions, rhos.astype(array.dtype))
+        return array
+
+    def add_to_rows(self, values, rows, array):
+        """
+        Adds every value of `values` to registers of the corresponding row of `rows` in the 2-D `array`
+        of registers (e.g. a column of a matrix with the `dtype` of this HyperLogLog).
+        """
+        hashes = self.hash_many(values)
+        positions = self._compute_positions(hashes)
+        rhos = self._compute_rhos(hashes)
+        np.maximum.at(
+            array,
+            (np.asarray(rows, dtype=np.intp), positions),
+            rhos.astype(array.dtype),
+        )
+
+    def merge(self, array, *others):
+        """
+        Merges registers `others` into `array` (the union of the sets).
+        Dense `array` is updated in place.
+
+        :return: merged registers, which are dense if any of the registers is dense
+        """
+        for other in others:
+            if isinstance(array, SparseRegisters):
+                if isinstance(other, SparseRegisters):
+                    array.update(other.positions(), other.values())
+                    continue
+                array = self.to_dense(array)
+
+            if isinstance(other, SparseRegisters):
+                np.maximum.at(
+                    array, other.positions(), other.values().astype(array.dtype)
+                )
+            else:
+                np.maximum(array, other, out=array)
+
+        if isinstance(array, SparseRegisters) and len(array) > self.sparse_limit:
+            return self.to_dense(array)
+        return array
+
+    def to_dense(self, array, out=None):
+        if out is None:
+            out = self.create_dense()
+        if isinstance(array, SparseRegisters):
+            out[array.positions()] = array.values()
+        else:
+            out[:] = array
+        return out
 
     def count(self, array):
         """
         Count unique values in array.
         """
 
+        if isinstance(array, SparseRegisters):
+            array = self.to_dense(array)
+
         z = self._compute_z(array)
         e = self._compute_e(z, array)
         return int(e)
 
+    def count_many(self, array):
+        """
+        Counts unique values of every registers in `array`, which is an array of registers along its last axis.
+
+        :return: NumPy array of counts
+        """
+        if isinstance(array, SparseRegisters):
+            array = self.to_dense(array)
+
+        z = 1.0 / np.sum(np.exp2(-array.astype(np.float64)), axis=-1)
+        e = z * self.alpha * self.m**2
+        zeros = np.count_nonzero(array == 0, axis=-1)
+        with np.errstate(divide="ignore"):
+            linear = self.m * np.log(self.m / zeros)
+        maximum = float(self.max)
+        with np.errstate(invalid="ignore"):
+            large = -maximum * np.log(1 - e / maximum)
+        e = np.where(e < 1 / 30 * maximum, e, large)
+        e = np.where((e < 5 / 2 * self.m) & (zeros != 0), linear, e)
+        return e.astype(np.int64)
+
     def hash_data(self, value):
         """
-        Override it, if you want to use different hash.
-        Hash must be 32bit and fast (don't use cryptographic hashes then)
+        Override it together with `hash_many()`, if you want to use different hash.
+        Hash must be 64bit and fast (don't use cryptographic hashes then)
         """
 
+        if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+            if -(2**63) <= value < 2**64:
+                return _splitmix64_int(int(value) & 0xFFFFFFFFFFFFFFFF)
+
         if not isinstance(value, str):
             value = str(value)
 
         value = value.encode("utf8")
-        return zlib.crc32(value)
+        return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), "little")
+
+    def hash_many(self, values):
+        """
+        Hashes all `values` into NumPy uint64 array, integer arrays are hashed without a Python loop.
+        Other values are hashed one by one by `hash_data()`, they are not converted to a common type,
+        so that e.g. `1` in a list with strings has the same hash as in `add()`.
+        """
+        if isinstance(values, np.ndarray) and values.dtype.kind in "iu":
+            return _splitmix64(values.astype(np.uint64))
+        return np.fromiter(
+            (self.hash_data(value) for value in values),
+            dtype=np.uint64,
+            count=len(values),
+        )
 
     def compute_error(self, ground_truth, hll_count):
         """
@@ -77,8 +307,7 @@ class HyperLogLog(object):
         return np.abs(hll_count - ground_truth) / ground_truth * 100
 
     def _compute_z(self, array):
-        twos = [0.5] * len(array)
-        z = 1 / float(np.sum(np.power(twos, array)))
+        z = 1 / float(np.sum(np.exp2(-array.astype(np.float64))))
         return z
 
     def _compute_e(self, z, array):
@@ -99,7 +328,7 @@ class HyperLogLog(object):
         return e_star
 
     def _get_zeros(self, array):
-        return len(array[array == 0])
+        return int(np.count_nonzero(array == 0))
 
     def _linear_count(self, v):
         return self.m * np.log(self.m / v)
@@ -108,18 +337,16 @@ class HyperLogLog(object):
         """
         takes b right bits.
         """
-        move = hashed_value & (self.max - 1) >> (self.num_bits - self.b)
-        return move
+        return hashed_value & (self.m - 1)
+
+    def _compute_positions(self, hashes):
+        return (hashes & _U64(self.m - 1)).astype(np.intp)
 
     def _compute_rho(self, hashed_value):
         """
-        rho = 1 + <leftmost 1 position>
+        rho = 1 + <number of leading zeros of the remaining bits>
         """
-        # SLOW: TODO: find the way to do it better
-        x = hashed_value
-        pos = self.num_bits
-        while x > 1:
-            x = x >> 1
-            pos -= 1
+        return self.num_bits - self.b - (hashed_value >> self.b).bit_length() + 1
 
-        return pos
+    def _compute_rhos(self, hashes):
+        return self.num_bits - self.b - _bit_length(hashes >> _U64(self.b)) + 1
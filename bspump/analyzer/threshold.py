@@ -88,7 +88,7 @@ class ThresholdAnalyzer(TimeWindowAnalyzer):
         self.EventValue = self.Config["event_value"]
         self.Lower = float(self.Config["lower_bound"])
         self.Upper = float(self.Config["upper_bound"])
-        self.SymptomOccurrence = int(self.Config["symptom_occurrence"])
+        self.SymptomOccurrence = int(self.Config["anomaly_occurrence"])
 
         self.WarmingUpLimit = int()
 
@@ -141,6 +141,35 @@ class ThresholdAnalyzer(TimeWindowAnalyzer):
         # Fill matrix with the values
         self.TimeWindow.Array[row, column] = event[self.EventValue]
 
+    def process_batch(self, context, events):
+        """
+        Sorts the whole batch of events into the matrix by one vectorized `add_many()` call.
+
+        **Parameters**
+
+        context :
+
+        events : list
+                List of events.
+
+        :return: events
+        """
+        selected = [event for event in events if self.predicate(context, event)]
+        if len(selected) > 0:
+            attributes = [event[self.EventAttribute] for event in selected]
+            # Rows are added for events outside of the time window as well, like in `evaluate()`
+            for attribute in dict.fromkeys(attributes):
+                if self.TimeWindow.get_row_index(attribute) is None:
+                    self.TimeWindow.add_row(attribute)
+
+            self.TimeWindow.add_many(
+                attributes,
+                [event["@timestamp"] for event in selected],
+                [event[self.EventValue] for event in selected],
+                op="set",
+            )
+        return events
+
     def analyze(self):
         """
         Description:
@@ -150,13 +179,14 @@ class ThresholdAnalyzer(TimeWindowAnalyzer):
         if self.TimeWindow.Array.shape[0] == 0:
             return
 
+        # Conditions are evaluated on the ring buffer in place, columns are mapped to the time order below
         data = self.TimeWindow.Array
-        # Warming up the matrix to avoid procedures on not fully filled matrix and resizing warming_up dimension
-        # to avoid ValueError when checking the conditions of exceedance/subceedance/range.
+        # Warming up the matrix to avoid procedures on not fully filled matrix, the warming up of rows
+        # is broadcast over columns when checking the conditions of exceedance/subceedance/range.
         self.WarmingUpLimit = self.TimeWindow.Columns - 1
-        warming_up = np.resize(
-            self.TimeWindow.WarmingUpCount <= self.WarmingUpLimit, data.shape
-        )
+        warming_up = (self.TimeWindow.WarmingUpCount.WUC <= self.WarmingUpLimit)[
+            :, np.newaxis
+        ]
 
         # Exceedance
         if self.Lower == float("-inf") and self.Upper != float("inf"):
@@ -174,6 +204,13 @@ class ThresholdAnalyzer(TimeWindowAnalyzer):
         else:
             raise ValueError("Boundaries of the threshold has not been set!")
 
+        # Columns ordered from the oldest to the newest one, regardless of the ring buffer head
+        ncols = data.shape[1]
+        y = (y - self.TimeWindow.TimeConfig.get_head()) % ncols
+        order = np.lexsort((y, x))
+        x = x[order]
+        y = y[order]
+
         # Symptom occurrence detection
         try:
             # Setting previous value. When it is empty, further computation wont proceed.
@@ -1,7 +1,9 @@
 from .cachedict import CacheDict
 from .lrucachedict import LRUCacheDict
+from .frequencysketch import FrequencySketch
 
 __all__ = (
     "CacheDict",
     "LRUCacheDict",
+    "FrequencySketch",
 )
@@ -0,0 +1,53 @@
+class FrequencySketch(object):
+    """
+    FrequencySketch estimates how often keys were accessed recently, it is used by the TinyLFU admission policy.
+
+    It is a Count-Min sketch of 4-bit counters (capped at 15) with four rows.
+    When the number of increments reaches ten times the width of the sketch, all counters are halved,
+    so that the estimates follow recent accesses.
+    For more information, please see: https://arxiv.org/abs/1512.00727
+    """
+
+    Seeds = (
+        0x9E3779B97F4A7C15,
+        0xC2B2AE3D27D4EB4F,
+        0x165667B19E3779F9,
+        0x27D4EB2F165667C5,
+    )
+
+    # Translation table that halves every counter
+    Halve = bytes(i >> 1 for i in range(256))
+
+    def __init__(self, capacity):
+        self.Bits = max(4, (max(capacity, 16) - 1).bit_length())
+        self.Shift = 64 - self.Bits
+        self.Rows = [bytearray(1 << self.Bits) for _ in self.Seeds]
+        self.SampleSize = 10 * (1 << self.Bits)
+        self.Additions = 0
+
+    def _indexes(self, key):
+        h = hash(key)
+        return [((h * seed) & 0xFFFFFFFFFFFFFFFF) >> self.Shift for seed in self.Seeds]
+
+    def increment(self, key):
+        added = False
+        for row, i in zip(self.Rows, self._indexes(key)):
+            if row[i] < 15:
+                row[i] += 1
+                added = True
+
+        if added:
+            self.Additions += 1
+            if self.Additions >= self.SampleSize:
+                self.reset()
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.Rows, self._indexes(key)))
+
+    def reset(self):
+        """
+        Halves all counters.
+        """
+        for row in self.Rows:
+            row[:] = row.translate(self.Halve)
+        self.Additions //= 2
@@ -1,12 +1,57 @@
 import collections
+import collections.abc
+import sys
 
+from .frequencysketch import FrequencySketch
 
-class LRUCacheDict(collections.OrderedDict):
+
+def estimate_size(value):
+    """
+    Estimates the number of bytes taken by the value, including nested dictionaries, lists, tuples and sets.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k) + estimate_size(v)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+class _Entry(object):
+    __slots__ = ("Value", "Expires", "Size", "Protected")
+
+    def __init__(self, value, expires, size):
+        self.Value = value
+        self.Expires = expires
+        self.Size = size
+        self.Protected = False
+
+
+class LRUCacheDict(collections.abc.MutableMapping):
     """
     LRUCacheDict implements the "Least recently used" cache strategy.
-    LRUCacheDict removes last used elements, if the time they were lastly used exceeds the specified `max_duration` or the cache dictionary exceeds `max_size`.
+    LRUCacheDict removes least recently used elements, if the cache dictionary exceeds `max_size` entries
+    or `max_bytes` bytes, and elements stored earlier than `max_duration` seconds ago.
     For more information, please see: https://en.wikipedia.org/wiki/Cache_replacement_policies#Least_recently_used_(LRU)
 
+    All operations take O(1) time (amortized), entries are kept in an ordered dictionary in the order of use
+    and, for the expiration, in ordered dictionaries in the order of writes.
+
+    `None` values (keys that were not found) are cached for `negative_duration` seconds,
+    which defaults to `max_duration`; 0 disables caching of `None` values.
+
+    The size of values is estimated by `sizeof` (see `estimate_size()`), only if `max_bytes` is set.
+
+    `policy` "slru" enables the segmented LRU: new elements are put into the probationary segment
+    and elements that are used again are moved into the protected segment of 80 % of `max_size`,
+    so that a burst of keys used only once doesn't evict the frequently used ones.
+
+    `admission` "tinylfu" enables the TinyLFU admission policy for skewed key distributions:
+    when the cache is full, a new element is stored only if its key was accessed (read) more often recently
+    than the key of the element that would be evicted.
+
     The following example illustrates how to use LRUCacheDict with MySQLLookup:
 
             self.MySQLLookup =  MySQLLookup(self,
@@ -17,42 +62,230 @@ class LRUCacheDict(collections.OrderedDict):
 
     """
 
-    def __init__(self, app, max_size=1000, max_duration=None, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
+    def __init__(
+        self,
+        app,
+        max_size=1000,
+        max_duration=None,
+        max_bytes=None,
+        negative_duration=None,
+        policy="lru",
+        admission=None,
+        sizeof=None,
+        id=None,
+    ):
         self.App = app
+        self.Id = id if id is not None else self.__class__.__name__
 
         self.MaxSize = max_size
         self.MaxDuration = max_duration
-        self.refresh()
-
-    def refresh(self):
-        # Remove items that overflow the dictionary
-        if self.MaxSize:
-            for i in range(max(0, len(self) - self.MaxSize)):
-                self.popitem(last=False)
-
-        # Remove items by max time
-        if self.MaxDuration:
-            limit = self.App.time() - self.MaxDuration
-            while self:
-                value, lru = next(iter(super().values()))
-                if lru > limit:
-                    break
-                self.popitem(last=False)
+        self.MaxBytes = max_bytes
+        self.NegativeDuration = (
+            max_duration if negative_duration is None else negative_duration
+        )
+        self.SizeOf = sizeof if sizeof is not None else estimate_size
+
+        if policy not in ("lru", "slru"):
+            raise ValueError("Unknown cache policy '{}'".format(policy))
+        if admission not in (None, "tinylfu"):
+            raise ValueError("Unknown cache admission policy '{}'".format(admission))
+
+        self.Entries = collections.OrderedDict()  # The probationary segment in SLRU
+        self.Protected = collections.OrderedDict()
+        if policy == "slru" and self.MaxSize:
+            self.ProtectedSize = max(1, int(self.MaxSize * 0.8))
+        else:
+            self.ProtectedSize = 0
+
+        self.Expiry = collections.OrderedDict()
+        self.NegativeExpiry = collections.OrderedDict()
+        self.Bytes = 0
+
+        if admission == "tinylfu":
+            self.Sketch = FrequencySketch(self.MaxSize or 1024)
+        else:
+            self.Sketch = None
+
+        metrics_service = app.get_service("asab.MetricsService")
+        self.CacheCounter = metrics_service.create_counter(
+            "cache",
+            tags={"cache": self.Id},
+            init_values={
+                "hit": 0,
+                "miss": 0,
+                "eviction": 0,
+                "expiration": 0,
+                "rejection": 0,
+            },
+        )
+        self.SizeGauge = metrics_service.create_gauge(
+            "cache.size",
+            tags={"cache": self.Id},
+            init_values={"entries": 0, "bytes": 0},
+        )
+        app.PubSub.subscribe("Application.tick!", self._on_tick)
+
+    def _on_tick(self, event_name):
+        self._expire(self.App.time())
+        self.SizeGauge.set("entries", len(self))
+        self.SizeGauge.set("bytes", self.Bytes)
+
+    def _find(self, key):
+        entry = self.Entries.get(key)
+        if entry is None and self.ProtectedSize > 0:
+            entry = self.Protected.get(key)
+        return entry
+
+    def _remove(self, key, entry):
+        if entry.Protected:
+            del self.Protected[key]
+        else:
+            del self.Entries[key]
+        self.Expiry.pop(key, None)
+        self.NegativeExpiry.pop(key, None)
+        self.Bytes -= entry.Size
+
+    def _touch(self, key, entry):
+        if entry.Protected:
+            self.Protected.move_to_end(key)
+
+        elif self.ProtectedSize > 0:
+            del self.Entries[key]
+            entry.Protected = True
+            self.Protected[key] = entry
+            if len(self.Protected) > self.ProtectedSize:
+                # The least recently used protected element gets another chance in the probationary segment
+                demoted_key, demoted = self.Protected.popitem(last=False)
+                demoted.Protected = False
+                self.Entries[demoted_key] = demoted
+
+        else:
+            self.Entries.move_to_end(key)
+
+    def _victim(self):
+        if len(self.Entries) > 0:
+            return next(iter(self.Entries.items()))
+        if len(self.Protected) > 0:
+            return next(iter(self.Protected.items()))
+        return None, None
+
+    def _is_full(self, size):
+        if self.MaxSize and len(self) >= self.MaxSize:
+            return True
+        if self.MaxBytes and self.Bytes + size > self.MaxBytes:
+            return True
+        return False
+
+    def _expire_queue(self, queue, now):
+        count = 0
+        while len(queue) > 0:
+            key, entry = next(iter(queue.items()))
+            if entry.Expires > now:
+                break
+            self._remove(key, entry)
+            count += 1
+        return count
+
+    def _expire(self, now):
+        count = self._expire_queue(self.Expiry, now)
+        count += self._expire_queue(self.NegativeExpiry, now)
+        if count > 0:
+            self.CacheCounter.add("expiration", count)
+
+    def _evict(self):
+        count = 0
+        while (self.MaxSize and len(self) > self.MaxSize) or (
+            self.MaxBytes and self.Bytes > self.MaxBytes
+        ):
+            key, entry = self._victim()
+            if entry is None:
+                break
+            self._remove(key, entry)
+            count += 1
+        if count > 0:
+            self.CacheCounter.add("eviction", count)
 
     def __getitem__(self, key):
-        value = super().__getitem__(key)[0]
-        super().__setitem__(key, (value, self.App.time()))
-        self.move_to_end(key)
-        return value
+        if self.Sketch is not None:
+            self.Sketch.increment(key)
+
+        entry = self._find(key)
+        if entry is None:
+            self.CacheCounter.add("miss", 1)
+            raise KeyError(key)
+
+        if entry.Expires is not None and entry.Expires <= self.App.time():
+            self._remove(key, entry)
+            self.CacheCounter.add("expiration", 1)
+            self.CacheCounter.add("miss", 1)
+            raise KeyError(key)
+
+        self._touch(key, entry)
+        self.CacheCounter.add("hit", 1)
+        return entry.Value
 
     def __setitem__(self, key, value):
-        super().__setitem__(key, (value, self.App.time()))
-        self.refresh()
+        negative = value is None
+        duration = self.NegativeDuration if negative else self.MaxDuration
+        if negative and duration == 0:
+            return
+
+        size = self.SizeOf(value) if self.MaxBytes else 0
+
+        entry = self._find(key)
+        if entry is not None:
+            self._remove(key, entry)
+
+        elif self.Sketch is not None and self._is_full(size):
+            victim_key, victim = self._victim()
+            if victim is not None and self.Sketch.estimate(key) <= self.Sketch.estimate(
+                victim_key
+            ):
+                self.CacheCounter.add("rejection", 1)
+                return
+
+        now = self.App.time()
+        entry = _Entry(value, now + duration if duration else None, size)
+        self.Entries[key] = entry
+        if duration:
+            if negative:
+                self.NegativeExpiry[key] = entry
+            else:
+                self.Expiry[key] = entry
+        self.Bytes += size
+
+        self._expire(now)
+        self._evict()
+
+    def __delitem__(self, key):
+        entry = self._find(key)
+        if entry is None:
+            raise KeyError(key)
+        self._remove(key, entry)
+
+    def __contains__(self, key):
+        entry = self._find(key)
+        if entry is None:
+            return False
+        return entry.Expires is None or entry.Expires > self.App.time()
+
+    def __iter__(self):
+        return iter(list(self.Entries.keys()) + list(self.Protected.keys()))
+
+    def __len__(self):
+        return len(self.Entries) + len(self.Protected)
+
+    def clear(self):
+        self.Entries.clear()
+        self.Protected.clear()
+        self.Expiry.clear()
+        self.NegativeExpiry.clear()
+        self.Bytes = 0
 
     def items(self):
-        return ((key, value) for key, (value, _) in super().items())
+        for key, entry in list(self.Entries.items()) + list(self.Protected.items()):
+            yield key, entry.Value
 
     def values(self):
-        return (value for value, _ in super().values())
+        for _, value in self.items():
+            yield value
@@ -7,6 +7,7 @@ from .aggregator import (
 )
 from .bytes import BytesToStringParser
 from .bytes import StringToBytesParser
+from .cow import copy_on_write, CopyOnWriteDict, CopyOnWriteList
 from .flatten import FlattenDictProcessor
 from .hexlify import HexlifyProcessor
 from .iterator import IteratorGenerator
@@ -38,6 +39,9 @@ from .jq import JQProcessor
 __all__ = (
     "BytesToStringParser",
     "StringToBytesParser",
+    "copy_on_write",
+    "CopyOnWriteDict",
+    "CopyOnWriteList",
     "FlattenDictProcessor",
     "HexlifyProcessor",
     "IteratorGenerator",
@@ -0,0 +1,177 @@
+import copy
+
+
+def copy_on_write(event, counter=None):
+    """
+    Description: Returns a copy-on-write view of the event, that can be shared among several pipelines.
+
+    The event is not copied deeply. Only the top-level container is copied (shallowly) right away,
+    nested dictionaries and lists are copied (shallowly) when they are accessed for the first time.
+    The original event must not be mutated in place once it has been shared.
+    Only `dict` and `list` containers are protected, other mutable objects in the event are shared.
+
+    If a metrics `counter` is given, its `copy.materialized` value counts the nested containers copied.
+
+    |
+
+    """
+    t = type(event)
+    if t is dict or t is CopyOnWriteDict:
+        return CopyOnWriteDict(event, _counter=counter)
+    if t is list or t is CopyOnWriteList:
+        return CopyOnWriteList(event, _counter=counter)
+    return copy.deepcopy(event)
+
+
+def _own(value, owner):
+    """
+    Wraps a nested container that is not owned by `owner` yet.
+    Returns None if the value doesn't need to be wrapped.
+    """
+    t = type(value)
+    if t is dict or (t is CopyOnWriteDict and value._cow_owner is not owner):
+        cls = CopyOnWriteDict
+    elif t is list or (t is CopyOnWriteList and value._cow_owner is not owner):
+        cls = CopyOnWriteList
+    else:
+        return None
+
+    counter = owner._cow_counter
+    if counter is not None:
+        counter.add("copy.materialized", 1)
+    return cls(value, _owner=owner, _counter=counter)
+
+
+class CopyOnWriteDict(dict):
+    """
+    Description: Dictionary that shares nested containers with the dictionary it was created from,
+    until they are accessed. See `copy_on_write()`.
+
+    |
+
+    """
+
+    __slots__ = ("_cow_owner", "_cow_counter")
+
+    def __init__(self, *args, _owner=None, _counter=None, **kwargs):
+        if len(args) == 1 and type(args[0]) is CopyOnWriteDict:
+            # Nested containers are shared with the other view, they are copied when accessed
+            args = (dict.items(args[0]),)
+        super().__init__(*args, **kwargs)
+        self._cow_owner = _owner
+        self._cow_counter = _counter
+
+    def _own_all(self):
+        for key, value in dict.items(self):
+            owned = _own(value, self)
+            if owned is not None:
+                dict.__setitem__(self, key, owned)
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        owned = _own(value, self)
+        if owned is None:
+            return value
+        dict.__setitem__(self, key, owned)
+        return owned
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        return self[key]
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            dict.__setitem__(self, key, default)
+        return self[key]
+
+    def pop(self, key, *args):
+        if key not in self:
+            return dict.pop(self, key, *args)
+        value = self[key]
+        dict.__delitem__(self, key)
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        owned = _own(value, self)
+        return key, value if owned is None else owned
+
+    def __iter__(self):
+        # Overriding `__iter__` disables the fast path of `dict(event)` and `{**event}`,
+        # that would copy nested containers without `__getitem__()`
+        return dict.__iter__(self)
+
+    def values(self):
+        self._own_all()
+        return dict.values(self)
+
+    def items(self):
+        self._own_all()
+        return dict.items(self)
+
+    def copy(self):
+        return CopyOnWriteDict(self, _counter=self._cow_counter)
+
+    __copy__ = copy
+
+    def __reduce__(self):
+        return (dict, (dict(dict.items(self)),))
+
+
+class CopyOnWriteList(list):
+    """
+    Description: List that shares nested containers with the list it was created from,
+    until they are accessed. See `copy_on_write()`.
+
+    |
+
+    """
+
+    __slots__ = ("_cow_owner", "_cow_counter")
+
+    def __init__(self, *args, _owner=None, _counter=None):
+        if len(args) == 1 and type(args[0]) is CopyOnWriteList:
+            args = (list.__iter__(args[0]),)
+        super().__init__(*args)
+        self._cow_owner = _owner
+        self._cow_counter = _counter
+
+    def _own_all(self):
+        for i, value in enumerate(list.__iter__(self)):
+            owned = _own(value, self)
+            if owned is not None:
+                list.__setitem__(self, i, owned)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            self._own_all()
+            return list.__getitem__(self, index)
+
+        value = list.__getitem__(self, index)
+        owned = _own(value, self)
+        if owned is None:
+            return value
+        list.__setitem__(self, index, owned)
+        return owned
+
+    def __iter__(self):
+        self._own_all()
+        return list.__iter__(self)
+
+    def __reversed__(self):
+        self._own_all()
+        return list.__reversed__(self)
+
+    def pop(self, index=-1):
+        value = self[index]
+        list.pop(self, index)
+        return value
+
+    def copy(self):
+        return CopyOnWriteList(self, _counter=self._cow_counter)
+
+    __copy__ = copy
+
+    def __reduce__(self):
+        return (list, (list(list.__iter__(self)),))
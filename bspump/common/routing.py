@@ -4,11 +4,24 @@ import copy
 from ..abc.source import Source
 from ..abc.sink import Sink
 from ..abc.processor import Processor
+from .cow import CopyOnWriteDict, CopyOnWriteList, copy_on_write
 
 
 L = logging.getLogger(__name__)
 
 
+def _copy_event(event, copy_event):
+    """
+    Copies the event according to `copy_event`, which is True (a deep copy), False (no copy)
+    or "cow" (a copy-on-write view, see `copy_on_write()`).
+    """
+    if copy_event == "cow":
+        return copy_on_write(event)
+    if copy_event:
+        return copy.deepcopy(event)
+    return event
+
+
 class DirectSource(Source):
     """
     Description: This source processes inserted event synchronously.
@@ -41,8 +54,7 @@ class DirectSource(Source):
         else:
             child_context = {"ancestor": context}
 
-        if copy_event:
-            event = copy.deepcopy(event)
+        event = _copy_event(event, copy_event)
 
         # DirectSource is not using the common asynchronous process method
         self.Pipeline.MetricsEPSCounter.add("eps.in", 1)
@@ -110,10 +122,9 @@ class InternalSource(Source):
         if copy_context:
             context = copy.deepcopy(context)
 
-        if copy_event:
-            event = copy.deepcopy(event)
+        event = _copy_event(event, copy_event)
 
-        self.Queue.put_nowait((context, event))
+        self.Queue.put_nowait((context, event, False))
 
         if (
             (not self.BackPressure)
@@ -141,10 +152,63 @@ class InternalSource(Source):
         if copy_context:
             context = copy.deepcopy(context)
 
-        if copy_event:
-            event = copy.deepcopy(event)
+        event = _copy_event(event, copy_event)
+
+        await self.Queue.put((context, event, False))
+
+        if (
+            (not self.BackPressure)
+            and (self.BackPressureLimit is not None)
+            and (self.BackPressureLimit <= self.Queue.qsize())
+        ):
+            self.BackPressure = True
+            self.Pipeline.PubSub.publish(
+                "bspump.InternalSource.backpressure_on!", source=self
+            )
+
+    def put_batch(self, context, events, copy_context=False, copy_event=False):
+        """
+        Description: This method puts a batch of events sharing the same context into the queue.
+        The batch occupies a single slot in the queue and it is passed to the pipeline at once
+        using `process_batch()`.
+
+        |
+
+        """
+
+        if copy_context:
+            context = copy.deepcopy(context)
+
+        events = [_copy_event(event, copy_event) for event in events]
+
+        self.Queue.put_nowait((context, events, True))
+
+        if (
+            (not self.BackPressure)
+            and (self.BackPressureLimit is not None)
+            and (self.BackPressureLimit <= self.Queue.qsize())
+        ):
+            self.BackPressure = True
+            self.Pipeline.PubSub.publish(
+                "bspump.InternalSource.backpressure_on!", source=self
+            )
+
+    async def put_batch_async(
+        self, context, events, copy_context=False, copy_event=False
+    ):
+        """
+        Description: Asynchronous variant of `put_batch()`, see `put_async()`.
+
+        |
+
+        """
+
+        if copy_context:
+            context = copy.deepcopy(context)
+
+        events = [_copy_event(event, copy_event) for event in events]
 
-        await self.Queue.put((context, event))
+        await self.Queue.put((context, events, True))
 
         if (
             (not self.BackPressure)
@@ -166,7 +230,7 @@ class InternalSource(Source):
         try:
             while True:
                 await self.Pipeline.ready()
-                context, event = await self.Queue.get()
+                context, event, is_batch = await self.Queue.get()
 
                 if (
                     (self.BackPressure)
@@ -178,7 +242,10 @@ class InternalSource(Source):
                         "bspump.InternalSource.backpressure_off!", source=self
                     )
 
-                await self.process(event, context={"ancestor": context})
+                if is_batch:
+                    await self.process_batch(event, context={"ancestor": context})
+                else:
+                    await self.process(event, context={"ancestor": context})
 
                 self.Queue.task_done()
 
@@ -217,6 +284,10 @@ class RouterMixIn(object):
 	Router Mix in a class
 	"""
 
+    ConfigDefaults = {
+        "copy_event": "deepcopy",  # one of 'deepcopy', 'cow' (copy-on-write) and 'none'
+    }
+
     def _mixin_init(self, app):
         """
         Description:
@@ -227,6 +298,19 @@ class RouterMixIn(object):
         self.ServiceBSPump = app.get_service("bspump.PumpService")
         self.SourcesCache = {}
 
+        copy_event = self.Config["copy_event"]
+        if copy_event not in ("deepcopy", "cow", "none"):
+            L.warning(
+                "Incorrect/unknown 'copy_event' configuration value '{}' - defaulting to 'deepcopy'".format(
+                    copy_event
+                )
+            )
+            copy_event = "deepcopy"
+        self.CopyEvent = {"deepcopy": True, "cow": "cow", "none": False}[copy_event]
+
+        self.MetricsService = app.get_service("asab.MetricsService")
+        self.RouteCounters = {}
+
     def locate(self, source_id):
         """
         Description:
@@ -243,6 +327,22 @@ class RouterMixIn(object):
 
         self.SourcesCache[source_id] = source
 
+        if source_id not in self.RouteCounters:
+            self.RouteCounters[source_id] = self.MetricsService.create_counter(
+                "bspump.router",
+                tags={
+                    "pipeline": self.Pipeline.Id,
+                    "router": self.Id,
+                    "target": str(source_id),
+                },
+                init_values={
+                    "event.routed": 0,
+                    "copy.deep": 0,
+                    "copy.cow": 0,
+                    "copy.materialized": 0,
+                },
+            )
+
         source.Pipeline.PubSub.subscribe(
             "bspump.pipeline.not_ready!", self._on_target_pipeline_ready_change
         )
@@ -317,12 +417,17 @@ class RouterMixIn(object):
         # TODO: Obsolete function
         return self.route(context, event, source_id, copy_event=True)
 
-    def route(self, context, event, source_id, copy_event=True):
+    def route(self, context, event, source_id, copy_event=None):
         """
         Description: This method routes an event to a InternalSource `source_id`.
 
         It can be called multiple times from a process() method, which results in a cloning of the event.
 
+        `copy_event` is True (a deep copy), False (no copy) or "cow" (a copy-on-write view).
+        When it is None, the `copy_event` configuration option of the router is used.
+        With copy-on-write, the routed event must not be mutated in place afterwards,
+        continue with `copy_on_write(event)` instead.
+
         |
 
         """
@@ -331,6 +436,22 @@ class RouterMixIn(object):
         if source is None:
             source = self.locate(source_id)
 
+        if copy_event is None:
+            copy_event = self.CopyEvent
+
+        counter = self.RouteCounters[source_id]
+        counter.add("event.routed", 1)
+        if copy_event == "cow":
+            # Nested containers copied later, when they are accessed, are counted as `copy.materialized`
+            event = copy_on_write(event, counter)
+            if isinstance(event, (CopyOnWriteDict, CopyOnWriteList)):
+                counter.add("copy.cow", 1)
+            else:
+                counter.add("copy.deep", 1)
+            copy_event = False
+        elif copy_event:
+            counter.add("copy.deep", 1)
+
         source.put(context, event, copy_event=copy_event)
 
     def _on_target_pipeline_ready_change(self, event_name, pipeline):
@@ -1,4 +1,5 @@
 import logging
+from .cow import copy_on_write
 from .routing import InternalSource, RouterProcessor
 
 
@@ -158,4 +159,9 @@ class TeeProcessor(RouterProcessor):
         """
         for source in self.Targets:
             self.route(context, event, source)
+
+        if self.CopyEvent == "cow" and len(self.Targets) > 0:
+            # The routed event is shared, so it must not be mutated in this pipeline
+            return copy_on_write(event)
+
         return event
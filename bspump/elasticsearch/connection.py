@@ -1,4 +1,5 @@
 import asyncio
+import gzip
 import logging
 import random
 import re
@@ -39,14 +40,25 @@ class ElasticSearchBulk(object):
         self.Index = index
         self.Aging = 0
         self.Capacity = max_size
-        self.Items = []
+        self.Items = []  # One item (bytes) per bulk operation
         self.InsertMetric = connection.InsertMetric
         self.FailLogMaxSize = connection.FailLogMaxSize
         self.FilterPath = connection.FilterPath
+        self.Compression = connection.Compression
+        self.CompressionLevel = connection.CompressionLevel
+        self.ProactorService = connection.ProactorService
+        self.RetryMax = connection.RetryMax
+
+        self.Attempts = 0  # Failed deliveries of the bulk, for the backoff
+        self.Retries = 0  # Item-level retries
+        self.Status = (
+            None  # HTTP status of the last response, None if there was no response
+        )
+        self.Throttled = False  # ElasticSearch responded by 429 to the last upload
 
     def consume(self, data_feeder_generator):
         """
-        Appends all items in data_feeder_generator to Items list. Consumer also resets Aging and Capacity.
+        Appends the operation produced by data_feeder_generator to Items list. Consumer also resets Aging and Capacity.
 
         **Parameters**
 
@@ -56,7 +68,8 @@ class ElasticSearchBulk(object):
         :return: self.Capacity <= 0
 
         """
-        for item in data_feeder_generator:
+        item = b"".join(data_feeder_generator)
+        if len(item) > 0:
             self.Items.append(item)
             self.Capacity -= len(item)
 
@@ -76,33 +89,48 @@ class ElasticSearchBulk(object):
         """
         Uploads data to Elastic Search.
 
+        Items that failed with 429 or 5xx status are kept in Items to be retried, up to "retry_max" times.
+        The request body is compressed by gzip in the ProactorService, if "compression" is enabled.
+
         **Parameters**
 
         url : string
                         Uses URL from config to connect to ElasticSearch Rest API.
 
-        session : ?
-                        ?
+        session : aiohttp.ClientSession
+                        Session to send the request by.
 
         timeout : int
                         uses timout value from config. Value of time for how long we want to be connected to ElasticSearch.
 
-        :return: ?
+        :return: True if the bulk is done, False if the bulk (its remaining Items) is to be submitted again
 
         |
 
         """
         items_count = len(self.Items)
         if items_count == 0:
-            return
+            return True
+
+        self.Status = None
+        self.Throttled = False
 
         url = url + "{}/_bulk?filter_path={}".format(self.Index, self.FilterPath)
+        headers = {"Content-Type": "application/json"}
+
+        if self.Compression:
+            data = await self.ProactorService.execute(
+                gzip.compress, b"".join(self.Items), self.CompressionLevel
+            )
+            headers["Content-Encoding"] = "gzip"
+        else:
+            data = self._get_data_from_items()
 
         try:
             resp = await session.post(
                 url,
-                data=self._get_data_from_items(),
-                headers={"Content-Type": "application/json"},
+                data=data,
+                headers=headers,
                 timeout=timeout,
             )
         except OSError as e:
@@ -120,6 +148,8 @@ class ElasticSearchBulk(object):
             L.warn("{}".format(e))
             return False
 
+        self.Status = resp.status
+
         if resp.status == 200:
             # Check that all documents were successfully inserted to ElasticSearch
             # If there are no error messages, we are done here
@@ -134,12 +164,22 @@ class ElasticSearchBulk(object):
             response_items = resp_body.get("items")
             self.partial_error_callback(response_items)
 
-            # When the log handling is not precise,
-            # the iteration only happens on error items natively
-            # Log first 20 errors
+            # Response items are in the order of the request items
+            # When the log handling is not precise, log first 20 errors
             counter = 0
-            for response_item in response_items:
-                if "error" not in response_item.get("index", ""):
+            retry = []
+            for item, response_item in zip(self.Items, response_items):
+                # The response item is keyed by the operation: index, create, update or delete
+                result = next(iter(response_item.values()), {})
+                if "error" not in result:
+                    continue
+
+                status = result.get("status", 0)
+                if status == 429:
+                    self.Throttled = True
+
+                if (status == 429 or status >= 500) and self.Retries < self.RetryMax:
+                    retry.append(item)
                     continue
 
                 if counter < self.FailLogMaxSize:
@@ -161,7 +201,25 @@ class ElasticSearchBulk(object):
 
             # Insert metrics
             self.InsertMetric.add("fail", counter)
-            self.InsertMetric.add("ok", items_count - counter)
+            self.InsertMetric.add("ok", items_count - counter - len(retry))
+
+            if len(retry) > 0:
+                # Only the rejected items are submitted again
+                self.InsertMetric.add("retry", len(retry))
+                self.Items = retry
+                self.Retries += 1
+                return False
+
+        elif resp.status == 429 or resp.status >= 500:
+            # ElasticSearch is overloaded or temporarily unavailable, the whole bulk is submitted again
+            self.Throttled = resp.status == 429
+            self.InsertMetric.add("retry", items_count)
+            L.warning(
+                "ElasticSearch rejected the bulk, will retry status:{} body:{}".format(
+                    resp.status, resp_body
+                )
+            )
+            return False
 
         else:
             # The major ElasticSearch error occurred while inserting documents, response was not 200
@@ -202,7 +260,7 @@ class ElasticSearchBulk(object):
         **Parameters**
 
         bulk_items : list
-                        list with tuple items: (_id, data)
+                        list of bytes items, one per bulk operation
 
         return_code :
                         ElasticSearch return code
@@ -215,9 +273,28 @@ class ElasticSearchBulk(object):
         return False
 
 
+class _Node(object):
+    """
+    Node of the ElasticSearch cluster, bulks are uploaded to.
+    """
+
+    __slots__ = ("Url", "InFlight", "Ready", "DownUntil")
+
+    def __init__(self, url):
+        self.Url = url
+        self.InFlight = 0  # Number of bulks being uploaded to the node
+        self.Ready = False  # The health of the node has been checked
+        self.DownUntil = 0.0  # Loop time, till when the node is not used
+
+
 class ElasticSearchConnection(Connection):
     """
-    Description:
+    Description: Bulks are uploaded to the nodes of the cluster in the round-robin manner,
+    with up to "loader_per_url" bulks in flight per node.
+
+    Items that ElasticSearch rejected with 429 or 5xx status are submitted again with an exponential backoff.
+    When "bulk_target_latency" is set, the size of new bulks is tuned by the observed latency of uploads,
+    between "bulk_out_min_size" and "bulk_out_max_size".
 
     **Sample Config**
 
@@ -231,13 +308,34 @@ class ElasticSearchConnection(Connection):
                     Used when authentication is required
 
     loader_per_url : int, default = 4
-                    Number of parallel loaders per URL.
+                    Number of bulks uploaded concurrently per URL.
 
     output_queue_max_size : int, default = 10
                     Maximum queue size.
 
-    bulk_out_max_size : ? * ? * ?, default = 12 * 1024 * 1024
-                    ??
+    bulk_out_max_size : int, default = 12 * 1024 * 1024
+                    Maximal size of bulks in bytes.
+
+    bulk_out_min_size : int, default = 1024 * 1024
+                    Minimal size of bulks in bytes, when the size is tuned.
+
+    bulk_target_latency : float, default = 2.0
+                    Target duration of an upload in seconds, the size of bulks is tuned to. 0 disables the tuning.
+
+    compression : 'string', default = ' '
+                    'gzip' to compress the requests.
+
+    compression_level : int, default = 1
+                    Level of the gzip compression.
+
+    retry_max : int, default = 5
+                    Maximum number of retries of items rejected with 429 or 5xx status.
+
+    retry_backoff : float, default = 1.0
+                    Initial delay of a retry in seconds, it doubles with every attempt.
+
+    retry_backoff_max : float, default = 60.0
+                    Maximum delay of a retry in seconds.
 
     timeout : int, default = 300
                     Timout value.
@@ -257,9 +355,16 @@ class ElasticSearchConnection(Connection):
         # Could be multi-URL. Each URL should be separated by ';' to a node in ElasticSearch cluster
         "username": "",
         "password": "",
-        "loader_per_url": 4,  # Number of parallel loaders per URL
+        "loader_per_url": 4,  # Number of concurrent uploads per URL
         "output_queue_max_size": 10,
         "bulk_out_max_size": 12 * 1024 * 1024,
+        "bulk_out_min_size": 1024 * 1024,
+        "bulk_target_latency": 2.0,  # Seconds, 0 disables tuning of the bulk size
+        "compression": "",  # "gzip" or empty
+        "compression_level": 1,
+        "retry_max": 5,
+        "retry_backoff": 1.0,
+        "retry_backoff_max": 60.0,
         "timeout": 300,
         "fail_log_max_size": 20,
         "precise_error_handling": False,
@@ -306,10 +411,30 @@ class ElasticSearchConnection(Connection):
             self.node_urls.append(url)
 
         self._loader_per_url = int(self.Config["loader_per_url"])
+        self._nodes = [_Node(url) for url in self.node_urls]
+        self._next_node = 0
+        self._node_released = asyncio.Event()
 
         self._bulk_out_max_size = int(self.Config["bulk_out_max_size"])
+        self._bulk_out_min_size = min(
+            int(self.Config["bulk_out_min_size"]), self._bulk_out_max_size
+        )
+        self._bulk_target_latency = float(self.Config["bulk_target_latency"])
+        self.BulkSize = self._bulk_out_max_size
         self._bulks = {}
 
+        compression = self.Config["compression"]
+        if compression not in ("", "gzip"):
+            raise ValueError("Unknown compression '{}'".format(compression))
+        self.Compression = compression == "gzip"
+        self.CompressionLevel = int(self.Config["compression_level"])
+        self.ProactorService = app.get_service("asab.ProactorService")
+
+        self.RetryMax = int(self.Config["retry_max"])
+        self._retry_backoff = float(self.Config["retry_backoff"])
+        self._retry_backoff_max = float(self.Config["retry_backoff_max"])
+        self._retries = {}  # Bulk -> timer handle of its retry
+
         self._timeout = float(self.Config["timeout"])
         self._started = True
 
@@ -319,18 +444,17 @@ class ElasticSearchConnection(Connection):
         self.PubSub.subscribe("Application.run!", self._start)
         self.PubSub.subscribe("Application.exit!", self._on_exit)
 
-        self._futures = []
-        for url in self.node_urls:
-            for i in range(self._loader_per_url):
-                self._futures.append((url, None))
+        self._future = None
+        self._uploads = set()
 
         self.FailLogMaxSize = int(self.Config["fail_log_max_size"])
 
         # Precise error handling
+        # The status keeps all response items, so that they are in the order of the request items
         if self.Config.getboolean("precise_error_handling"):
-            self.FilterPath = "errors,took,items.*.error,items.*._id"
+            self.FilterPath = "errors,took,items.*.error,items.*.status,items.*._id"
         else:
-            self.FilterPath = "errors,took,items.*.error"
+            self.FilterPath = "errors,took,items.*.error,items.*.status"
 
         # Create metrics counters
         metrics_service = app.get_service("asab.MetricsService")
@@ -339,12 +463,22 @@ class ElasticSearchConnection(Connection):
             init_values={
                 "ok": 0,
                 "fail": 0,
+                "retry": 0,
             },
         )
         self.QueueMetric = metrics_service.create_gauge(
             "elasticsearch.outputqueue",
             init_values={
                 "size": 0,
+                "inflight": 0,
+                "retry": 0,
+            },
+        )
+        self.BulkMetric = metrics_service.create_gauge(
+            "elasticsearch.bulk",
+            init_values={
+                "size": self.BulkSize,
+                "latency": 0.0,
             },
         )
 
@@ -384,7 +518,7 @@ class ElasticSearchConnection(Connection):
 
         bulk = self._bulks.get(index)
         if bulk is None:
-            bulk = bulk_class(self, index, self._bulk_out_max_size)
+            bulk = bulk_class(self, index, self.BulkSize)
             self._bulks[index] = bulk
 
         if bulk.consume(data_feeder_generator):
@@ -407,11 +541,17 @@ class ElasticSearchConnection(Connection):
 
         :return:
         """
-        # Wait till the queue is empty
+        # Wait till the queue is empty and all bulks are uploaded
         self.flush(forced=True)
-        while self._output_queue.qsize() > 0:
-            self.flush(forced=True)
+        self._retry_now()
+        while (
+            self._output_queue.qsize() > 0
+            or len(self._uploads) > 0
+            or len(self._retries) > 0
+        ):
             await asyncio.sleep(1)
+            self.flush(forced=True)
+            self._retry_now()
             if self._output_queue.qsize() > 0:
                 L.warn(
                     "Still have {} bulk in output queue".format(
@@ -421,15 +561,11 @@ class ElasticSearchConnection(Connection):
 
         self._started = False
 
-        # Wait till the _loader() terminates (one after another)
-        pending = [item[1] for item in self._futures]
-        self._futures = []
-        while len(pending) > 0:
-            # By sending None via queue, we signalize end of life
+        # By sending None via queue, we signalize end of life to the _dispatcher()
+        if self._future is not None:
             await self._output_queue.put(None)
-            done, pending = await asyncio.wait(
-                pending, return_when=asyncio.FIRST_COMPLETED
-            )
+            await asyncio.wait([self._future], return_when=asyncio.ALL_COMPLETED)
+            self._future = None
 
     def _on_tick(self, event_name):
         """
@@ -438,29 +574,24 @@ class ElasticSearchConnection(Connection):
         :return:
         """
         self.QueueMetric.set("size", int(self._output_queue.qsize()))
+        self.QueueMetric.set("inflight", len(self._uploads))
+        self.QueueMetric.set("retry", len(self._retries))
 
-        for i in range(len(self._futures)):
-            # 1) Check for exited futures
-            url, future = self._futures[i]
-            if future is not None and future.done():
-                # Ups, _loader() task crashed during runtime, we need to restart it
-                try:
-                    future.result()
-                    if self._started:
-                        L.error("ElasticSearch issue detected, will retry shortly")
-                except Exception as e:
-                    L.exception(
-                        f"ElasticSearch issue detected '{e}', will retry shortly"
-                    )
+        # 1) Check for exited future
+        if self._future is not None and self._future.done():
+            # Ups, _dispatcher() task crashed during runtime, we need to restart it
+            try:
+                self._future.result()
+                if self._started:
+                    L.error("ElasticSearch issue detected, will retry shortly")
+            except Exception as e:
+                L.exception(f"ElasticSearch issue detected '{e}', will retry shortly")
 
-                self._futures[i] = (url, None)
+            self._future = None
 
-            # 2) Start _loader() futures that are exitted
-            if self._started:
-                url, future = self._futures[i]
-                if future is None:
-                    future = asyncio.ensure_future(self._loader(url))
-                    self._futures[i] = (url, future)
+        # 2) Start _dispatcher() future if it exited
+        if self._started and self._future is None:
+            self._future = asyncio.ensure_future(self._dispatcher())
 
         self.flush()
 
@@ -503,58 +634,151 @@ class ElasticSearchConnection(Connection):
         if self._output_queue.qsize() == self._output_queue_max_size:
             self.PubSub.publish("ElasticSearchConnection.pause!", self)
 
-    async def _loader(self, url):
+    def _retry(self, bulk):
         """
-        Description:
+        Enqueues the bulk again after an exponential backoff with a jitter.
+        """
+        bulk.Attempts += 1
+        delay = min(
+            self._retry_backoff_max, self._retry_backoff * 2 ** (bulk.Attempts - 1)
+        )
+        delay *= random.uniform(0.5, 1.0)
+        self._retries[bulk] = self.Loop.call_later(delay, self._on_retry, bulk)
 
-        :return:
+    def _on_retry(self, bulk):
+        del self._retries[bulk]
+        self.enqueue(bulk)
+
+    def _retry_now(self):
+        for bulk, handle in self._retries.items():
+            handle.cancel()
+            self.enqueue(bulk)
+        self._retries.clear()
+
+    def _tune(self, bulk, latency):
         """
-        async with self.get_session() as session:
-            # Preflight check
-            try:
-                async with session.get(url + "_cluster/health") as resp:
-                    await resp.json()
-                    if resp.status != 200:
-                        L.error(
-                            "Cluster is not ready", struct_data={"status": resp.status}
-                        )
-                        await asyncio.sleep(5)  # Throttle a bit before next try
-                        return
+        Adjusts the size of new bulks: it is halved, when the upload was slower than the target latency
+        or ElasticSearch throttled, and it grows by a quarter, when a full bulk was uploaded
+        in less than half of the target latency.
+        """
+        self.BulkMetric.set("latency", latency)
+        if self._bulk_target_latency <= 0:
+            return
 
-            except aiohttp.client_exceptions.ServerDisconnectedError:
-                L.error("Cluster is not ready, server disconnected or not ready")
-                await asyncio.sleep(5)  # Throttle a bit before next try
-                return
+        if bulk.Throttled or latency > self._bulk_target_latency:
+            self.BulkSize = max(self._bulk_out_min_size, self.BulkSize // 2)
+        elif bulk.Capacity <= 0 and latency < self._bulk_target_latency / 2:
+            self.BulkSize = min(self._bulk_out_max_size, self.BulkSize * 5 // 4)
 
-            except OSError as e:
-                L.error("{}, cluster is not ready".format(e))
-                await asyncio.sleep(5)  # Throttle a bit before next try
-                return
+        self.BulkMetric.set("size", self.BulkSize)
 
-            except aiohttp.client_exceptions.ContentTypeError as e:
-                L.error("Failed communication {}".format(e))
-                await asyncio.sleep(20)  # Throttle a lot before next try
-                return
+    async def _acquire_node(self):
+        """
+        Waits for a node with a free upload slot, nodes are taken in the round-robin manner.
+        """
+        while True:
+            now = self.Loop.time()
+            for _ in range(len(self._nodes)):
+                node = self._nodes[self._next_node]
+                self._next_node = (self._next_node + 1) % len(self._nodes)
+                if node.DownUntil <= now and node.InFlight < self._loader_per_url:
+                    node.InFlight += 1
+                    return node
 
-            except GeneratorExit as e:
-                L.info("Generator exited {}".format(e))
-                return
+            # Wait till an upload finishes or a node that is down can be tried again
+            down = [node.DownUntil for node in self._nodes if node.DownUntil > now]
+            timeout = min(down) - now if len(down) > 0 else None
+            self._node_released.clear()
+            try:
+                await asyncio.wait_for(self._node_released.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _release_node(self, node):
+        node.InFlight -= 1
+        self._node_released.set()
 
-            # Push bulks into the ElasticSearch
-            while self._started:
+    async def _dispatcher(self):
+        """
+        Description: Takes bulks from the output queue and uploads them concurrently.
+
+        :return:
+        """
+        async with self.get_session() as session:
+            while True:
+                node = await self._acquire_node()
                 bulk = await self._output_queue.get()
                 if bulk is None:
+                    self._release_node(node)
                     break
 
                 if self._output_queue.qsize() == self._output_queue_max_size - 1:
                     self.PubSub.publish("ElasticSearchConnection.unpause!", self)
 
-                sucess = await bulk.upload(url, session, self._timeout)
-                if not sucess:
-                    # Requeue the bulk for another delivery attempt to ES
+                upload = asyncio.ensure_future(self._upload(node, session, bulk))
+                self._uploads.add(upload)
+                upload.add_done_callback(self._uploads.discard)
+
+            if len(self._uploads) > 0:
+                await asyncio.wait(list(self._uploads))
+
+    async def _upload(self, node, session, bulk):
+        try:
+            if not node.Ready:
+                node.Ready = await self._check_node(node, session)
+                if not node.Ready:
+                    # Another node (or this one later) gets the bulk
                     self.enqueue(bulk)
-                    await asyncio.sleep(5)  # Throttle a bit before next try
-                    break  # Exit the loader (new will be started automatically)
+                    return
 
+            start = self.Loop.time()
+            try:
+                done = await bulk.upload(node.Url, session, self._timeout)
+            except Exception as e:
+                L.exception("Failed to upload the bulk to ElasticSearch: {}".format(e))
+                done = False
+
+            if done:
+                self._tune(bulk, self.Loop.time() - start)
                 # Make sure the memory is emptied
                 bulk.Items = []
+                return
+
+            if bulk.Status is None:
+                # No response, check the node before it is used again
+                node.Ready = False
+            elif bulk.Throttled:
+                self._tune(bulk, self.Loop.time() - start)
+
+            # Submit the bulk (its remaining items) for another delivery attempt to ES
+            self._retry(bulk)
+
+        finally:
+            self._release_node(node)
+
+    async def _check_node(self, node, session):
+        """
+        Description: Preflight check of the health of the node, the node is not used for a while, if it fails.
+
+        :return: True if the node is ready
+        """
+        try:
+            async with session.get(node.Url + "_cluster/health") as resp:
+                await resp.json()
+                if resp.status == 200:
+                    return True
+                L.error("Cluster is not ready", struct_data={"status": resp.status})
+
+        except aiohttp.client_exceptions.ServerDisconnectedError:
+            L.error("Cluster is not ready, server disconnected or not ready")
+
+        except OSError as e:
+            L.error("{}, cluster is not ready".format(e))
+
+        except aiohttp.client_exceptions.ContentTypeError as e:
+            L.error("Failed communication {}".format(e))
+            node.DownUntil = self.Loop.time() + 20  # Throttle a lot before next try
+            return False
+
+        node.DownUntil = self.Loop.time() + 5  # Throttle a bit before next try
+        return False
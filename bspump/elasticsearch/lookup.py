@@ -31,6 +31,10 @@ class ElasticSearchLookup(MappingLookup, AsyncLookupMixin):
     *scroll_timeout* - Timeout of single scroll request (default is '1m'). Allowed time units:
     https://www.elastic.co/guide/en/elasticsearch/reference/current/common-options.html#time-units
 
+    *batch_window* - seconds to collect cache misses into a single `_msearch` request (default is 0, disabled)
+
+    *batch_size* - maximum number of keys in a single `_msearch` request (default is 100)
+
     Example:
 
     .. code:: python
@@ -112,6 +116,20 @@ class ElasticSearchLookup(MappingLookup, AsyncLookupMixin):
             "es.lookup.success", tags={}, init_values={"hit": 0, "miss": 0}
         )
 
+        # The session is shared by all requests of the lookup, so that connections are kept alive
+        self.Session = None
+        app.PubSub.subscribe("Application.exit!", self._on_exit)
+
+    def _get_session(self):
+        if self.Session is None or self.Session.closed:
+            self.Session = self.Connection.get_session()
+        return self.Session
+
+    async def _on_exit(self, message_type):
+        if self.Session is not None:
+            await self.Session.close()
+            self.Session = None
+
     async def _find_one(self, key):
         prefix = "_search"
         request = {"size": 1, "query": self.build_find_one_query(key)}
@@ -120,26 +138,61 @@ class ElasticSearchLookup(MappingLookup, AsyncLookupMixin):
 
         url = self.Connection.get_url() + "{}/{}".format(self.Index, prefix)
 
-        async with self.Connection.get_session() as session:
-            async with session.post(
-                url, json=request, headers={"Content-Type": "application/json"}
-            ) as response:
-                if response.status != 200:
-                    data = await response.text()
-                    L.error(
-                        "Failed to fetch data from ElasticSearch: {} from {}\n{}".format(
-                            response.status, url, data
-                        )
+        session = self._get_session()
+        async with session.post(
+            url, json=request, headers={"Content-Type": "application/json"}
+        ) as response:
+            if response.status != 200:
+                data = await response.text()
+                L.error(
+                    "Failed to fetch data from ElasticSearch: {} from {}\n{}".format(
+                        response.status, url, data
                     )
+                )
 
-                msg = await response.json()
-                try:
-                    hit = msg["hits"]["hits"][0]
-                except Exception:
-                    return None
+            msg = await response.json()
+            try:
+                hit = msg["hits"]["hits"][0]
+            except Exception:
+                return None
 
         return hit["_source"]
 
+    async def _find_many(self, keys):
+        lines = []
+        for key in keys:
+            request = {"size": 1, "query": self.build_find_one_query(key)}
+            if self.Timefield:
+                request["sort"] = [{self.Timefield: self.SortOrder}]
+            lines.append(json.dumps({"index": self.Index}))
+            lines.append(json.dumps(request))
+        body = "\n".join(lines) + "\n"
+
+        url = self.Connection.get_url() + "_msearch"
+
+        session = self._get_session()
+        async with session.post(
+            url, data=body, headers={"Content-Type": "application/x-ndjson"}
+        ) as response:
+            if response.status != 200:
+                data = await response.text()
+                L.error(
+                    "Failed to fetch data from ElasticSearch: {} from {}\n{}".format(
+                        response.status, url, data
+                    )
+                )
+                return {}
+
+            msg = await response.json()
+
+        values = {}
+        for key, result in zip(keys, msg.get("responses", [])):
+            try:
+                values[key] = result["hits"]["hits"][0]["_source"]
+            except (KeyError, IndexError):
+                continue
+        return values
+
     async def get(self, key):
         """
         Obtain the value from lookup asynchronously.
@@ -160,7 +213,7 @@ class ElasticSearchLookup(MappingLookup, AsyncLookupMixin):
             self.CacheCounter.add("hit", 1)
         except KeyError:
             try:
-                value = await self._find_one(key)
+                value = await self.fetch(key)
                 if value is not None:
                     self.Cache[key] = value
                     self.CacheCounter.add("miss", 1)
@@ -198,19 +251,19 @@ class ElasticSearchLookup(MappingLookup, AsyncLookupMixin):
 
         url = self.Connection.get_url() + "{}/{}".format(self.Index, prefix)
 
-        async with self.Connection.get_session() as session:
-            async with session.post(
-                url, json=request, headers={"Content-Type": "application/json"}
-            ) as response:
-                if response.status != 200:
-                    data = await response.text()
-                    L.error(
-                        "Failed to fetch data from ElasticSearch: {} from {}\n{}".format(
-                            response.status, url, data
-                        )
+        session = self._get_session()
+        async with session.post(
+            url, json=request, headers={"Content-Type": "application/json"}
+        ) as response:
+            if response.status != 200:
+                data = await response.text()
+                L.error(
+                    "Failed to fetch data from ElasticSearch: {} from {}\n{}".format(
+                        response.status, url, data
                     )
+                )
 
-                msg = await response.json()
+            msg = await response.json()
 
         return int(msg["count"])
 
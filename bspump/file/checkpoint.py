@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+
+#
+
+L = logging.getLogger(__file__)
+
+#
+
+
+class FileCheckpoint(object):
+    """
+    Position in a file, up to which its lines were passed to the pipeline.
+
+    `Offset` is the byte offset in the (decompressed) file, it is tracked only for files read in the binary mode.
+    `Line` is the number of lines passed to the pipeline.
+    `Inode` identifies the file, so that a different file of the same name is not resumed.
+    """
+
+    __slots__ = ("Path", "Inode", "Offset", "Line")
+
+    def __init__(self, path, inode, offset=0, line=0):
+        self.Path = path
+        self.Inode = inode
+        self.Offset = offset
+        self.Line = line
+
+    def to_dict(self):
+        return {
+            "path": self.Path,
+            "inode": self.Inode,
+            "offset": self.Offset,
+            "line": self.Line,
+        }
+
+
+class FileCheckpointStore(object):
+    """
+    Checkpoints of files being processed by a file source, persisted in a JSON file.
+
+    Readers update the checkpoint in memory after every line (or batch) passed to the pipeline,
+    the store is written by `save()`, that is called periodically and at the shutdown.
+    The file is written under a temporary name and renamed, so that it never appears incomplete.
+    Empty `path` disables the persistence, checkpoints are then kept in memory only.
+    """
+
+    def __init__(self, path=""):
+        self.Path = path
+        self.Checkpoints = {}  # Name of the file -> FileCheckpoint
+        self.Saved = None
+        self.load()
+
+    def load(self):
+        if self.Path == "":
+            return
+
+        try:
+            with open(self.Path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            L.exception("Error when loading file checkpoints '{}'".format(self.Path))
+            return
+
+        for item in data:
+            checkpoint = FileCheckpoint(
+                item["path"], item["inode"], item["offset"], item["line"]
+            )
+            self.Checkpoints[checkpoint.Path] = checkpoint
+        self.Saved = data
+
+    def save(self):
+        """
+        Writes the checkpoints into the file, if they changed since the last save.
+        """
+        if self.Path == "":
+            return
+
+        data = [checkpoint.to_dict() for checkpoint in self.Checkpoints.values()]
+        if data == self.Saved:
+            return
+
+        tmp_path = self.Path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.Path)
+        self.Saved = data
+
+    def open(self, filename, inode):
+        """
+        Returns the checkpoint of the file, a new one, if there is none for the inode of the file.
+        """
+        checkpoint = self.Checkpoints.get(filename)
+        if checkpoint is None or checkpoint.Inode != inode:
+            checkpoint = FileCheckpoint(filename, inode)
+            self.Checkpoints[filename] = checkpoint
+        return checkpoint
+
+    def get(self, filename):
+        return self.Checkpoints.get(filename)
+
+    def remove(self, filename):
+        self.Checkpoints.pop(filename, None)
@@ -1,16 +1,27 @@
 import asyncio
+import concurrent.futures
+import itertools
 import logging
+import mmap
 import os
+import threading
 
 import time
 
+from .checkpoint import FileCheckpoint, FileCheckpointStore
 from .globscan import iter_files_glob
+from .watchscan import FileWatcher
 from ..abc.source import TriggerSource
 
 
 L = logging.getLogger(__file__)
 
 
+def _skip_lines(f, count):
+    for _ in itertools.islice(f, count):
+        pass
+
+
 class FileABCSource(TriggerSource):
     """
     Description:
@@ -29,6 +40,13 @@ class FileABCSource(TriggerSource):
         "lines_per_event": 10000,  # the number of lines after which the read method enters the idle state to allow other operations to perform their tasks
         "event_idle_time": 0.01,  # the time for which the read method enters the idle state (see above)
         "files_per_cycle": 1,
+        "discovery": "glob",  # 'glob' scans the path in every cycle, 'watch' watches it for filesystem events
+        "read_ahead": 0,  # the number of line blocks read ahead by a worker thread, 0 disables the read-ahead
+        "read_ahead_block_size": 1048576,  # the approximate size of a line block in bytes (1 MiB)
+        "mmap": False,  # memory-map uncompressed files opened in the binary mode
+        "mmap_memoryview": False,  # emit memoryview slices of the memory-mapped file instead of bytes
+        "checkpoint_path": "",  # JSON file to persist checkpoints of files in. Make sure it's outside of the glob search
+        "checkpoint_interval": 1.0,  # the minimal time in seconds between saves of checkpoints
     }
 
     def __init__(self, app, pipeline, id=None, config=None):
@@ -70,6 +88,27 @@ class FileABCSource(TriggerSource):
                         The time for which the read method enters the idle state (see above).
                 files_per_cycle : int, default = 1
                         The number of files that are processed in one cycle.
+                discovery : str, default = 'glob'
+                        'glob' scans the path in every cycle, 'watch' scans it once and then watches it
+                        for filesystem events (inotify) by the `watchdog` package, see `FileWatcher`.
+                        It falls back to 'glob', if the path can't be watched.
+                read_ahead : int, default = 0
+                        The number of line blocks read ahead by a worker thread, 0 disables the read-ahead.
+                        With the read-ahead, files of one cycle are processed concurrently.
+                read_ahead_block_size : int, default = 1024 * 1024
+                        The approximate size of a line block in bytes.
+                mmap : bool, default = False
+                        Memory-map uncompressed files opened in the binary mode, see `read_mmap()`.
+                        With `mmap_memoryview`, FileBlockSource passes the mapped file as a memoryview.
+                mmap_memoryview : bool, default = False
+                        Emit memoryview slices of the memory-mapped file instead of bytes.
+                        The slices are valid only until the file is processed, processors must copy
+                        them by `bytes()` to keep them.
+                checkpoint_path : str, default = ''
+                        JSON file to persist checkpoints of files in, empty disables the persistence, see `resume()`.
+                        Make sure it's outside of the glob search.
+                checkpoint_interval : float, default = 1.0
+                        The minimal time in seconds between saves of checkpoints.
         """
         super().__init__(app, pipeline, id=id, config=config)
         self.path = self.Config["path"]
@@ -99,6 +138,16 @@ class FileABCSource(TriggerSource):
                 )
         self.encoding = conf_encoding if len(conf_encoding) > 0 else None
 
+        self.Discovery = self.Config["discovery"]
+        if self.Discovery not in ["glob", "watch"]:
+            L.warning(
+                "Incorrect/unknown 'discovery' configuration value '{}' - defaulting to 'glob'".format(
+                    self.Discovery
+                )
+            )
+            self.Discovery = "glob"
+        self.Watchers = None
+
         self.MoveDestination = self.Config["move_destination"]
 
         if self.MoveDestination != "":
@@ -130,12 +179,118 @@ class FileABCSource(TriggerSource):
         self.LinesPerEvent = int(self.Config["lines_per_event"])
         self.EventIdleTime = float(self.Config["event_idle_time"])
 
+        self.ReadAhead = int(self.Config["read_ahead"])
+        self.ReadAheadBlockSize = int(self.Config["read_ahead_block_size"])
+
+        self.MMap = self.Config.getboolean("mmap")
+        self.MMapMemoryView = self.Config.getboolean("mmap_memoryview")
+
+        self.CheckpointStore = FileCheckpointStore(self.Config["checkpoint_path"])
+        self.CheckpointInterval = float(self.Config["checkpoint_interval"])
+        self.CheckpointSavedAt = self.Loop.time()
+        self.ResumeLocked = True  # Files left locked are resumed in the first cycle
+        self.ResumedCount = 0
+        self.CheckpointGauge = metrics_service.create_gauge(
+            "file_checkpoint",
+            tags={
+                "pipeline": pipeline.Id,
+            },
+            init_values={
+                "files": len(self.CheckpointStore.Checkpoints),
+                "resumed": 0,
+                "resume_offset": 0,
+                "resume_line": 0,
+            },
+        )
+        app.PubSub.subscribe("Application.tick!", self._on_tick)
+        app.PubSub.subscribe("Application.exit!", self._on_exit)
+
+    def _on_tick(self, event_name):
+        self.CheckpointGauge.set("files", len(self.CheckpointStore.Checkpoints))
+        if self.Loop.time() - self.CheckpointSavedAt >= self.CheckpointInterval:
+            self.save_checkpoints()
+
+    def _on_exit(self, event_name):
+        self.save_checkpoints()
+        if self.Watchers is not None:
+            for watcher in self.Watchers:
+                watcher.stop()
+
+    def save_checkpoints(self):
+        self.CheckpointSavedAt = self.Loop.time()
+        try:
+            self.CheckpointStore.save()
+        except OSError:
+            L.exception("Error when saving file checkpoints")
+
     async def cycle(self):
         """
         Cycles through files that match the glob pattern.
         """
         filename = None
 
+        if self.ResumeLocked:
+            # Files left locked by a previous run (e.g. after a crash) are resumed first
+            self.ResumeLocked = False
+            resumable = await self.ProactorService.execute(self.find_resumable)
+            if len(resumable) > 0:
+                await self.Pipeline.ready()
+                for filename in resumable:
+                    await self.lock_and_read_file(filename, locked=True)
+
+        if self.Discovery == "watch":
+            filenames = await self.watch_files()
+        else:
+            filenames = await self.scan_files()
+
+        if len(filenames) == 0:
+            self.Pipeline.PubSub.publish("bspump.file_source.no_files!")
+            return  # No file to read
+
+        await self.Pipeline.ready()
+        filenames = filenames[: self.files_per_cycle]
+        if self.ReadAhead > 0 and len(filenames) > 1:
+            # Files are read by worker threads, so they are processed concurrently
+            await asyncio.gather(
+                *[self.lock_and_read_file(filename) for filename in filenames]
+            )
+            return
+
+        for filename in filenames:
+            await self.lock_and_read_file(filename)
+
+    async def watch_files(self):
+        """
+        Returns files ready to be processed discovered by `FileWatcher` (the 'watch' discovery).
+        The watchers are started in the first call, if any of them fails to start, the source falls back to scanning.
+        """
+        if self.Watchers is None:
+            self.Watchers = []
+            for path in self.path.split(os.pathsep):
+                if path == "":
+                    continue
+                watcher = FileWatcher(
+                    path, self.Gauge, self.Loop, self.exclude, self.include
+                )
+                self.Watchers.append(watcher)
+                if not await self.ProactorService.execute(watcher.start):
+                    for watcher in self.Watchers:
+                        watcher.stop()
+                    self.Watchers = None
+                    self.Discovery = "glob"
+                    return await self.scan_files()
+
+        filenames = []
+        for watcher in self.Watchers:
+            filenames.extend(watcher.pop(self.files_per_cycle - len(filenames)))
+            if len(filenames) >= self.files_per_cycle:
+                break
+        return filenames
+
+    async def scan_files(self):
+        """
+        Returns files ready to be processed found by glob scans of the path (the 'glob' discovery).
+        """
         start_time = time.time()
         filenames = []
         for path in self.path.split(os.pathsep):
@@ -154,27 +309,44 @@ class FileABCSource(TriggerSource):
                 break
         end_time = time.time()
         self.Gauge.set("scan_time", end_time - start_time)
+        return filenames
 
-        if len(filenames) == 0:
-            self.Pipeline.PubSub.publish("bspump.file_source.no_files!")
-            return  # No file to read
-
-        await self.Pipeline.ready()
-        for filename in filenames[: self.files_per_cycle]:
-            await self.lock_and_read_file(filename)
-
-    async def lock_and_read_file(self, filename):
+    def find_resumable(self):
+        """
+        Returns names of files that are locked and have a checkpoint of the same inode.
+        """
+        resumable = []
+        for filename, checkpoint in self.CheckpointStore.Checkpoints.items():
+            try:
+                inode = os.stat(filename + "-locked").st_ino
+            except OSError:
+                continue
+            if inode == checkpoint.Inode:
+                resumable.append(filename)
+        return resumable
+
+    async def lock_and_read_file(self, filename, locked=False):
+        """
+        Locks the file by renaming it to `<filename>-locked`, reads it and finalizes it according to `post`.
+        `locked` is True for a file that is already locked, i.e. it is being resumed.
+        """
         # Lock the file
         L.debug("Locking file '{}'".format(filename))
         locked_filename = filename + "-locked"
         try:
-            os.rename(filename, locked_filename)
+            if not locked:
+                os.rename(filename, locked_filename)
+            inode = os.stat(locked_filename).st_ino
         except FileNotFoundError:
             return
         except (OSError, PermissionError):  # OSError - UNIX, PermissionError - Windows
             L.exception(
                 "Error when locking the file '{}'  - will try again".format(filename)
             )
+            if self.Watchers is not None and not locked:
+                # No filesystem event would bring the file back to the queue
+                for watcher in self.Watchers:
+                    watcher.requeue(filename)
             return
         except BaseException as e:
             L.exception("Error when locking the file '{}'".format(filename))
@@ -182,30 +354,13 @@ class FileABCSource(TriggerSource):
             return
 
         try:
-            if filename.endswith(".gz"):
-                import gzip
-
-                f = gzip.open(locked_filename, self.mode, encoding=self.encoding)
-
-            elif filename.endswith(".bz2"):
-                import bz2
-
-                f = bz2.open(locked_filename, self.mode, encoding=self.encoding)
-
-            elif filename.endswith(".xz") or filename.endswith(".lzma"):
-                import lzma
-
-                f = lzma.open(locked_filename, self.mode, encoding=self.encoding)
-
-            else:
-                if "b" in self.mode:  # Binary mode doesn't take a newline argument
-                    self.newline = None
-                f = open(
-                    locked_filename,
-                    self.mode,
-                    newline=self.newline,
-                    encoding=self.encoding,
+            if self.ReadAhead > 0:
+                # Opening of a compressed file reads its header
+                f = await self.ProactorService.execute(
+                    self.open_file, filename, locked_filename
                 )
+            else:
+                f = self.open_file(filename, locked_filename)
 
         except (OSError, PermissionError):  # OSError - UNIX, PermissionError - Windows
             L.exception(
@@ -218,10 +373,13 @@ class FileABCSource(TriggerSource):
             return
 
         L.debug("Processing file '{}'".format(filename))
+        self.CheckpointStore.open(filename, inode)
 
         try:
             await self.read(filename, f)
         except Exception:
+            # The checkpoint is kept, the file is resumed, when it is processed again
+            self.save_checkpoints()
             try:
                 if self.post == "noop":
                     # When we should stop, rename file back to original
@@ -240,6 +398,8 @@ class FileABCSource(TriggerSource):
             f.close()
 
         L.debug("File '{}' processed {}".format(filename, "succefully"))
+        self.CheckpointStore.remove(filename)
+        self.save_checkpoints()
 
         # Finalize
         try:
@@ -269,15 +429,271 @@ class FileABCSource(TriggerSource):
             self.Pipeline.set_error(None, None, e)
             return
 
-    async def simulate_event(self):
+    def is_compressed(self, filename):
+        return filename.endswith((".gz", ".bz2", ".xz", ".lzma"))
+
+    def can_mmap(self, filename):
+        """
+        Returns True, if the file should be memory-mapped (see `mmap` configuration).
+        """
+        return self.MMap and "b" in self.mode and not self.is_compressed(filename)
+
+    def get_checkpoint(self, filename):
+        """
+        Returns the checkpoint of the file being read, readers update it after passing lines to the pipeline.
+        """
+        checkpoint = self.CheckpointStore.get(filename)
+        if checkpoint is None:
+            # The file is not read by `lock_and_read_file()`
+            checkpoint = FileCheckpoint(filename, None)
+        return checkpoint
+
+    def _report_resume(self, filename, checkpoint):
+        L.info(
+            "Resuming the file '{}' at the line {} (offset {})".format(
+                filename, checkpoint.Line, checkpoint.Offset
+            )
+        )
+        self.ResumedCount += 1
+        self.CheckpointGauge.set("resumed", self.ResumedCount)
+        self.CheckpointGauge.set("resume_offset", checkpoint.Offset)
+        self.CheckpointGauge.set("resume_line", checkpoint.Line)
+
+    async def resume(self, filename, f):
+        """
+        Moves the file `f` to the position of its checkpoint, so that lines passed to the pipeline before
+        (by a previous run or before the processing failed) are not processed again.
+
+        Uncompressed files read in the binary mode are moved by `seek()` to the byte offset,
+        lines of other files are skipped (in a worker thread).
+
+        **Parameters**
+
+        filename : str
+                Name of the file.
+
+        f :
+                Opened file object.
+
+        :return: the checkpoint of the file
+
+        """
+        checkpoint = self.get_checkpoint(filename)
+        if checkpoint.Line == 0 and checkpoint.Offset == 0:
+            return checkpoint
+
+        if "b" in self.mode and not self.is_compressed(filename):
+            f.seek(checkpoint.Offset)
+        else:
+            await self.ProactorService.execute(_skip_lines, f, checkpoint.Line)
+
+        self._report_resume(filename, checkpoint)
+        return checkpoint
+
+    def iter_mmap_lines(self, mm, offset, end):
+        """
+        Yields lines of the memory-mapped file `mm` from `offset` up to the `end` offset, with their end offsets.
+        Newlines are found by `mmap.find()`, which searches the memory in C,
+        lines are bytes or memoryview slices (see `mmap_memoryview` configuration).
+        """
+        view = memoryview(mm) if self.MMapMemoryView else mm
+        try:
+            while offset < end:
+                newline = mm.find(b"\n", offset, end)
+                line_end = end if newline < 0 else newline + 1
+                yield view[offset:line_end], line_end
+                offset = line_end
+        finally:
+            if self.MMapMemoryView:
+                view.release()
+
+    async def read_mmap(self, filename, f, batch_size=0):
+        """
+        Memory-maps the file `f` and passes its lines to the pipeline, or batches of `batch_size` lines, if set.
+
+        The reading starts at the byte offset of the checkpoint of the file (see `resume()`),
+        the checkpoint is updated after lines are passed to the pipeline.
+
+        **Parameters**
+
+        filename : str
+                Name of the file.
+
+        f :
+                File opened in the binary mode.
+
+        batch_size : int, default = 0
+                The number of lines passed to the pipeline at once, 0 means line by line.
+
+        """
+        size = os.fstat(f.fileno()).st_size
+        checkpoint = self.get_checkpoint(filename)
+        offset = checkpoint.Offset
+        if offset > size:
+            L.warning(
+                "Offset {} is beyond the end of the file '{}', reading from the start".format(
+                    offset, filename
+                )
+            )
+            offset = checkpoint.Offset = checkpoint.Line = 0
+        elif offset > 0:
+            self._report_resume(filename, checkpoint)
+        if size == 0 or offset == size:
+            return  # Empty files can't be mapped
+
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        lines = self.iter_mmap_lines(mm, offset, size)
+        context = {"filename": filename}
+        batch = []
+        try:
+            for line, line_end in lines:
+                if batch_size > 0:
+                    batch.append(line)
+                    if len(batch) < batch_size and line_end < size:
+                        continue
+                    await self.process_batch(batch, context)
+                    await self.simulate_event(len(batch))
+                    checkpoint.Line += len(batch)
+                    batch = []
+                else:
+                    await self.process(line, context)
+                    await self.simulate_event()
+                    checkpoint.Line += 1
+
+                checkpoint.Offset = line_end
+
+        finally:
+            batch = None
+            line = None
+            lines.close()
+            try:
+                mm.close()
+            except BufferError:
+                L.warning(
+                    "Memoryview slices of the file '{}' are still referenced".format(
+                        filename
+                    )
+                )
+
+    def open_file(self, filename, locked_filename):
+        """
+        Opens the locked file, `.gz`, `.bz2`, `.xz` and `.lzma` files are decompressed.
+
+        **Parameters**
+
+        filename : str
+                Original name of the file, its suffix determines the compression.
+
+        locked_filename : str
+                Name of the locked file to open.
+
+        :return: file object
+
+        """
+        if filename.endswith(".gz"):
+            import gzip
+
+            return gzip.open(locked_filename, self.mode, encoding=self.encoding)
+
+        elif filename.endswith(".bz2"):
+            import bz2
+
+            return bz2.open(locked_filename, self.mode, encoding=self.encoding)
+
+        elif filename.endswith(".xz") or filename.endswith(".lzma"):
+            import lzma
+
+            return lzma.open(locked_filename, self.mode, encoding=self.encoding)
+
+        if "b" in self.mode:  # Binary mode doesn't take a newline argument
+            self.newline = None
+        return open(
+            locked_filename,
+            self.mode,
+            newline=self.newline,
+            encoding=self.encoding,
+        )
+
+    async def read_ahead(self, f, read_block=None):
+        """
+        Reads the file `f` in a worker thread of the ProactorService and yields blocks (lists) of lines.
+
+        The decompression and the line splitting run in the worker thread, which reads up to `read_ahead` blocks
+        of about `read_ahead_block_size` bytes ahead of the pipeline. When the queue of blocks is full,
+        the worker waits, so that a slow pipeline applies the back pressure to the reading.
+        Close the generator by `aclose()` before the file is closed, also when the reading fails.
+
+        **Parameters**
+
+        f :
+                Opened file object.
+
+        read_block : callable, default = None
+                Called in the worker thread to read the next block, an empty block ends the reading.
+                Blocks of lines are read by default.
+
+        """
+        if read_block is None:
+
+            def read_block():
+                return f.readlines(self.ReadAheadBlockSize)
+
+        queue = asyncio.Queue(maxsize=max(self.ReadAhead, 1))
+        stop = threading.Event()
+
+        def put(item):
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), self.Loop)
+            while True:
+                try:
+                    return future.result(timeout=1.0)
+                except concurrent.futures.TimeoutError:
+                    if stop.is_set() or self.Loop.is_closed():
+                        future.cancel()
+                        return
+
+        def reader():
+            # zlib, bz2 and lzma release the GIL, so the decompression runs in parallel with the loop
+            try:
+                while not stop.is_set():
+                    block = read_block()
+                    if not block:
+                        break
+                    put(block)
+            finally:
+                put(None)
+
+        worker = self.ProactorService.execute(reader)
+        try:
+            while True:
+                block = await queue.get()
+                if block is None:
+                    break
+                yield block
+
+            await worker  # Raises an error of the reader
+
+        finally:
+            # Release the worker (it may wait for a free slot in the queue) before the file is closed
+            stop.set()
+            while not worker.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.wait([worker], timeout=0.01)
+
+    async def simulate_event(self, lines=1):
         """
         The simulate_event method should be called in read method after a file line has been processed.
 
         It ensures that all other asynchronous events receive enough time to perform their tasks.
         Otherwise, the application loop is blocked by a file reader and no other activity makes a progress.
 
+        **Parameters**
+
+        lines : int, default = 1
+                The number of lines that have been processed since the last call.
+
         """
-        self.LinesCounter += 1
+        self.LinesCounter += lines
         if self.LinesCounter >= self.LinesPerEvent:
             await asyncio.sleep(self.EventIdleTime)
             self.LinesCounter = 0
@@ -342,6 +758,9 @@ try:
                     def publish(self, *args, **kwargs):
                         pass
 
+                    def subscribe(self, *args, **kwargs):
+                        pass
+
                 self.PubSub = FakePubSub()
 
             async def ready(self):
@@ -1,5 +1,7 @@
 import asyncio
 import logging
+import mmap
+import os
 
 from .fileabcsource import FileABCSource
 
@@ -47,6 +49,10 @@ class FileBlockSource(FileABCSource):
 
         """
         await self.Pipeline.ready()
+        if self.can_mmap(filename) and self.MMapMemoryView:
+            await self.read_mmap_block(filename, f)
+            return
+
         # Load the file in a worker thread (to prevent blockage of the main loop)
         worker = self.ProactorService.execute(f.read)
 
@@ -57,3 +63,39 @@ class FileBlockSource(FileABCSource):
 
         event = worker.result()
         await self.process(event, {"filename": filename})
+
+    async def read_mmap_block(self, filename, f):
+        """
+        Memory-maps the file and passes it to the pipeline as a memoryview without copying,
+        if `mmap` and `mmap_memoryview` are enabled.
+
+        The memoryview is released when `process()` returns, so processors must not keep the event
+        (or slices of it) beyond the processing, e.g. in queues or batches; they have to copy it by `bytes()`.
+
+        **Parameters**
+
+        filename : str
+                Name of the file.
+
+        f :
+                File opened in the binary mode.
+
+        """
+        if os.fstat(f.fileno()).st_size == 0:
+            await self.process(b"", {"filename": filename})
+            return
+
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        event = memoryview(mm)
+        try:
+            await self.process(event, {"filename": filename})
+        finally:
+            event.release()
+            try:
+                mm.close()
+            except BufferError:
+                L.warning(
+                    "Memoryview slices of the file '{}' are still referenced".format(
+                        filename
+                    )
+                )
@@ -1,18 +1,183 @@
 import logging
 import json
+
+import numpy as np
+import orjson
+
 from .fileabcsource import FileABCSource
 
 
 L = logging.getLogger(__file__)
 
 
+_BACKSLASH, _QUOTE, _COMMA = ord("\\"), ord('"'), ord(",")
+
+
+class JSONArrayParser(object):
+    """
+    Incremental parser of a top-level JSON array, its items are parsed one by one by `orjson`.
+
+    `feed()` finds commas that separate the items of the array by vectorized NumPy operations:
+    quotes that are not escaped delimit strings, brackets and braces outside of strings give the nesting depth.
+    The state at the end of the data is kept for the next `feed()`, as well as the unfinished item,
+    so the memory is bounded by the size of the largest item and not by the size of the file.
+    """
+
+    def __init__(self):
+        self.Buffer = b""  # The unfinished item
+        self.Depth = 0
+        self.InString = False
+        self.Escaped = False  # The next character is escaped by a backslash
+        self.Items = 0
+        self.Started = False
+        self.Ended = False
+
+    def feed(self, data):
+        """
+        Returns the list of items of the array completed by `data`.
+        """
+        if self.Ended:
+            if len(data.strip()) > 0:
+                raise ValueError("Extra data after the JSON array")
+            return []
+
+        if not self.Started:
+            stripped = data.lstrip()
+            if len(stripped) == 0:
+                return []
+            if stripped[0] != ord("["):
+                raise ValueError("The top-level JSON value is not an array")
+            self.Started = True
+            # The items start after the opening bracket, it is counted in the depth below
+            self.Depth = 1
+            data = stripped[1:]
+
+        if len(data) == 0:
+            return []
+
+        chars = np.frombuffer(data, dtype=np.uint8)
+        quotes = chars == _QUOTE
+        escaped = self._escaped(chars)
+        if escaped is not None:
+            quotes &= ~escaped
+
+        # Parity of the number of quotes up to the character, odd inside a string
+        parity = np.cumsum(quotes, dtype=np.int64)
+        if self.InString:
+            parity += 1
+        outside = (parity & 1) == 0
+
+        opening = ((chars == ord("[")) | (chars == ord("{"))) & outside
+        closing = ((chars == ord("]")) | (chars == ord("}"))) & outside
+        depth = self.Depth + np.cumsum(opening, dtype=np.int64) - np.cumsum(closing)
+
+        separators = np.flatnonzero((chars == _COMMA) & outside & (depth == 1))
+        ends = np.flatnonzero(closing & (depth == 0))
+
+        buf = self.Buffer + data
+        offset = len(self.Buffer)
+        start = 0
+        items = []
+
+        if len(ends) > 0:
+            end = ends[0]
+            for separator in separators[separators < end].tolist():
+                self._append(items, buf[start : offset + separator])
+                start = offset + separator + 1
+            self._append(items, buf[start : offset + end], last=True)
+            if len(data[end + 1 :].strip()) > 0:
+                raise ValueError("Extra data after the JSON array")
+            self.Ended = True
+            self.Buffer = b""
+            return items
+
+        for separator in separators.tolist():
+            self._append(items, buf[start : offset + separator])
+            start = offset + separator + 1
+
+        self.Buffer = buf[start:]
+        self.Depth = int(depth[-1])
+        self.InString = bool(parity[-1] & 1)
+        return items
+
+    def _escaped(self, chars):
+        """
+        Returns the mask of characters escaped by a backslash, None if there is none.
+        Backslashes are rare, so they are walked in Python.
+        """
+        backslashes = np.flatnonzero(chars == _BACKSLASH)
+        if len(backslashes) == 0 and not self.Escaped:
+            return None
+
+        escaped = np.zeros(len(chars), dtype=bool)
+        following = 0 if self.Escaped else -1  # Position of the escaped character
+        if following == 0:
+            escaped[0] = True
+        for position in backslashes.tolist():
+            if position == following:
+                continue  # An escaped backslash
+            following = position + 1
+            if following < len(chars):
+                escaped[following] = True
+        self.Escaped = following == len(chars)
+        return escaped
+
+    def _append(self, items, item, last=False):
+        if last and self.Items == 0 and len(item.strip()) == 0:
+            return  # Empty array
+        items.append(orjson.loads(item))
+        self.Items += 1
+
+    def close(self):
+        if not self.Ended:
+            raise ValueError("Incomplete JSON array")
+        return []
+
+
+class NDJSONParser(object):
+    """
+    Incremental parser of newline-delimited JSON, every non-empty line is parsed by `orjson`.
+    """
+
+    def __init__(self):
+        self.Buffer = b""
+
+    def feed(self, data):
+        """
+        Returns the list of records of lines completed by `data`.
+        """
+        end = data.rfind(b"\n")
+        if end < 0:
+            self.Buffer += data
+            return []
+
+        lines = (self.Buffer + data[:end]).split(b"\n")
+        self.Buffer = data[end + 1 :]
+        return [orjson.loads(line) for line in lines if len(line.strip()) > 0]
+
+    def close(self):
+        buf, self.Buffer = self.Buffer, b""
+        if len(buf.strip()) == 0:
+            return []
+        return [orjson.loads(buf)]
+
+
 class FileJSONSource(FileABCSource):
     """
     Description: This file source is optimized to load even large JSONs from a file and parse that.
     The loading & parsing is off-loaded to the worker thread so that it doesn't block the IO loop.
 
+    By default, the whole file is parsed into a single event. With the `stream` configuration,
+    items of a top-level JSON array ('array') or lines of a newline-delimited JSON ('ndjson')
+    are emitted as individual events, so that the memory doesn't grow with the size of the file.
+
     """
 
+    ConfigDefaults = {
+        "stream": "",  # '' parses the whole file into one event, 'array' or 'ndjson' stream records as events
+        "batch_size": 0,  # the number of streamed records passed to the pipeline at once, 0 means one by one
+    }
+
     def __init__(self, app, pipeline, id=None, config=None):
         """
         Description:
@@ -28,11 +193,41 @@ class FileJSONSource(FileABCSource):
 
         config : JSON, default = None
                 configuration file with additional information
+                stream : str, default = ''
+                        '' parses the whole file into one event by `json.load`.
+                        'array' emits items of the top-level JSON array, 'ndjson' emits lines of newline-delimited JSON,
+                        records are parsed by `orjson` in a worker thread, that reads up to `read_ahead` (at least one)
+                        blocks of `read_ahead_block_size` bytes ahead of the pipeline, see `read_ahead()`.
+                batch_size : int, default = 0
+                        The number of streamed records passed to the pipeline at once using `process_batch()`,
+                        0 means one by one.
 
         """
         super().__init__(app, pipeline, id=id, config=config)
         self.ProactorService = app.get_service("asab.ProactorService")
 
+        self.Stream = self.Config["stream"]
+        if self.Stream not in ["", "array", "ndjson"]:
+            L.warning(
+                "Incorrect/unknown 'stream' configuration value '{}' - defaulting to ''".format(
+                    self.Stream
+                )
+            )
+            self.Stream = ""
+        self.BatchSize = int(self.Config["batch_size"])
+
+        metrics_service = app.get_service("asab.MetricsService")
+        self.StreamCounter = metrics_service.create_eps_counter(
+            "file_json_stream",
+            tags={
+                "pipeline": pipeline.Id,
+            },
+            init_values={
+                "bytes": 0,
+                "records": 0,
+            },
+        )
+
     async def read(self, filename, f):
         """
         Description:
@@ -46,7 +241,64 @@ class FileJSONSource(FileABCSource):
         """
         await self.Pipeline.ready()
 
+        if self.Stream != "":
+            await self.read_stream(filename, f)
+            return
+
         worker = self.ProactorService.execute(json.load, f)
         await worker
         event = worker.result()
         await self.process(event, {"filename": filename})
+
+    async def read_stream(self, filename, f):
+        """
+        Parses records of the file incrementally in a worker thread and passes them to the pipeline.
+        The worker waits, when the pipeline falls behind by `read_ahead` blocks.
+
+        **Parameters**
+
+        filename :
+
+        f :
+
+        """
+        if self.Stream == "array":
+            parser = JSONArrayParser()
+        else:
+            parser = NDJSONParser()
+
+        def read_block():
+            # Reads until at least one record is parsed, so that a large record doesn't end the reading
+            size = 0
+            records = []
+            while len(records) == 0:
+                data = f.read(self.ReadAheadBlockSize)
+                if len(data) == 0:
+                    records = parser.close()
+                    break
+                if isinstance(data, str):
+                    data = data.encode("utf-8")
+                size += len(data)
+                records = parser.feed(data)
+
+            if size == 0 and len(records) == 0:
+                return None
+            return size, records
+
+        context = {"filename": filename}
+        blocks = self.read_ahead(f, read_block)
+        try:
+            async for size, records in blocks:
+                self.StreamCounter.add("bytes", size)
+                if self.BatchSize <= 0:
+                    for record in records:
+                        await self.process(record, {"filename": filename})
+                        await self.simulate_event()
+                else:
+                    for i in range(0, len(records), self.BatchSize):
+                        batch = records[i : i + self.BatchSize]
+                        await self.process_batch(batch, context)
+                        await self.simulate_event(len(batch))
+                self.StreamCounter.add("records", len(records))
+        finally:
+            await blocks.aclose()
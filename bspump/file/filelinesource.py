@@ -1,3 +1,4 @@
+import itertools
 import logging
 
 from .fileabcsource import FileABCSource
@@ -17,6 +18,10 @@ class FileLineSource(FileABCSource):
 
     """
 
+    ConfigDefaults = {
+        "batch_size": 0,  # the number of lines passed to the pipeline at once, 0 means line by line
+    }
+
     def __init__(self, app, pipeline, id=None, config=None):
         """
         Description:
@@ -33,9 +38,12 @@ class FileLineSource(FileABCSource):
 
         config : JSON, default = None
                 Configuration file with additional information
+                batch_size : int, default = 0
+                        The number of lines passed to the pipeline at once using `process_batch()`, 0 means line by line.
 
         """
         super().__init__(app, pipeline, id=id, config=config)
+        self.BatchSize = int(self.Config["batch_size"])
 
     async def read(self, filename, f):
         """
@@ -49,11 +57,97 @@ class FileLineSource(FileABCSource):
 
         """
 
+        if self.can_mmap(filename):
+            await self.read_mmap(filename, f, self.BatchSize)
+            return
+
+        checkpoint = await self.resume(filename, f)
+
+        if self.ReadAhead > 0:
+            await self.read_blocks(filename, f, checkpoint)
+            return
+
+        if self.BatchSize > 0:
+            await self.read_batches(filename, f, checkpoint)
+            return
+
+        binary = "b" in self.mode  # Byte offsets are tracked in the binary mode only
         for line in f:
             await self.process(line, {"filename": filename})
+            checkpoint.Line += 1
+            if binary:
+                checkpoint.Offset += len(line)
 
             await self.simulate_event()
 
+    def _commit(self, checkpoint, lines):
+        checkpoint.Line += len(lines)
+        if "b" in self.mode:
+            checkpoint.Offset += sum(len(line) for line in lines)
+
+    async def read_batches(self, filename, f, checkpoint=None):
+        """
+        Reads the file in batches of `batch_size` lines and passes them to the pipeline at once.
+
+        **Parameters**
+
+        filename :
+
+        f :
+
+        checkpoint : FileCheckpoint, default = None
+                Checkpoint of the file to update, see `get_checkpoint()`.
+
+        """
+        if checkpoint is None:
+            checkpoint = self.get_checkpoint(filename)
+        context = {"filename": filename}
+        while True:
+            lines = list(itertools.islice(f, self.BatchSize))
+            if len(lines) == 0:
+                break
+
+            await self.process_batch(lines, context)
+            self._commit(checkpoint, lines)
+
+            await self.simulate_event(len(lines))
+
+    async def read_blocks(self, filename, f, checkpoint=None):
+        """
+        Reads the file by blocks of lines read ahead by a worker thread (see `read_ahead()`)
+        and passes them to the pipeline line by line or in batches of `batch_size` lines.
+
+        **Parameters**
+
+        filename :
+
+        f :
+
+        checkpoint : FileCheckpoint, default = None
+                Checkpoint of the file to update, see `get_checkpoint()`.
+
+        """
+        if checkpoint is None:
+            checkpoint = self.get_checkpoint(filename)
+        context = {"filename": filename}
+        blocks = self.read_ahead(f)
+        try:
+            async for lines in blocks:
+                if self.BatchSize <= 0:
+                    for line in lines:
+                        await self.process(line, {"filename": filename})
+                        self._commit(checkpoint, (line,))
+                        await self.simulate_event()
+                    continue
+
+                for i in range(0, len(lines), self.BatchSize):
+                    batch = lines[i : i + self.BatchSize]
+                    await self.process_batch(batch, context)
+                    self._commit(checkpoint, batch)
+                    await self.simulate_event(len(batch))
+        finally:
+            await blocks.aclose()
+
 
 #
 
@@ -40,29 +40,47 @@ def iter_files_glob(path, gauge, loop, exclude="", include=""):
     loop.call_soon_threadsafe(_file_check, filelist_to_check, gauge)
 
     for fname in filelist:
-        if any(
-            [
-                fname.endswith("-locked"),
-                fname.endswith("-failed"),
-                fname.endswith("-processed"),
-                not os.path.isfile(fname),
-            ]
-        ):
-            continue
-
-        if exclude != "":
-            if fnmatch.fnmatch(fname, exclude):
-                continue
-        if include != "":
-            if not fnmatch.fnmatch(fname, include):
-                continue
-
-        if _is_file_open(fname):
+        if not is_ready_file(fname, exclude, include):
             continue
         yield fname
     return
 
 
+def is_ready_file(fname, exclude="", include=""):
+    """
+    Returns True, if the file is ready to be processed, i.e. it is not locked, failed or processed,
+    it is a regular file and it matches `include` and not `exclude` globs.
+    """
+    if file_state(fname) != "unprocessed":
+        return False
+    if not os.path.isfile(fname):
+        return False
+
+    if exclude != "":
+        if fnmatch.fnmatch(fname, exclude):
+            return False
+    if include != "":
+        if not fnmatch.fnmatch(fname, include):
+            return False
+
+    if _is_file_open(fname):
+        return False
+    return True
+
+
+def file_state(fname):
+    """
+    Returns the state of the file by its suffix: "locked", "failed", "processed" or "unprocessed".
+    """
+    if fname.endswith("-locked"):
+        return "locked"
+    if fname.endswith("-failed"):
+        return "failed"
+    if fname.endswith("-processed"):
+        return "processed"
+    return "unprocessed"
+
+
 def _glob_scan(path, gauge, loop, exclude="", include=""):
     try:
         return iter_files_glob(path, gauge, loop, exclude, include).__next__()
@@ -81,17 +99,7 @@ def _file_check(filelist, gauge):
 
     file_count["all_files"] += len(filelist)
     for file in filelist:
-        if file.endswith("-locked"):
-            file_count["locked"] += 1
-            continue
-        if file.endswith("-failed"):
-            file_count["failed"] += 1
-            continue
-        if file.endswith("-processed"):
-            file_count["processed"] += 1
-            continue
-
-        file_count["unprocessed"] += 1
+        file_count[file_state(file)] += 1
 
     gauge.set("processed", file_count["processed"])
     gauge.set("failed", file_count["failed"])
@@ -0,0 +1,171 @@
+import fnmatch
+import glob
+import logging
+import os
+import time
+
+from .globscan import file_state, is_ready_file
+
+#
+
+L = logging.getLogger(__file__)
+
+#
+
+
+def _watch_root(path):
+    """
+    Returns the directory to watch for the glob `path`, i.e. its longest prefix without wildcards,
+    and whether it has to be watched recursively.
+    """
+    parts = path.split(os.sep)
+    for i, part in enumerate(parts):
+        if glob.has_magic(part):
+            root = os.sep.join(parts[:i]) or os.sep
+            return root, i < len(parts) - 1 or "**" in path
+    return os.path.dirname(path) or os.curdir, False
+
+
+class FileWatcher(object):
+    """
+    Discovers files that match the glob `path` by filesystem events (inotify on Linux) of the `watchdog` package
+    instead of repeated glob scans.
+
+    The directory is scanned once, when the watcher starts, then the queue of files ready to be processed
+    and the counters of files by their state (see `file_state()`) are maintained by events of created,
+    deleted and moved (renamed) files. The events are matched against the glob by `fnmatch`.
+
+    `start()` returns False, if `watchdog` is not installed or the directory can't be watched,
+    the caller then falls back to scanning.
+    """
+
+    def __init__(self, path, gauge, loop, exclude="", include=""):
+        self.Path = path
+        self.Gauge = gauge
+        self.Loop = loop
+        self.Exclude = exclude
+        self.Include = include
+
+        self.Root, self.Recursive = _watch_root(path)
+        self.Observer = None
+        self.Ready = {}  # Ordered set of files ready to be processed
+        self.Counts = {
+            "processed": 0,
+            "failed": 0,
+            "locked": 0,
+            "unprocessed": 0,
+            "all_files": 0,
+        }
+        self.Files = set()  # Files matching the glob
+
+    def start(self):
+        """
+        Starts the observer and scans the directory, it blocks, so call it in a worker thread.
+
+        :return: True if the watcher was started
+        """
+        try:
+            import watchdog.events
+            import watchdog.observers
+        except ImportError:
+            L.warning("Package 'watchdog' is not installed, falling back to scanning")
+            return False
+
+        watcher = self
+
+        class EventHandler(watchdog.events.FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher.Loop.call_soon_threadsafe(watcher._add, event.src_path)
+
+            def on_deleted(self, event):
+                if not event.is_directory:
+                    watcher.Loop.call_soon_threadsafe(watcher._remove, event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    watcher.Loop.call_soon_threadsafe(
+                        watcher._move, event.src_path, event.dest_path
+                    )
+
+        # The observer starts before the scan, so that no file created meanwhile is missed
+        observer = watchdog.observers.Observer()
+        try:
+            observer.schedule(EventHandler(), self.Root, recursive=self.Recursive)
+            observer.start()
+        except OSError as e:
+            L.warning(
+                "Can't watch '{}' ({}), falling back to scanning".format(self.Root, e)
+            )
+            return False
+
+        self.Observer = observer
+        start_time = time.time()
+        filelist = sorted(glob.glob(self.Path, recursive=True))
+        ready = [fname for fname in filelist if self._is_ready(fname)]
+        self.Loop.call_soon_threadsafe(
+            self._on_scan, filelist, ready, time.time() - start_time
+        )
+        return True
+
+    def stop(self):
+        if self.Observer is not None:
+            self.Observer.stop()
+            self.Observer.join()
+            self.Observer = None
+
+    def pop(self, count):
+        """
+        Returns up to `count` files ready to be processed and removes them from the queue.
+        """
+        filenames = []
+        for fname in self.Ready:
+            if len(filenames) >= count:
+                break
+            filenames.append(fname)
+        for fname in filenames:
+            del self.Ready[fname]
+        return filenames
+
+    def requeue(self, fname):
+        """
+        Puts the file, that was popped but couldn't be processed, back to the queue.
+        """
+        if fname in self.Files:
+            self.Ready[fname] = None
+
+    def _is_ready(self, fname):
+        return is_ready_file(fname, self.Exclude, self.Include)
+
+    def _on_scan(self, filelist, ready, scan_time):
+        for fname in filelist:
+            self._add(fname, check=False)
+        for fname in ready:
+            self.Ready[fname] = None
+        self.Gauge.set("scan_time", scan_time)
+
+    def _add(self, fname, check=True):
+        if fname in self.Files or not fnmatch.fnmatch(fname, self.Path):
+            return
+        self.Files.add(fname)
+        self._count(fname, 1)
+        if check and self._is_ready(fname):
+            self.Ready[fname] = None
+
+    def _remove(self, fname):
+        if fname not in self.Files:
+            return
+        self.Files.remove(fname)
+        self._count(fname, -1)
+        self.Ready.pop(fname, None)
+
+    def _move(self, src, dest):
+        self._remove(src)
+        self._add(dest)
+
+    def _count(self, fname, delta):
+        state = file_state(fname)
+        self.Counts[state] += delta
+        self.Counts["all_files"] += delta
+        self.Gauge.set(state, self.Counts[state])
+        self.Gauge.set("all_files", self.Counts["all_files"])
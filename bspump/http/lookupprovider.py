@@ -100,10 +100,40 @@ class HTTPBatchLookupProvider(LookupBatchProviderABC):
                 return self.load_from_cache()
             data = await response.read()
             self.ETag = response.headers.get("ETag")
+            self.Version = response.headers.get("X-Lookup-Version")
             if self.CachePath is not None:
                 self.save_to_cache(data)
         return data
 
+    async def load_delta(self, version):
+        """
+        Fetches changes since the `version` from the "delta" endpoint of the lookup master.
+        """
+        url = "{}/delta".format(self.URL.rstrip("/"))
+        async with aiohttp.ClientSession() as session:
+            try:
+                async with session.get(
+                    url,
+                    params={"since": version},
+                    timeout=float(self.Config["master_timeout"]),
+                ) as response:
+                    if response.status != 200:
+                        L.info(
+                            "{}: Delta of the lookup is not available at '{}' ({}), loading it completely.".format(
+                                self.Id, url, response.status
+                            )
+                        )
+                        return None
+                    return await response.json()
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                L.warning(
+                    "{}: Failed to fetch lookup delta from '{}': {}".format(
+                        self.Id, url, e
+                    )
+                )
+                return None
+
     def load_from_cache(self):
         """
         Load the lookup data (bytes) from cache.
@@ -122,8 +152,10 @@ class HTTPBatchLookupProvider(LookupBatchProviderABC):
         try:
             with open(self.CachePath, "rb") as f:
                 (tlen,) = struct.unpack(r"<L", f.read(struct.calcsize(r"<L")))
-                etag_b = f.read(tlen)
+                # The version of the lookup follows the ETag after '\0', caches of older versions don't have it
+                etag_b, _, version_b = f.read(tlen).partition(b"\0")
                 self.ETag = etag_b.decode("utf-8")
+                self.Version = version_b.decode("utf-8") if len(version_b) > 0 else None
                 f.read(1)
                 data = f.read()
             return data
@@ -144,8 +176,10 @@ class HTTPBatchLookupProvider(LookupBatchProviderABC):
             os.makedirs(dirname)
 
         with open(self.CachePath, "wb") as fo:
-            # Write E-Tag and '\n'
-            etag_b = self.ETag.encode("utf-8")
+            # Write E-Tag, the version of the lookup and '\n'
+            etag_b = (self.ETag or "").encode("utf-8")
+            if self.Version is not None:
+                etag_b += b"\0" + self.Version.encode("utf-8")
             fo.write(struct.pack(r"<L", len(etag_b)) + etag_b + b"\n")
 
             # Write Data
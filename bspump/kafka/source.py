@@ -1,4 +1,6 @@
 import asyncio
+import concurrent.futures
+import itertools
 import logging
 
 import confluent_kafka
@@ -40,6 +42,15 @@ class KafkaSource(Source):
             Otherwise, the session_timeout_ms should be raised to prevent Kafka from disconnecting the consumer
             from the partition, thus causing rebalance.
 
+            Messages are consumed in batches of up to `batch_size` messages by a dedicated thread,
+            so the event loop is never blocked by the Kafka client. Batches are handed over to the pipeline
+            through a queue of at most `queue_max_size` batches, which throttles the consumption
+            when the pipeline is slower. Offsets are stored (committed) only after the messages are processed.
+
+            When `process_batch` is enabled, consecutive messages of the same partition are passed to the pipeline
+            at once by `process_batch()`. All of them share one context, which contains the topic, the partition
+            and the offset of the first message of the batch, but not the message keys and headers.
+
             Standard Kafka configuration options can be used,
             as specified in librdkafka library,
             where the options are simply passed to:
@@ -50,12 +61,28 @@ class KafkaSource(Source):
     ConfigDefaults = {
         "topic": "unconfigured",
         "refresh_topics": 0,
+        "batch_size": 1000,  # The maximal number of messages returned by one consume() call
+        "batch_timeout": 0.2,  # The maximal time in seconds to wait for the batch
+        "queue_max_size": 10,  # The maximal number of batches waiting for the processing
+        "process_batch": "false",  # Pass messages to the pipeline by process_batch()
         "enable.auto.commit": "true",
+        "enable.auto.offset.store": "false",  # Offsets are stored after the processing
         "auto.commit.interval.ms": "1000",
         "auto.offset.reset": "smallest",
         "group.id": "bspump",
     }
 
+    SourceConfigKeys = frozenset(
+        [
+            "topic",
+            "refresh_topics",
+            "batch_size",
+            "batch_timeout",
+            "queue_max_size",
+            "process_batch",
+        ]
+    )
+
     def __init__(self, app, pipeline, connection, id=None, config=None):
         """
         Initializes parameters.
@@ -79,6 +106,7 @@ class KafkaSource(Source):
         super().__init__(app, pipeline, id=id, config=config)
 
         self.App = app
+        self.Loop = app.Loop
         self.Connection = self.Pipeline.locate_connection(app, connection)
         self.Sleep = 100 / 1000.0
         self.ConsumerConfig = {}
@@ -95,7 +123,7 @@ class KafkaSource(Source):
 
         # Copy configuration options, avoid the topic
         for key, value in self.Config.items():
-            if key == "topic" or key == "refresh_topics":
+            if key in self.SourceConfigKeys:
                 continue
 
             if key in self.SpecialKeys:
@@ -119,6 +147,19 @@ class KafkaSource(Source):
         self.RefreshTopics = int(self.Config["refresh_topics"])
         self.LastRefreshTopicsTime = self.App.time()
 
+        self.BatchSize = int(self.Config["batch_size"])
+        self.BatchTimeout = float(self.Config["batch_timeout"])
+        self.ProcessBatch = self.Config.getboolean("process_batch")
+        self.AutoCommit = self.ConsumerConfig.get("enable.auto.commit") in (
+            True,
+            "true",
+            "True",
+        )
+
+        # Batches of messages handed over from the consumer thread
+        self.Queue = asyncio.Queue(maxsize=int(self.Config["queue_max_size"]))
+        self.Consuming = False
+
     async def main(self):
         while self.Running:
             try:
@@ -131,6 +172,12 @@ class KafkaSource(Source):
 
             c.subscribe(self.Subscribe)
 
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="KafkaSource"
+            )
+            self.Consuming = True
+            consumer_future = asyncio.wrap_future(executor.submit(self._consume, c))
+
             try:
                 while 1:
                     await self.Pipeline.ready()
@@ -142,36 +189,20 @@ class KafkaSource(Source):
                         > self.LastRefreshTopicsTime + self.RefreshTopics
                     ):
                         L.info("Topics refreshed in '{}'.".format(self.Id))
-                        c.unsubscribe()
-                        c.close()
                         self.LastRefreshTopicsTime = current_time
                         break
 
-                    m = c.poll(0.2)
-
-                    if m is None:
-                        await asyncio.sleep(self.Sleep)
-                        continue
-
-                    if m.error():
-                        L.error(
-                            "The following error occured while polling for messages: '{}'.".format(
-                                m.error()
-                            )
+                    try:
+                        messages = await asyncio.wait_for(
+                            self.Queue.get(), timeout=self.BatchTimeout + 1.0
                         )
-                        await asyncio.sleep(self.Sleep)
+                    except asyncio.TimeoutError:
                         continue
 
-                    await self.process(
-                        m.value(),
-                        context={
-                            "kafka_key": m.key(),
-                            "kafka_headers": m.headers(),
-                            "_kafka_topic": m.topic(),
-                            "_kafka_partition": m.partition(),
-                            "_kafka_offset": m.offset(),
-                        },
-                    )
+                    if isinstance(messages, BaseException):
+                        raise messages  # The consumer thread failed
+
+                    await self._process_messages(c, messages)
 
             except asyncio.CancelledError:
                 self.Running = False
@@ -179,3 +210,129 @@ class KafkaSource(Source):
             except BaseException as e:
                 L.exception("Error when processing Kafka message")
                 self.Pipeline.set_error(None, None, e)
+
+            finally:
+                await self._stop_consuming(consumer_future)
+                executor.shutdown(wait=False)
+
+    def _consume(self, consumer):
+        """
+        Runs in the consumer thread, it hands batches of messages over to the event loop.
+        Unprocessed offsets are not stored, so they are consumed again after the restart.
+        """
+        try:
+            while self.Consuming:
+                messages = consumer.consume(self.BatchSize, self.BatchTimeout)
+                if len(messages) == 0:
+                    continue
+
+                if not self._hand_over(messages):
+                    break
+
+        except BaseException as e:
+            self._hand_over(e)
+
+        finally:
+            consumer.unsubscribe()
+            consumer.close()
+
+    def _hand_over(self, item):
+        """
+        Puts the item to the queue from the consumer thread, blocks while the queue is full.
+
+        :return: False if the consumption has been stopped in the meantime.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.Queue.put(item), self.Loop)
+        while True:
+            try:
+                future.result(timeout=self.BatchTimeout)
+                return True
+            except concurrent.futures.TimeoutError:
+                if not self.Consuming:
+                    future.cancel()
+                    return False
+
+    async def _stop_consuming(self, consumer_future):
+        self.Consuming = False
+
+        # Discard batches that have not been processed, their offsets were not stored
+        while not self.Queue.empty():
+            self.Queue.get_nowait()
+
+        try:
+            await asyncio.shield(consumer_future)
+        except asyncio.CancelledError:
+            self.Running = False
+        except BaseException:
+            L.exception("Error when closing Kafka consumer")
+
+        while not self.Queue.empty():
+            self.Queue.get_nowait()
+
+    async def _process_messages(self, consumer, messages):
+        offsets = {}
+
+        if self.ProcessBatch:
+            for (topic, partition), partition_messages in itertools.groupby(
+                self._iter_valid_messages(messages),
+                key=lambda m: (m.topic(), m.partition()),
+            ):
+                partition_messages = list(partition_messages)
+                await self.process_batch(
+                    [m.value() for m in partition_messages],
+                    context={
+                        "_kafka_topic": topic,
+                        "_kafka_partition": partition,
+                        "_kafka_offset": partition_messages[0].offset(),
+                    },
+                )
+                offsets[(topic, partition)] = partition_messages[-1].offset()
+
+        else:
+            for m in self._iter_valid_messages(messages):
+                await self.process(
+                    m.value(),
+                    context={
+                        "kafka_key": m.key(),
+                        "kafka_headers": m.headers(),
+                        "_kafka_topic": m.topic(),
+                        "_kafka_partition": m.partition(),
+                        "_kafka_offset": m.offset(),
+                    },
+                )
+                offsets[(m.topic(), m.partition())] = m.offset()
+
+        self._store_offsets(consumer, offsets)
+
+    def _iter_valid_messages(self, messages):
+        for m in messages:
+            if m.error():
+                L.error(
+                    "The following error occured while polling for messages: '{}'.".format(
+                        m.error()
+                    )
+                )
+                continue
+            yield m
+
+    def _store_offsets(self, consumer, offsets):
+        """
+        Stores offsets of processed messages, they are committed by the auto commit.
+        When the auto commit is disabled, offsets are committed asynchronously.
+        """
+        if len(offsets) == 0:
+            return
+
+        partitions = [
+            confluent_kafka.TopicPartition(topic, partition, offset + 1)
+            for (topic, partition), offset in offsets.items()
+        ]
+
+        try:
+            if self.AutoCommit:
+                consumer.store_offsets(offsets=partitions)
+            else:
+                consumer.commit(offsets=partitions, asynchronous=True)
+        except confluent_kafka.KafkaException as e:
+            # E.g. partitions have been revoked by a rebalance in the meantime
+            L.warning("Cannot store offsets in '{}': {}".format(self.Id, e))
@@ -1,6 +1,8 @@
 from .index import Index, BitMapIndex, TreeRangeIndex, SliceIndex
 from .ipgeolookup import IPGeoLookup
 from .matrixlookup import MatrixLookup
+from .snapshot import LookupSnapshot
+from .snapshotlookup import SnapshotLookup
 
 __all__ = (
     "IPGeoLookup",
@@ -9,4 +11,6 @@ __all__ = (
     "BitMapIndex",
     "TreeRangeIndex",
     "SliceIndex",
+    "LookupSnapshot",
+    "SnapshotLookup",
 )
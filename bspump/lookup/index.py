@@ -10,11 +10,24 @@ L = logging.getLogger(__name__)
 
 
 class Index(object):
+    """
+    Index of a matrix used by the `MatrixLookup`.
+
+    Indexes keep row indexes in contiguous NumPy arrays sorted by the indexed values,
+    `search()` returns a NumPy array of matching row indexes in no particular order.
+    The returned array may be a view into the index, it must not be modified.
+    """
+
     def __init__(self, id=None):
         super().__init__()
         self.Id = id if id is not None else self.__class__.__name__
 
-    def update(self, matrix):
+    def update(self, matrix, changed_rows=None):
+        """
+        Updates the index from the `matrix`.
+        `changed_rows` is a NumPy array of rows added, closed or modified since the last update,
+        see `Matrix.create_change_log()`. If it is `None`, the index is built again.
+        """
         pass
 
     def serialize(self):
@@ -23,64 +36,74 @@ class Index(object):
             "class": self.__class__.__name__,
         }
 
-    def search(self, *args) -> set:
+    def search(self, *args) -> np.ndarray:
         raise NotImplementedError()
 
+    def _open_rows(self, matrix, rows=None):
+        """
+        Returns rows (all of them by default) that have a name, i.e. that are not closed.
+        """
+        if rows is None:
+            i2nmap = matrix.Index.I2NMap
+            return np.fromiter(i2nmap.keys(), dtype=np.intp, count=len(i2nmap))
+
+        i2nmap = matrix.Index.I2NMap
+        return np.array([row for row in rows.tolist() if row in i2nmap], dtype=np.intp)
+
 
 class BitMapIndex(Index):
+    """
+    Index of discrete values of a `column`.
+    Rows are stored as postings ordered by the value, which are found by a binary search.
+    """
+
     def __init__(self, column, matrix, id=None):
-        """
-        Make sure, that column values are discreet.
-        Also the creation procedure is relatively slow.
-        """
         super().__init__(id=id)
         self.Column = column
-        self.BitMap = {}
-
-        open_rows = list(matrix.I2NMap.keys())
-        self.UniqueValues = list(np.unique(matrix.Array[self.Column][open_rows]))
-
-        for u in self.UniqueValues:
-            x = np.where(matrix.Array[self.Column] == u)
-            self.BitMap[int(u)] = set(x[0].tolist())
+        self.Values = None  # Value of every posting, sorted
+        self.Rows = None  # Row index of every posting
+        self.update(matrix)
 
     def search(self, value):
         """
-        Returns set of matrix indexes.
+        Returns NumPy array of matrix indexes.
         """
+        start = np.searchsorted(self.Values, value, side="left")
+        end = np.searchsorted(self.Values, value, side="right")
+        return self.Rows[start:end]
+
+    def update(self, matrix, changed_rows=None):
+        if changed_rows is None:
+            rows = self._open_rows(matrix)
+            values = matrix.Array[self.Column][rows]
+            order = np.argsort(values, kind="stable")
+            self.Values = values[order]
+            self.Rows = rows[order]
+            return
 
-        return set(self.BitMap.get(str(value), []))
-
-    def update(self, matrix):
-        open_rows = list(matrix.I2NMap.keys())
-        unique_values = set(np.unique(matrix.Array[self.Column][open_rows]))
-        set_difference_left = (
-            set(self.UniqueValues) - unique_values
-        )  # there are some deleted vals
-        set_difference_right = unique_values - set(
-            self.UniqueValues
-        )  # there are some added vals
-
-        if len(set_difference_left) != 0:
-            for set_member in set_difference_left:
-                self.BitMap.pop(set_member)
+        if changed_rows.shape[0] == 0:
+            return
 
-        if len(set_difference_right) != 0:
-            for set_member in set_difference_right:
-                x = np.where(matrix.Array[self.Column] == set_member)
-                self.BitMap[str(set_member)] = set(x[0].tolist())
+        keep = ~np.isin(self.Rows, changed_rows)
+        values = self.Values[keep]
+        rows = self.Rows[keep]
 
-        self.UniqueValues = list(unique_values)
+        # np.insert() keeps the order of inserted values at the same position, so they are sorted first
+        added = self._open_rows(matrix, changed_rows)
+        added_values = matrix.Array[self.Column][added]
+        order = np.argsort(added_values, kind="stable")
+        added = added[order]
+        added_values = added_values[order]
+        positions = np.searchsorted(values, added_values, side="right")
+        self.Values = np.insert(values, positions, added_values)
+        self.Rows = np.insert(rows, positions, added)
 
     def serialize(self):
-        serialized_bitmap = {}
-        for key in self.BitMap:
-            serialized_bitmap[key] = list(self.BitMap[key])
-
         serialized = super().serialize()
         serialized.update(
             {
-                "bitmap": serialized_bitmap,
+                "values": self.Values.tolist(),
+                "rows": self.Rows.tolist(),
                 "column": self.Column,
             }
         )
@@ -88,138 +111,98 @@ class BitMapIndex(Index):
         return serialized
 
     def deserialize(self, data):
-        self.BitMap = {}
         self.Column = data["column"]
+        self.Values = np.array(data["values"])
+        self.Rows = np.array(data["rows"], dtype=np.intp)
 
-        for key in data["bitmap"]:
-            self.BitMap[key] = set(data["bitmap"][key])
 
-        self.UniqueValues = list(self.BitMap.keys())
+class TreeRangeIndex(Index):
+    """
+    Index of ranges from `column_start` (inclusive) to `column_end` (exclusive).
 
+    Rows are ordered by the start of their range, together with a running maximum of range ends,
+    so that a search only visits rows whose range can contain the value.
+    """
 
-class TreeRangeIndex(Index):
     def __init__(self, column_start, column_end, matrix, id=None):
         super().__init__(id=id)
         self.ColumnStart = column_start
         self.ColumnEnd = column_end
-        ranges = set()
 
-        open_rows = list(matrix.I2NMap.keys())
-        unique_start = np.unique(matrix.Array[column_start][open_rows])
-        ranges |= set(unique_start)
-        unique_end = np.unique(matrix.Array[column_end][open_rows])
-        ranges |= set(unique_end)
-
-        assert len(unique_start) == len(unique_end)  # ranges overlapping
-
-        self.Ranges = sorted(list(ranges))
+        self.Starts = None
+        self.Ends = None
+        self.MaxEnds = None  # Running maximum of `Ends`
+        self.Rows = None
 
         self.MinValue = None
         self.MaxValue = None
-        self.Tree = None
-
-        if len(self.Ranges) != 0:
-            self.MinValue = int(self.Ranges[0])
-            self.MaxValue = int(self.Ranges[-1])
 
-            self.Tree = self.sorted_array_to_bst(matrix, self.Ranges, [], [])
+        self.update(matrix)
 
     def search(self, value):
-        if self.Tree is None:
-            return set()
-
-        if (value < self.MinValue) or (value >= self.MaxValue):
-            return set()
-
-        subtree = self.Tree
-        while True:
-            node = subtree["node"]
-            if node is None:
-                return set(subtree["indexes"])
-
-            if value < node:
-                subtree = subtree["left"]
-            else:
-                subtree = subtree["right"]
-
-        return set()
-
-    def sorted_array_to_bst(self, matrix, arr, path, mask):
-        if not arr:
-            mask_ = mask + [False]
-            if np.any(mask):
-                path_ = path + [float("inf")]
-                true_values = np.array(path_)[np.array(mask_)]
-                lower = max(true_values)
-                false_values = np.array(path_)[~np.array(mask_)]
-                upper = min(false_values)
-                r = tuple([lower, upper])
-            else:
-                path_ = path + [-float("inf")]
-                r = tuple([path_[-1], path_[-2]])
-
-            condition = (matrix.Array[self.ColumnEnd] <= r[1]) & (
-                matrix.Array[self.ColumnStart] >= r[0]
-            )
-            indexes = np.where(condition)
-            result = {
-                "node": None,
-                "indexes": indexes[0].tolist(),
-                "left": None,
-                "right": None,
-            }
-
-            return result
+        return self._search_covering(value, value, inclusive_end=False)
 
-        mid = int(len(arr) / 2)
-        root = dict(node=int(arr[mid]), indexes=[])
-        root["left"] = self.sorted_array_to_bst(
-            matrix, arr[:mid], path + [arr[mid]], mask + [False]
-        )
-        root["right"] = self.sorted_array_to_bst(
-            matrix, arr[mid + 1 :], path + [arr[mid]], mask + [True]
-        )
-        return root
-
-    def update(self, matrix):
-        ranges = set()
-        open_rows = list(matrix.I2NMap.keys())
-        unique_start = np.unique(matrix.Array[self.ColumnStart][open_rows])
-        ranges |= set(unique_start)
-        unique_end = np.unique(matrix.Array[self.ColumnEnd][open_rows])
-        ranges |= set(unique_end)
-
-        # TODO: optimize this monster
-        # if open_rows == self.OpenRows:
-        # 	# partial update
-        # 	# a) deleted values
-        # 	# b) added values
-        # 	# c) updated values, bug
-        # else:
-        # 	# full update
-
-        assert len(unique_start) == len(unique_end)  # ranges overlapping
-        self.Ranges = sorted(list(ranges))
-
-        self.MinValue = None
-        self.MaxValue = None
-        self.Tree = None
+    def _search_covering(self, start, end, inclusive_end):
+        """
+        Returns rows, whose range starts at or before `start` and ends after `end`
+        (or at `end` if `inclusive_end` is set).
+        """
+        stop = np.searchsorted(self.Starts, start, side="right")
+        side = "left" if inclusive_end else "right"
+        begin = np.searchsorted(self.MaxEnds[:stop], end, side=side)
+        if begin >= stop:
+            return self.Rows[0:0]
+
+        ends = self.Ends[begin:stop]
+        if inclusive_end:
+            matches = ends >= end
+        else:
+            matches = ends > end
+        return self.Rows[begin:stop][matches]
+
+    def update(self, matrix, changed_rows=None):
+        if changed_rows is None:
+            rows = self._open_rows(matrix)
+            starts = matrix.Array[self.ColumnStart][rows]
+            order = np.argsort(starts, kind="stable")
+            self.Starts = starts[order]
+            self.Ends = matrix.Array[self.ColumnEnd][rows][order]
+            self.Rows = rows[order]
+
+        elif changed_rows.shape[0] == 0:
+            return
 
-        if len(self.Ranges) != 0:
-            self.MinValue = self.Ranges[0]
-            self.MaxValue = self.Ranges[-1]
-            self.Tree = self.sorted_array_to_bst(matrix, self.Ranges, [], [])
+        else:
+            keep = ~np.isin(self.Rows, changed_rows)
+            starts = self.Starts[keep]
+            ends = self.Ends[keep]
+            rows = self.Rows[keep]
+
+            added = self._open_rows(matrix, changed_rows)
+            added_starts = matrix.Array[self.ColumnStart][added]
+            order = np.argsort(added_starts, kind="stable")
+            added = added[order]
+            added_starts = added_starts[order]
+            positions = np.searchsorted(starts, added_starts, side="right")
+            self.Starts = np.insert(starts, positions, added_starts)
+            self.Ends = np.insert(ends, positions, matrix.Array[self.ColumnEnd][added])
+            self.Rows = np.insert(rows, positions, added)
+
+        self.MaxEnds = np.maximum.accumulate(self.Ends)
+        if self.Rows.shape[0] == 0:
+            self.MinValue = None
+            self.MaxValue = None
+        else:
+            self.MinValue = self.Starts[0].item()
+            self.MaxValue = self.MaxEnds[-1].item()
 
     def serialize(self):
         serialized = super().serialize()
-        ranges = []
-        for r in self.Ranges:
-            ranges.append(int(r))
-
         serialized.update(
             {
-                "tree": self.Tree,
-                "ranges": ranges,
+                "starts": self.Starts.tolist(),
+                "ends": self.Ends.tolist(),
+                "rows": self.Rows.tolist(),
                 "column_start": self.ColumnStart,
                 "column_end": self.ColumnEnd,
             }
@@ -227,86 +210,50 @@ class TreeRangeIndex(Index):
         return serialized
 
     def deserialize(self, data):
-        self.Ranges = data["ranges"]
-        if len(self.Ranges) != 0:
-            self.MinValue = self.Ranges[0]
-            self.MaxValue = self.Ranges[-1]
-        self.Tree = data["tree"]
         self.ColumnStart = data["column_start"]
         self.ColumnEnd = data["column_end"]
+        self.Starts = np.array(data["starts"])
+        self.Ends = np.array(data["ends"])
+        self.Rows = np.array(data["rows"], dtype=np.intp)
+        if self.Rows.shape[0] == 0:
+            self.MaxEnds = self.Ends
+            self.MinValue = None
+            self.MaxValue = None
+        else:
+            self.MaxEnds = np.maximum.accumulate(self.Ends)
+            self.MinValue = self.Starts[0].item()
+            self.MaxValue = self.MaxEnds[-1].item()
+
+
+class SliceIndex(TreeRangeIndex):
+    """
+    Index of ranges from `column_start` to `column_end`, that splits the values into slices of `resolution`.
+    `search()` returns rows whose range covers the whole slice containing the value.
+    If `resolution` is not given, the shortest range is used.
+    """
 
-
-class SliceIndex(Index):
     def __init__(self, column_start, column_end, matrix, resolution=None, id=None):
-        super().__init__(id=id)
-        self.ColumnStart = column_start
-        self.ColumnEnd = column_end
         self.Resolution = resolution
-        self.MinValue = None
-        self.MaxValue = None
-        self.SliceMap = None
-        self._create_slices(matrix)
+        super().__init__(column_start, column_end, matrix, id=id)
 
     def search(self, value):
-        index = int((value - self.MinValue) // self.Resolution)
-        key = self.MinValue + index * self.Resolution
-        result = set(self.SliceMap.get(key, []))
-        return result
-
-    def update(self, matrix):
-        self._create_slices(matrix)
-        print(len(self.SliceMap), self.MinValue, self.MaxValue, self.Resolution)
+        if self.MinValue is None:
+            return self.Rows[0:0]
 
-    def _create_slices(self, matrix):
-        if matrix.Array.shape[0] == 0:
-            return
+        index = (value - self.MinValue) // self.Resolution
+        start = self.MinValue + index * self.Resolution
+        return self._search_covering(start, start + self.Resolution, inclusive_end=True)
 
-        self.SliceMap = {}
-        open_rows = list(matrix.I2NMap.keys())
-        self.MinValue = float(np.min(matrix.Array[self.ColumnStart][open_rows]))
-        self.MaxValue = float(np.max(matrix.Array[self.ColumnEnd][open_rows]))
-
-        if self.Resolution is None:
-            diffs = (
-                matrix.Array[self.ColumnEnd][open_rows]
-                - matrix.Array[self.ColumnStart][open_rows]
-            )
-            self.Resolution = float(np.min(diffs))
-
-        start_value = self.MinValue
-
-        while start_value < self.MaxValue:
-            end_value = start_value + self.Resolution
-            condition = (matrix.Array[self.ColumnEnd] >= end_value) & (
-                matrix.Array[self.ColumnStart] <= start_value
-            )
-            indexes = np.where(condition)
-            self.SliceMap[start_value] = indexes[0].tolist()
-            start_value = end_value
+    def update(self, matrix, changed_rows=None):
+        super().update(matrix, changed_rows)
+        if self.Resolution is None and self.Rows.shape[0] > 0:
+            self.Resolution = float(np.min(self.Ends - self.Starts))
 
     def serialize(self):
         serialized = super().serialize()
-        serialized.update(
-            {
-                "slice_map": self.SliceMap,
-                "min_value": self.MinValue,
-                "max_value": self.MaxValue,
-                "resolution": self.Resolution,
-                "column_start": self.ColumnStart,
-                "column_end": self.ColumnEnd,
-            }
-        )
+        serialized["resolution"] = self.Resolution
         return serialized
 
     def deserialize(self, data):
-        # check how json works with float keys
-        self.MinValue = data["min_value"]
-        self.MaxValue = data["max_value"]
+        super().deserialize(data)
         self.Resolution = data["resolution"]
-        self.SliceMap = {}
-        for key in data["slice_map"]:
-            self.SliceMap[float(key)] = data["slice_map"][key]
-
-        self.Tree = data["tree"]
-        self.ColumnStart = data["column_start"]
-        self.ColumnEnd = data["column_end"]
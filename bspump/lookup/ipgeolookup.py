@@ -1,6 +1,10 @@
 import logging
 import csv
 import ipaddress
+import json
+import os
+
+import numpy as np
 
 from bspump.abc.lookup import DictionaryLookup
 
@@ -21,17 +25,25 @@ class IPGeoLookup(DictionaryLookup):
     Free versions: IP2LOCATION-LITE-DB5.IPV6.CSV and IP2LOCATION-LITE-DB5.IPV4.CSV
     For better precision visit https://lite.ip2location.com to buy a commercial version of database.
 
-    Usage: specify in configuration the path to the database in csv format."""
+    Usage: specify in configuration the path to the database in csv format.
+
+    IP ranges are kept in sorted NumPy arrays of 16-byte big-endian addresses and searched by `np.searchsorted`.
+    Equal locations are stored only once.
+    If "cache" is set to a directory, the compiled arrays are stored there and memory-mapped on the next load,
+    as long as the CSV file has not changed."""
 
     ConfigDefaults = {
         "path": "",
         "ipv4mapped": "no",  # IPv4-mapped IPv6 address (enables to use IPv6 lookups for IPv4 addresses)
+        "cache": "",  # Directory for the compiled database
     }
 
     def __init__(self, app, id=None, config=None):
         super().__init__(app, id=id, config=config)
-        self.TreeRoot = None
-        self.Locations = {}
+        self.RangeStarts = None
+        self.RangeEnds = None
+        self.RangeLocations = None
+        self.Locations = []
         if self.Config["ipv4mapped"].lower() == "yes":
             self.IP4Mapped = True
         else:
@@ -42,114 +54,201 @@ class IPGeoLookup(DictionaryLookup):
         if fname == "":
             return
 
-        with open(fname, "r") as f:
-            array = []
+        # The CSV file is parsed in a thread, the new tables are swapped in at once
+        (
+            self.RangeStarts,
+            self.RangeEnds,
+            self.RangeLocations,
+            self.Locations,
+        ) = await self.execute_off_loop(self._build, fname, self.Config["cache"])
+        return True
+
+    def _build(self, fname, cache):
+        """
+        Builds the tables of the lookup from the cache or from the CSV file, it blocks.
 
+        :return: tuple of range starts, range ends, range locations and the list of locations
+        """
+        if cache != "":
+            tables = self._load_cache(cache, fname)
+            if tables is not None:
+                L.debug("IPGeoLookup {} was loaded from the cache".format(self.Id))
+                return tables
+
+        starts = []
+        ends = []
+        range_locations = []
+        locations = []
+        location_ids = {}
+
+        with open(fname, "r") as f:
             for line in csv.reader(f, delimiter=","):
-                ip_int_address_start = int(line[0])
-                ip_int_address_end = int(line[1])
-                array.append(ip_int_address_start)
-                array.append(ip_int_address_end)
-                lat = float(line[6])
-                lon = float(line[7])
-
-                if (lat == 0.0) or (lon == 0.0):
-                    d = {"lat": None, "lon": None}
-                else:
-                    d = {"lat": lat, "lon": lon}
-
-                if line[2] != "-":
-                    d["country"] = line[2]
-                if line[4] != "-":
-                    d["region"] = line[4]
-                if line[5] != "-":
-                    d["city"] = line[5]
-
-                self.Locations[ip_int_address_start] = d
-                self.Locations[ip_int_address_end] = d
-
-        self.TreeRoot = self.sorted_array_to_bst(array)
-        del array
+                starts.append(int(line[0]).to_bytes(16, "big"))
+                ends.append(int(line[1]).to_bytes(16, "big"))
+
+                key = tuple(line[2:8])
+                location_id = location_ids.get(key)
+                if location_id is None:
+                    location_id = len(locations)
+                    location_ids[key] = location_id
+                    locations.append(self._parse_location(line))
+                range_locations.append(location_id)
+
+        range_starts = np.array(starts, dtype="S16")
+        range_ends = np.array(ends, dtype="S16")
+        range_locations = np.array(range_locations, dtype="i4")
+        del starts, ends
+
+        # The database is expected to be sorted, but the search relies on it
+        if np.any(range_starts[1:] < range_starts[:-1]):
+            order = np.argsort(range_starts, kind="stable")
+            range_starts = range_starts[order]
+            range_ends = range_ends[order]
+            range_locations = range_locations[order]
+
+        tables = (range_starts, range_ends, range_locations, locations)
+        if cache != "":
+            self._store_cache(cache, fname, tables)
+
         L.debug("IPGeoLookup {} was successfully created".format(self.Id))
-        return True
+        return tables
 
-    def set(self, tree):
-        self.TreeRoot = tree
+    def _parse_location(self, line):
+        lat = float(line[6])
+        lon = float(line[7])
+
+        if (lat == 0.0) or (lon == 0.0):
+            d = {"lat": None, "lon": None}
+        else:
+            d = {"lat": lat, "lon": lon}
+
+        if line[2] != "-":
+            d["country"] = line[2]
+        if line[4] != "-":
+            d["region"] = line[4]
+        if line[5] != "-":
+            d["city"] = line[5]
+        return d
+
+    def _cache_signature(self, fname):
+        stat = os.stat(fname)
+        return {
+            "path": os.path.abspath(fname),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+
+    def _load_cache(self, cache, fname):
+        try:
+            with open(os.path.join(cache, "locations.json"), "r") as f:
+                data = json.load(f)
+            if data["signature"] != self._cache_signature(fname):
+                return None
+
+            return (
+                np.load(os.path.join(cache, "starts.npy"), mmap_mode="r"),
+                np.load(os.path.join(cache, "ends.npy"), mmap_mode="r"),
+                np.load(os.path.join(cache, "locations.npy"), mmap_mode="r"),
+                data["locations"],
+            )
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _store_cache(self, cache, fname, tables):
+        range_starts, range_ends, range_locations, locations = tables
+        os.makedirs(cache, exist_ok=True)
+        np.save(os.path.join(cache, "starts.npy"), range_starts)
+        np.save(os.path.join(cache, "ends.npy"), range_ends)
+        np.save(os.path.join(cache, "locations.npy"), range_locations)
+
+        # Written last, it makes the cache valid
+        path = os.path.join(cache, "locations.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(
+                {
+                    "signature": self._cache_signature(fname),
+                    "locations": locations,
+                },
+                f,
+            )
+        os.replace(path + ".tmp", path)
 
     # REST
 
     def rest_get(self):
         rest = super().rest_get()
-        rest["TreeRoot"] = self.TreeRoot
-        rest["Locations"] = self.Locations
+        rest["Ranges"] = 0 if self.RangeStarts is None else len(self.RangeStarts)
+        rest["Locations"] = len(self.Locations)
         rest["IP4Mapped"] = self.IP4Mapped
         return rest
 
-    def sorted_array_to_bst(self, arr):
-        if not arr:
+    def search(self, keys):
+        """
+        Returns indexes of locations of IP addresses `keys` (array of 16-byte big-endian addresses),
+        -1 for addresses that don't fall into any range.
+        """
+        i = np.searchsorted(self.RangeStarts, keys, side="right") - 1
+        found = i >= 0
+        found[found] = keys[found] <= self.RangeEnds[i[found]]
+        return np.where(found, self.RangeLocations[i], -1)
+
+    def _ipv4_key(self, address):
+        address_int = int(ipaddress.IPv4Address(address))
+        if self.IP4Mapped:
+            # https://blog.ip2location.com/knowledge-base/ipv4-mapped-ipv6-address/
+            # 191.239.213.197 -> ::ffff:191.239.213.197
+            address_int += 281470681743360
+        return address_int.to_bytes(16, "big")
+
+    def _ipv6_key(self, address):
+        return int(ipaddress.IPv6Address(address)).to_bytes(16, "big")
+
+    def _address_to_key(self, address):
+        if ":" in address:
+            return self._ipv6_key(address)
+        elif "." in address:
+            return self._ipv4_key(address)
+        else:
+            raise ValueError("Invalid IPv4/IPv6 format")
+
+    def _lookup_key(self, key):
+        i = int(self.RangeStarts.searchsorted(key, side="right")) - 1
+        # NumPy strips trailing zero bytes of items
+        if i < 0 or key > self.RangeEnds[i].ljust(16, b"\x00"):
             return None
+        return self.Locations[self.RangeLocations[i]]
 
-        mid = int(len(arr) / 2)
-        root = Node(arr[mid])
-        root.left = self.sorted_array_to_bst(arr[:mid])
-        root.right = self.sorted_array_to_bst(arr[mid + 1 :])
-        return root
-
-    def search(self, value):
-        root = self.TreeRoot
-        while True:
-            if root.data == value:
-                return root.data
-
-            if root.data > value:
-                left = root.left
-                if left is None:
-                    return root.data
-                else:
-                    root = left
-            if root.data < value:
-                right = root.right
-                if right is None:
-                    return root.data
-                else:
-                    root = right
+    def lookup_locations(self, addresses):
+        """
+        Looks up locations of many IPv4/IPv6 addresses at once.
+
+        :return: list of locations, `None` for addresses that were not found.
+        """
+        if self.RangeStarts is None:
+            return [None] * len(addresses)
+
+        keys = np.array([self._address_to_key(a) for a in addresses], dtype="S16")
+        return [
+            self.Locations[i] if i >= 0 else None for i in self.search(keys).tolist()
+        ]
 
     def lookup_location_ipv4(self, address):
-        if self.TreeRoot is None:
+        if self.RangeStarts is None:
             # L.warning("Cannot enrich the location")
             return None
 
-        address_int = int(ipaddress.IPv4Address(address))
-
-        if self.IP4Mapped:
-            # https://blog.ip2location.com/knowledge-base/ipv4-mapped-ipv6-address/
-            # 191.239.213.197 -> ::ffff:191.239.213.197
-            address_int += 281470681743360
-
-        value = self.search(address_int)
-        return self.Locations.get(value)
+        return self._lookup_key(self._ipv4_key(address))
 
     def lookup_location_ipv6(self, address):
-        if self.TreeRoot is None:
+        if self.RangeStarts is None:
             # L.warning("Cannot enrich the location")
             return None
 
-        address_int = int(ipaddress.IPv6Address(address))
-
-        value = self.search(address_int)
-        return self.Locations.get(value)
+        return self._lookup_key(self._ipv6_key(address))
 
     def lookup_location(self, address):
-        if "." in address:
-            return self.lookup_location_ipv4(address)
-        elif ":" in address:
-            return self.lookup_location_ipv6(address)
-        else:
-            raise ValueError("Invalid IPv4/IPv6 format")
-
+        key = self._address_to_key(address)
+        if self.RangeStarts is None:
+            return None
 
-class Node:
-    def __init__(self, d):
-        self.data = d
-        self.left = None
-        self.right = None
+        return self._lookup_key(key)
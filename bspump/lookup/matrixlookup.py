@@ -46,10 +46,13 @@ class MatrixLookup(Lookup):
 
         self.MatrixPubSub = None
         self.Timer = None
+        self.ChangeLog = None
 
         self.Target = None
 
         if self.is_master():
+            # Indexes are updated only by rows changed since the last update
+            self.ChangeLog = self.Matrix.create_change_log()
             if on_clock_update:
                 self.UpdatePeriod = float(self.Config["update_period"])
                 self.Timer = asab.Timer(app, self._on_clock_tick, autorestart=True)
@@ -66,8 +69,15 @@ class MatrixLookup(Lookup):
         self.update_indexes()
 
     def update_indexes(self):
+        if self.ChangeLog is None:
+            changed_rows = None
+        else:
+            changed_rows = self.ChangeLog.pop()
+            if changed_rows is not None and changed_rows.shape[0] == 0:
+                return
+
         for index in self.Indexes:
-            self.Indexes[index].update(self.Matrix)
+            self.Indexes[index].update(self.Matrix, changed_rows)
 
     def search(self, condition, target_column):
         """
@@ -77,7 +87,7 @@ class MatrixLookup(Lookup):
         if len(x[0]) == 0:
             return None
 
-        return np.asscalar(self.Matrix.Array[x[0][0]][target_column])
+        return self.Matrix.Array[x[0][0]][target_column].item()
 
     def serialize(self):
         serialized = {}
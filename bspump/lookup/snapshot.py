@@ -0,0 +1,125 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+###
+
+Header = struct.Struct(
+    "<8sQQQ"
+)  # Magic, count of entries, size of keys, size of values
+Magic = b"BSLKSNP1"
+
+###
+
+
+def _key_hash(key: bytes) -> int:
+    # Python `hash()` is randomized per process, the snapshot is shared by many processes
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class LookupSnapshot(object):
+    """
+    Immutable snapshot of a dictionary, that is memory-mapped read-only,
+    so that the memory is shared by all processes that map the same file.
+
+    Entries are sorted by a 64-bit hash of the key, which is searched by `np.searchsorted`.
+    The file consists of a header, an array of hashes, arrays of offsets of keys and of values,
+    a blob of UTF-8 encoded keys and a blob of JSON encoded values.
+    Values are decoded when they are accessed.
+    """
+
+    def __init__(self, path):
+        self.Path = path
+        with open(path, "rb") as f:
+            self.MMap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, keys_size, values_size = Header.unpack_from(self.MMap, 0)
+        if magic != Magic:
+            raise ValueError("File '{}' is not a lookup snapshot".format(path))
+
+        self.Count = count
+        offset = Header.size
+        self.Hashes = np.frombuffer(self.MMap, dtype="<u8", count=count, offset=offset)
+        offset += 8 * count
+        self.KeyOffsets = np.frombuffer(
+            self.MMap, dtype="<i8", count=count + 1, offset=offset
+        )
+        offset += 8 * (count + 1)
+        self.ValueOffsets = np.frombuffer(
+            self.MMap, dtype="<i8", count=count + 1, offset=offset
+        )
+        offset += 8 * (count + 1)
+        self.Keys = memoryview(self.MMap)[offset : offset + keys_size]
+        offset += keys_size
+        self.Values = memoryview(self.MMap)[offset : offset + values_size]
+
+    @classmethod
+    def write(cls, path, dictionary):
+        """
+        Writes the `dictionary` with string keys and JSON serializable values into a snapshot file.
+        The file is written under a temporary name and renamed, so that it never appears incomplete.
+        """
+        keys = [key.encode("utf-8") for key in dictionary.keys()]
+        values = [json.dumps(value).encode("utf-8") for value in dictionary.values()]
+
+        hashes = np.array([_key_hash(key) for key in keys], dtype="<u8")
+        order = np.argsort(hashes, kind="stable").tolist()
+        keys = [keys[i] for i in order]
+        values = [values[i] for i in order]
+
+        key_offsets = np.zeros(len(keys) + 1, dtype="<i8")
+        np.cumsum([len(key) for key in keys], out=key_offsets[1:])
+        value_offsets = np.zeros(len(values) + 1, dtype="<i8")
+        np.cumsum([len(value) for value in values], out=value_offsets[1:])
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(
+                Header.pack(
+                    Magic, len(keys), int(key_offsets[-1]), int(value_offsets[-1])
+                )
+            )
+            f.write(hashes[order].tobytes())
+            f.write(key_offsets.tobytes())
+            f.write(value_offsets.tobytes())
+            f.write(b"".join(keys))
+            f.write(b"".join(values))
+        os.replace(tmp_path, path)
+
+    def _find(self, key):
+        if not isinstance(key, str):
+            return -1
+
+        key = key.encode("utf-8")
+        h = _key_hash(key)
+        i = int(np.searchsorted(self.Hashes, np.uint64(h)))
+        while i < self.Count and int(self.Hashes[i]) == h:
+            if self.Keys[self.KeyOffsets[i] : self.KeyOffsets[i + 1]] == key:
+                return i
+            i += 1
+        return -1
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return json.loads(
+            self.Values[self.ValueOffsets[i] : self.ValueOffsets[i + 1]].tobytes()
+        )
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __len__(self):
+        return self.Count
+
+    def __iter__(self):
+        key_offsets = self.KeyOffsets.tolist()
+        for i in range(self.Count):
+            yield self.Keys[key_offsets[i] : key_offsets[i + 1]].tobytes().decode(
+                "utf-8"
+            )
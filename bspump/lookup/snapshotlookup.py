@@ -0,0 +1,209 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+
+from ..abc.lookup import MappingLookup
+from .snapshot import LookupSnapshot
+
+###
+
+L = logging.getLogger(__name__)
+
+###
+
+
+class SnapshotLookup(MappingLookup):
+    """
+    Dictionary lookup, that shares its data with other processes on the host by a memory-mapped snapshot.
+
+    The data loaded from the provider are written into an immutable snapshot file in "snapshot_dir"
+    (see `LookupSnapshot`), which is then mapped read-only by all processes with a lookup of the same id.
+    A new version of the snapshot is published by an atomic rename of the "<id>.current" file,
+    processes that still map the previous version keep using it until they load again.
+
+    The load is serialized among the processes by a file lock. If a snapshot was published less than
+    "snapshot_max_age" seconds ago, it is mapped instead of loading the data from the provider again,
+    so that only one of the processes pays the cost of the load.
+
+    Keys are strings and values are decoded from JSON when they are accessed.
+    """
+
+    ConfigDefaults = {
+        "snapshot_dir": "",  # Directory for snapshot files, /dev/shm/bspump by default
+        "snapshot_max_age": 60,  # Seconds, a younger snapshot is used instead of loading the data again
+    }
+
+    def __init__(self, app, id=None, config=None, lazy=False):
+        super().__init__(app, id=id, config=config, lazy=lazy)
+        self.Snapshot = None
+        self.SnapshotVersion = None
+
+        self.SnapshotDir = self.Config["snapshot_dir"]
+        if self.SnapshotDir == "":
+            if os.path.isdir("/dev/shm"):
+                self.SnapshotDir = "/dev/shm/bspump"
+            else:
+                self.SnapshotDir = os.path.join(tempfile.gettempdir(), "bspump")
+        os.makedirs(self.SnapshotDir, exist_ok=True)
+
+        self.SnapshotMaxAge = float(self.Config["snapshot_max_age"])
+        self.CurrentPath = os.path.join(self.SnapshotDir, "{}.current".format(self.Id))
+        self.LockPath = os.path.join(self.SnapshotDir, "{}.lock".format(self.Id))
+
+    def __getitem__(self, key):
+        if self.Snapshot is None:
+            raise KeyError(key)
+        return self.Snapshot[key]
+
+    def __contains__(self, key):
+        return self.Snapshot is not None and key in self.Snapshot
+
+    def __iter__(self):
+        if self.Snapshot is None:
+            return iter(())
+        return iter(self.Snapshot)
+
+    def __len__(self):
+        if self.Snapshot is None:
+            return 0
+        return len(self.Snapshot)
+
+    async def _acquire_lock(self):
+        fd = os.open(self.LockPath, os.O_RDWR | os.O_CREAT, 0o644)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                await asyncio.sleep(0.1)
+
+    def _release_lock(self, fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _read_current(self):
+        """
+        Returns the version of the published snapshot and its age in seconds, or (None, None).
+        """
+        try:
+            with open(self.CurrentPath, "r") as f:
+                version = f.read().strip()
+            age = time.time() - os.stat(self.CurrentPath).st_mtime
+        except FileNotFoundError:
+            return None, None
+        return version, age
+
+    def _snapshot_path(self, version):
+        return os.path.join(self.SnapshotDir, "{}.{}.snapshot".format(self.Id, version))
+
+    def _map(self, version):
+        try:
+            self.Snapshot = LookupSnapshot(self._snapshot_path(version))
+        except FileNotFoundError:
+            # The version was replaced (and removed) meanwhile
+            return False
+        self.SnapshotVersion = version
+        return True
+
+    def map_current(self) -> bool:
+        """
+        Maps the published snapshot, if it differs from the mapped one.
+
+        :return: True if a new snapshot was mapped
+        """
+        version, _ = self._read_current()
+        if version is None or version == self.SnapshotVersion:
+            return False
+        return self._map(version)
+
+    async def load(self) -> bool:
+        fd = await self._acquire_lock()
+        try:
+            version, age = self._read_current()
+            if version is not None and age < self.SnapshotMaxAge:
+                if version == self.SnapshotVersion:
+                    return False
+                if self._map(version):
+                    L.debug(
+                        "Lookup '{}' mapped the snapshot '{}'".format(self.Id, version)
+                    )
+                    return True
+
+            data = await self.Provider.load()
+            if data is None or data is False:
+                L.warning("No data loaded from {}.".format(self.Provider.Id))
+                return False
+            await self.deserialize_async(data)
+            return True
+
+        finally:
+            self._release_lock(fd)
+
+    def _write(self, dictionary: dict):
+        """
+        Writes the `dictionary` into a new version of the snapshot and publishes it, it blocks.
+
+        :return: the version of the snapshot
+        """
+        version = "{:x}-{}".format(time.time_ns(), os.getpid())
+        LookupSnapshot.write(self._snapshot_path(version), dictionary)
+
+        # The temporary name is unique, so that concurrent publishers don't overwrite each other
+        previous, _ = self._read_current()
+        tmp_path = "{}.{}.tmp".format(self.CurrentPath, version)
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, self.CurrentPath)
+
+        if previous is not None and previous != version:
+            # Processes that map the previous version keep it until they unmap it
+            try:
+                os.unlink(self._snapshot_path(previous))
+            except FileNotFoundError:
+                pass
+
+        return version
+
+    def _map_published(self, version):
+        if not self._map(version):
+            # Another process published a newer version meanwhile
+            self.map_current()
+
+    def publish(self, dictionary: dict):
+        """
+        Writes the `dictionary` into a new version of the snapshot, publishes it and maps it.
+        """
+        self._map_published(self._write(dictionary))
+
+    def serialize(self):
+        return json.dumps(dict(self.items())).encode("utf-8")
+
+    def deserialize(self, data):
+        self.publish(json.loads(data.decode("utf-8")))
+
+    async def deserialize_async(self, data):
+        """
+        Parses the data and writes the snapshot in a thread, only the new snapshot is mapped on the loop.
+        """
+        version = await self.execute_off_loop(
+            lambda: self._write(json.loads(data.decode("utf-8")))
+        )
+        self.execute_on_loop(self._map_published, version)
+
+    def set(self, dictionary: dict):
+        if self.is_master() is False:
+            L.warning("'master_url' provided, set() method can not be used")
+
+        self.publish(dictionary)
+
+    # REST
+
+    def rest_get(self):
+        rest = super().rest_get()
+        rest["SnapshotVersion"] = self.SnapshotVersion
+        rest["Count"] = len(self)
+        return rest
@@ -4,7 +4,9 @@ import os
 import numpy as np
 
 from bspump.asab import Configurable
+from .utils.changelog import ChangeLog
 from .utils.closedrows import ClosedRows, PersistentClosedRows
+from .utils.memmap import grow_memmap
 
 ###
 
@@ -55,12 +57,14 @@ class Matrix(abc.ABC, Configurable):
 
     Object main attributes:
     `Array` is numpy ndarray, the actual data representation of the matrix object.
-    `ClosedRows` is a set, where some row ids can be stored before deletion during the matrix rebuild.
+    `ClosedRows` is a free list of row ids, that can be reused or deleted during the matrix rebuild.
 
     """
 
     ConfigDefaults = {
         "max_closed_rows_capacity": 0.2,
+        "compaction": "full",  # "full" rebuilds the matrix at once, "incremental" on every tick
+        "compaction_rows": 10000,  # Maximum number of rows moved on one tick by the incremental compaction
     }
 
     def __init__(self, app, dtype="float_", persistent=False, id=None, config=None):
@@ -75,6 +79,11 @@ class Matrix(abc.ABC, Configurable):
 
         self.DType = dtype
         self.MaxClosedRowsCapacity = float(self.Config["max_closed_rows_capacity"])
+        self.Compaction = self.Config["compaction"]
+        self.CompactionRows = int(self.Config["compaction_rows"])
+        self.Compacting = False
+        self.CompactionTotal = 0
+        self.ChangeLogs = []
         self.zeros()
 
         metrics_service = app.get_service("asab.MetricsService")
@@ -86,9 +95,13 @@ class Matrix(abc.ABC, Configurable):
             init_values={
                 "rows.closed": 0,
                 "rows.active": 0,
+                "compaction.progress": 1.0,
             },
         )
 
+        if self.Compaction == "incremental":
+            app.PubSub.subscribe("Application.tick!", self._on_tick)
+
     def zeros(self, rows=1):
         self.Array = np.zeros(self.build_shape(rows), dtype=self.DType)
         self.ClosedRows = ClosedRows()
@@ -98,17 +111,114 @@ class Matrix(abc.ABC, Configurable):
         """
         The matrix will be recreated without rows from `ClosedRows`.
         """
-        indexes = set(range(self.Array.shape[0]))
-        closed_indexes = set()
-        closed_indexes |= self.ClosedRows.get_rows()
-        saved_indexes = list(indexes - closed_indexes)
-        saved_indexes.sort()
+        closed = self.ClosedRows.get_mask(self.Array.shape[0])
+        closed_indexes = np.flatnonzero(closed)
+        saved_indexes = np.flatnonzero(~closed)
         self.Array = self.Array.take(saved_indexes, axis=0)
         self.ClosedRows.flush(self.Array.shape[0])
+        self._reset_change_logs()
         self.Gauge.set("rows.closed", 0)
         self.Gauge.set("rows.active", self.Array.shape[0])
         return closed_indexes, saved_indexes
 
+    def compact(self, max_rows=None):
+        """
+        Moves up to `max_rows` active rows from the end of the matrix into closed rows in front of them
+        and truncates the matrix once all closed rows are at its end.
+        Unlike `flush()`, a call doesn't touch the whole matrix, so the compaction can be spread over several ticks.
+        Row indexes of moved rows change, same as in `flush()`.
+
+        :return: True when the compaction is finished.
+        """
+        active = self.Array.shape[0] - len(self.ClosedRows)
+        holes = self.ClosedRows.get_indexes()
+        holes = np.sort(holes[holes < active])
+        remaining = holes.shape[0]
+        if not self.Compacting:
+            self.Compacting = True
+            self.CompactionTotal = remaining
+        else:
+            # Rows closed during the compaction
+            self.CompactionTotal = max(self.CompactionTotal, remaining)
+
+        if max_rows is not None:
+            holes = holes[:max_rows]
+
+        if holes.shape[0] > 0:
+            moved = np.flatnonzero(
+                ~self.ClosedRows.get_mask(self.Array.shape[0], start=active)
+            )
+            moved = moved[: holes.shape[0]] + active
+            self._move_rows(moved, holes)
+            self.ClosedRows.swap(holes, moved)
+            remaining -= holes.shape[0]
+
+        if remaining == 0:
+            self._truncate_rows(active)
+            self.ClosedRows.truncate(active)
+            self.Compacting = False
+            self.Gauge.set("compaction.progress", 1.0)
+        else:
+            self.Gauge.set(
+                "compaction.progress", 1.0 - remaining / self.CompactionTotal
+            )
+
+        crc = len(self.ClosedRows)
+        self.Gauge.set("rows.active", self.Array.shape[0] - crc)
+        self.Gauge.set("rows.closed", crc)
+        return not self.Compacting
+
+    def _move_rows(self, source, target):
+        """
+        Override this method to move also other data related to rows.
+        """
+        self.Array[target] = self.Array[source]
+        self.Array[source] = np.zeros(1, dtype=self.DType)
+        self.mark_changed(source)
+        self.mark_changed(target)
+
+    def _truncate_rows(self, rows):
+        """
+        Override this method to truncate also other data related to rows.
+        """
+        try:
+            self.Array.resize((rows,) + self.Array.shape[1:], refcheck=False)
+        except ValueError:
+            # The array doesn't own its data
+            self.Array = self.Array[:rows].copy()
+
+    def _check_closed_rows_capacity(self):
+        if len(self.ClosedRows) < self.MaxClosedRowsCapacity * self.Array.shape[0]:
+            return
+
+        if self.Compaction == "incremental":
+            if not self.Compacting:
+                # Only starts the compaction, rows are moved on ticks
+                self.compact(0)
+        else:
+            self.flush()
+
+    def _on_tick(self, event_name):
+        if self.Compacting:
+            self.compact(self.CompactionRows)
+
+    def create_change_log(self):
+        """
+        Returns a new `ChangeLog`, that collects indexes of rows added, closed or modified in the matrix.
+        Rows modified directly in `Array` have to be reported by `mark_changed()`.
+        """
+        change_log = ChangeLog()
+        self.ChangeLogs.append(change_log)
+        return change_log
+
+    def mark_changed(self, row_indexes):
+        for change_log in self.ChangeLogs:
+            change_log.add(row_indexes)
+
+    def _reset_change_logs(self):
+        for change_log in self.ChangeLogs:
+            change_log.reset()
+
     def close_rows(self, row_names, clear=True):
         pass
 
@@ -126,6 +236,23 @@ class Matrix(abc.ABC, Configurable):
             self.Gauge.set("rows.active", self.Array.shape[0] - crc)
             self.Gauge.set("rows.closed", crc)
 
+    def add_rows(self, count):
+        """
+        Allocates `count` rows at once, the matrix is grown at most once.
+
+        :return: NumPy array of row indexes.
+        """
+        missing = count - len(self.ClosedRows)
+        if missing > 0:
+            self._grow_rows(max(missing, 5, int(0.10 * self.Array.shape[0])))
+
+        indexes = self.ClosedRows.pop_many(count)
+
+        crc = len(self.ClosedRows)
+        self.Gauge.set("rows.active", self.Array.shape[0] - crc)
+        self.Gauge.set("rows.closed", crc)
+        return indexes
+
     def build_shape(self, rows=0):
         """
         Override this method to have a control over the shape of the matrix.
@@ -140,9 +267,13 @@ class Matrix(abc.ABC, Configurable):
         Override this method to gain control on how a new closed rows are added to the matrix
         """
         current_rows = self.Array.shape[0]
-        self.Array = np.pad(
-            self.Array.copy(), ((0, rows), (0, 0)), "constant", constant_values=np.nan
+        array = np.zeros(
+            (current_rows + rows,) + self.Array.shape[1:], dtype=self.Array.dtype
         )
+        array[:current_rows] = self.Array
+        if array.dtype.kind in "fc":
+            array[current_rows:] = np.nan
+        self.Array = array
         self.ClosedRows.extend(current_rows, self.Array.shape[0])
 
     def time(self):
@@ -197,11 +328,9 @@ class PersistentMatrix(Matrix):
         """
         The matrix will be recreated without rows from `ClosedRows`.
         """
-        indexes = set(range(self.Array.shape[0]))
-        closed_indexes = set()
-        closed_indexes |= self.ClosedRows.get_rows()
-        saved_indexes = list(indexes - closed_indexes)
-        saved_indexes.sort()
+        closed = self.ClosedRows.get_mask(self.Array.shape[0])
+        closed_indexes = np.flatnonzero(closed)
+        saved_indexes = np.flatnonzero(~closed)
         self.Array = self.Array.take(saved_indexes, axis=0)
         array = np.memmap(
             self.ArrayPath, dtype=self.DType, mode="w+", shape=self.Array.shape
@@ -210,6 +339,7 @@ class PersistentMatrix(Matrix):
         self.Array = array
 
         self.ClosedRows.flush(self.Array.shape[0])
+        self._reset_change_logs()
         self.Gauge.set("rows.closed", 0)
         self.Gauge.set("rows.active", self.Array.shape[0])
         return closed_indexes, saved_indexes
@@ -223,25 +353,26 @@ class PersistentMatrix(Matrix):
             self.Array[row_index] = np.zeros(1, dtype=self.DType)
 
         self.ClosedRows.add(row_index)
-
-        if len(self.ClosedRows) >= self.MaxClosedRowsCapacity * self.Array.shape[0]:
-            self.flush()
+        self._check_closed_rows_capacity()
 
         crc = len(self.ClosedRows)
         self.Gauge.set("rows.active", self.Array.shape[0] - crc)
         self.Gauge.set("rows.closed", crc)
         return True
 
+    def _truncate_rows(self, rows):
+        self.Array = grow_memmap(
+            self.Array, self.ArrayPath, (rows,) + self.Array.shape[1:]
+        )
+
     def _grow_rows(self, rows=1):
         """
         Override this method to gain control on how a new closed rows are added to the matrix
         """
         current_rows = self.Array.shape[0]
-        array = np.zeros(self.Array.shape, dtype=self.DType)
-        array[:] = self.Array[:]
-        array.resize((current_rows + rows,) + self.Array.shape[1:], refcheck=False)
-        self.Array = np.memmap(
-            self.ArrayPath, dtype=self.DType, mode="w+", shape=array.shape
+        self.Array = grow_memmap(
+            self.Array,
+            self.ArrayPath,
+            (current_rows + rows,) + self.Array.shape[1:],
         )
-        self.Array[:] = array[:]
         self.ClosedRows.extend(current_rows, self.Array.shape[0])
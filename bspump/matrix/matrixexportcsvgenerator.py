@@ -27,7 +27,9 @@ class TimeWindowMatrixExportCSVGenerator(Generator):
                     )
                     for k in range(0, time_window_matrix.Dimensions[1]):
                         field_name = "value_{}".format(k)
-                        event[field_name] = time_window_matrix.Array[i, j, k]
+                        event[field_name] = time_window_matrix.Array[
+                            i, time_window_matrix.get_physical_column(j), k
+                        ]
 
                     yield event
 
@@ -21,6 +21,7 @@ class NamedMatrix(Matrix):
     def zeros(self):
         super().zeros()
         self.Index = Index()
+        self._reset_change_logs()
 
     def serialize(self):
         serialized = {}
@@ -46,6 +47,7 @@ class NamedMatrix(Matrix):
             array.append(tuple(member))
 
         self.Array = np.array(array, dtype=self.DType)
+        self._reset_change_logs()
 
     def _grow_rows(self, rows=1):
         super()._grow_rows(rows)
@@ -59,14 +61,39 @@ class NamedMatrix(Matrix):
         self.Index.flush(closed_indexes)
         return closed_indexes, saved_indexes
 
+    def _move_rows(self, source, target):
+        super()._move_rows(source, target)
+        self.Index.move_rows(source, target)
+        self.PubSub.publish("Matrix changed!")
+
+    def _truncate_rows(self, rows):
+        super()._truncate_rows(rows)
+        self.Index.truncate(rows)
+
     def add_row(self, row_name: str):
         assert row_name is not None
 
         row_index = super().add_row()
         self.Index.add_row(row_name, row_index)
+        self.mark_changed(row_index)
         self.PubSub.publish("Matrix changed!")
         return row_index
 
+    def add_rows(self, row_names):
+        """
+        Adds many rows at once, the matrix is grown at most once.
+
+        :return: NumPy array of row indexes in the order of `row_names`.
+        """
+        row_names = list(row_names)
+        assert None not in row_names
+
+        row_indexes = super().add_rows(len(row_names))
+        self.Index.add_rows(row_names, row_indexes)
+        self.mark_changed(row_indexes)
+        self.PubSub.publish("Matrix changed!")
+        return row_indexes
+
     def close_row(self, row_name, clear=True):
         row_index = self.Index.get_row_index(row_name)
         if row_index in self.ClosedRows:
@@ -76,14 +103,14 @@ class NamedMatrix(Matrix):
             return False
 
         self.Index.pop_index(row_index)
+        self.mark_changed(row_index)
         self.PubSub.publish("Matrix changed!")
 
         if clear:
             self.Array[row_index] = np.zeros(1, dtype=self.DType)
 
         self.ClosedRows.add(row_index)
-        if len(self.ClosedRows) >= self.MaxClosedRowsCapacity * self.Array.shape[0]:
-            self.flush()
+        self._check_closed_rows_capacity()
 
         crc = len(self.ClosedRows)
         self.Gauge.set("rows.active", self.Array.shape[0] - crc)
@@ -123,14 +150,39 @@ class PersistentNamedMatrix(PersistentMatrix):
         self.Index.flush(closed_indexes)
         return closed_indexes, saved_indexes
 
+    def _move_rows(self, source, target):
+        super()._move_rows(source, target)
+        self.Index.move_rows(source, target)
+        self.PubSub.publish("Matrix changed!")
+
+    def _truncate_rows(self, rows):
+        super()._truncate_rows(rows)
+        self.Index.truncate(rows)
+
     def add_row(self, row_name: str):
         assert row_name is not None
 
         row_index = super().add_row()
         self.Index.add_row(row_name, row_index)
+        self.mark_changed(row_index)
         self.PubSub.publish("Matrix changed!")
         return row_index
 
+    def add_rows(self, row_names):
+        """
+        Adds many rows at once, the matrix is grown at most once.
+
+        :return: NumPy array of row indexes in the order of `row_names`.
+        """
+        row_names = list(row_names)
+        assert None not in row_names
+
+        row_indexes = super().add_rows(len(row_names))
+        self.Index.add_rows(row_names, row_indexes)
+        self.mark_changed(row_indexes)
+        self.PubSub.publish("Matrix changed!")
+        return row_indexes
+
     def close_row(self, row_name, clear=True):
         row_index = self.Index.get_row_index(row_name)
         if row_index in self.ClosedRows:
@@ -140,14 +192,14 @@ class PersistentNamedMatrix(PersistentMatrix):
             return False
 
         self.Index.pop_index(row_index)
+        self.mark_changed(row_index)
         self.PubSub.publish("Matrix changed!")
 
         if clear:
             self.Array[row_index] = np.zeros(1, dtype=self.DType)
 
         self.ClosedRows.add(row_index)
-        if len(self.ClosedRows) >= self.MaxClosedRowsCapacity * self.Array.shape[0]:
-            self.flush()
+        self._check_closed_rows_capacity()
 
         crc = len(self.ClosedRows)
         self.Gauge.set("rows.active", self.Array.shape[0] - crc)
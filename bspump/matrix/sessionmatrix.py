@@ -32,6 +32,7 @@ class SessionMatrix(NamedMatrix):
         if row_index is None:
             return False
         self.Array[row_index] = event
+        self.mark_changed(row_index)
 
     def store_event(self, row_index: int, event, keys=None):
         if keys is None:
@@ -45,6 +46,7 @@ class SessionMatrix(NamedMatrix):
         for key in keys:
             if key in names:
                 self.Array[row_index][key] = event[key]
+        self.mark_changed(row_index)
 
     def decode_row(self, row_index: int, keys=None):
         if keys is None:
@@ -78,6 +80,7 @@ class PersistentSessionMatrix(PersistentNamedMatrix):
         if row_index is None:
             return False
         self.Array[row_index] = event
+        self.mark_changed(row_index)
 
     def store_event(self, row_index: int, event, keys=None):
         if keys is None:
@@ -91,6 +94,7 @@ class PersistentSessionMatrix(PersistentNamedMatrix):
         for key in keys:
             if key in names:
                 self.Array[row_index][key] = event[key]
+        self.mark_changed(row_index)
 
     def decode_row(self, row_index: int, keys=None):
         if keys is None:
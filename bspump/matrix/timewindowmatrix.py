@@ -18,6 +18,99 @@ L = logging.getLogger(__name__)
 ###
 
 
+def _resolve_rows(matrix, row_names):
+    """
+    Returns row indexes of `row_names`, missing rows are added to the matrix at once.
+    Every distinct row name is resolved only once.
+    """
+    if isinstance(row_names, np.ndarray):
+        unique, inverse = np.unique(row_names, return_inverse=True)
+        unique = unique.tolist()
+    else:
+        # Row names that NumPy cannot sort (e.g. tuples)
+        positions = {}
+        inverse = np.empty(len(row_names), dtype=np.intp)
+        for i, name in enumerate(row_names):
+            inverse[i] = positions.setdefault(name, len(positions))
+        unique = list(positions.keys())
+
+    indexes = np.empty(len(unique), dtype=np.intp)
+    missing = []
+    for i, name in enumerate(unique):
+        row_index = matrix.get_row_index(name)
+        if row_index is None:
+            missing.append(i)
+        else:
+            indexes[i] = row_index
+
+    if len(missing) > 0:
+        indexes[missing] = matrix.add_rows([unique[i] for i in missing])
+
+    return indexes[inverse]
+
+
+def _add_many(matrix, row_names, timestamps, values, op, field):
+    """
+    Shared implementation of `add_many()` of time window matrices.
+    """
+    if op not in ("add", "max", "set"):
+        raise ValueError("Unknown operation '{}'".format(op))
+
+    timestamps = np.asarray(timestamps, dtype="f8")
+    values = np.asarray(values)
+
+    end = matrix.TimeConfig.get_end()
+    start = matrix.TimeConfig.get_start()
+
+    late = timestamps <= end
+    early = timestamps >= start
+    late_count = int(np.count_nonzero(late))
+    early_count = int(np.count_nonzero(early))
+    if late_count > 0:
+        matrix.Counters.add("events.late", late_count)
+    if early_count > 0:
+        matrix.Counters.add("events.early", early_count)
+
+    valid = ~(late | early)
+    if not np.any(valid):
+        return 0
+
+    columns = ((timestamps[valid] - end) // matrix.TimeConfig.get_resolution()).astype(
+        np.intp
+    )
+    columns = (columns + matrix.TimeConfig.get_head()) % matrix.Array.shape[1]
+    if values.ndim > 0:
+        values = values[valid]
+
+    # Rows are resolved before the array is accessed, because adding rows can reallocate it
+    names = np.asarray(row_names)
+    if names.ndim == 1 and names.dtype.kind in "USiu":
+        rows = _resolve_rows(matrix, names[valid])
+    else:
+        rows = _resolve_rows(
+            matrix, [name for name, v in zip(row_names, valid.tolist()) if v]
+        )
+
+    array = matrix.Array if field is None else matrix.Array[field]
+    if op == "set":
+        array[rows, columns] = values
+
+    elif op == "add":
+        if array.dtype.kind == "f":
+            # Empty cells contain NaN
+            empty = np.isnan(array[rows, columns])
+            array[rows[empty], columns[empty]] = 0
+        np.add.at(array, (rows, columns), values)
+
+    else:
+        if array.dtype.kind == "f":
+            np.fmax.at(array, (rows, columns), values)
+        else:
+            np.maximum.at(array, (rows, columns), values)
+
+    return rows.shape[0]
+
+
 class TimeWindowMatrix(NamedMatrix):
     """
             Container, specific for `TimeWindowAnalyzer`.
@@ -115,11 +208,24 @@ class TimeWindowMatrix(NamedMatrix):
 
         return row_index
 
+    def add_rows(self, row_names):
+        """
+        Adds many rows at once and sets their `warming_up_count`.
+        """
+
+        row_indexes = super().add_rows(row_names)
+        if self.Array.shape[0] != len(self.WarmingUpCount):
+            self.WarmingUpCount.extend(self.Array.shape[0], self.Array.shape[1])
+        self.WarmingUpCount.assign(row_indexes, self.Array.shape[1])
+
+        return row_indexes
+
     def get_column(self, event_timestamp):
         """
         Returns the right column, where the timestamp fits.
         If if falls earlier or later, returns `None`.
         The timestamp should be provided in seconds.
+        The returned index points directly into `Array`, see `get_physical_column()`.
         """
 
         if event_timestamp <= self.TimeConfig.get_end():
@@ -162,7 +268,34 @@ class TimeWindowMatrix(NamedMatrix):
             )
             raise
 
-        return column_idx
+        return (column_idx + self.TimeConfig.get_head()) % self.Array.shape[1]
+
+    def get_physical_column(self, column_idx):
+        """
+        Maps a logical column index (0 is the oldest column) to the column index in `Array`.
+        The columns form a ring buffer, the oldest one is at `TimeConfig.get_head()`.
+        """
+        return (column_idx + self.TimeConfig.get_head()) % self.Array.shape[1]
+
+    def get_array(self):
+        """
+        Returns a copy of `Array` with columns ordered in time, from the oldest to the newest one.
+        """
+        return np.roll(self.Array, -self.TimeConfig.get_head(), axis=1)
+
+    def add_many(self, row_names, timestamps, values, op="add", field=None):
+        """
+        Writes a batch of values into the matrix at once.
+        Rows are resolved (and added, when missing) by `row_names`, columns by `timestamps` in seconds.
+        Values with timestamps outside of the time window are counted as early or late and skipped.
+
+        `op` is one of "add" (sums values into cells), "max" (keeps the maximum)
+        and "set" (overwrites cells, the last value wins). Empty (NaN) cells are ignored by "add" and "max".
+        `field` selects a field of a structured `dtype`.
+
+        :return: the number of values written into the matrix.
+        """
+        return _add_many(self, row_names, timestamps, values, op, field)
 
     def advance(self, target_ts):
         """
@@ -209,6 +342,14 @@ class TimeWindowMatrix(NamedMatrix):
         self.WarmingUpCount.flush(saved_indexes)
         return closed_indexes, saved_indexes
 
+    def _move_rows(self, source, target):
+        super()._move_rows(source, target)
+        self.WarmingUpCount.move(source, target)
+
+    def _truncate_rows(self, rows):
+        super()._truncate_rows(rows)
+        self.WarmingUpCount.truncate(rows)
+
     async def on_clock_tick(self):
         """
         React on timer's tick and advance the window.
@@ -224,36 +365,34 @@ class TimeWindowMatrix(NamedMatrix):
 
     def add_column(self):
         """
-        Adds new time column to the matrix and deletes the first one, simulating
-        the time flow. `Start` and `End` attributes are advanced as well.
+        Reuses the oldest time column for the new one, simulating the time flow.
+        The column is cleared in place and the head of the ring buffer moves forward.
+        `Start` and `End` attributes are advanced as well.
         """
 
         self.TimeConfig.add_start(self.TimeConfig.get_resolution())
         self.TimeConfig.add_end(self.TimeConfig.get_resolution())
 
+        head = self.TimeConfig.get_head()
+        self.TimeConfig.set_head((head + 1) % self.Array.shape[1])
+        self.Start = self.TimeConfig.get_start()
+        self.End = self.TimeConfig.get_end()
+
         if self.Array.shape[0] == 0:
             return
 
-        column = np.empty(
-            (
-                self.Array.shape[0],
-                1,
-            )
-            + self.Array.shape[2:],
-            dtype=self.Array.dtype,
-        )
-        column[:] = np.nan
-        array = self.Array
-        array = np.hstack((array, column))
-        array = np.delete(array, 0, axis=1)
-        self.Array = array
-
-        open_rows = list(
-            set(range(0, self.Array.shape[0])) - self.ClosedRows.get_rows()
-        )
-        self.WarmingUpCount.decrease(open_rows)
-        self.Start = self.TimeConfig.get_start()
-        self.End = self.TimeConfig.get_end()
+        if self.Array.dtype.kind in "fc":
+            self.Array[:, head] = np.nan
+        else:
+            self.Array[:, head] = 0
+
+        self._decrease_warming_up_count()
+
+    def _decrease_warming_up_count(self):
+        if len(self.ClosedRows) == 0:
+            self.WarmingUpCount.decrease(slice(None))
+        else:
+            self.WarmingUpCount.decrease(~self.ClosedRows.get_mask(self.Array.shape[0]))
 
 
 class PersistentTimeWindowMatrix(PersistentNamedMatrix):
@@ -330,11 +469,24 @@ class PersistentTimeWindowMatrix(PersistentNamedMatrix):
 
         return row_index
 
+    def add_rows(self, row_names):
+        """
+        Adds many rows at once and sets their `warming_up_count`.
+        """
+
+        row_indexes = super().add_rows(row_names)
+        if self.Array.shape[0] != len(self.WarmingUpCount):
+            self.WarmingUpCount.extend(self.Array.shape[0], self.Array.shape[1])
+        self.WarmingUpCount.assign(row_indexes, self.Array.shape[1])
+
+        return row_indexes
+
     def get_column(self, event_timestamp):
         """
         Returns the right column, where the timestamp fits.
         If if falls earlier or later, returns `None`.
         The timestamp should be provided in seconds.
+        The returned index points directly into `Array`, see `get_physical_column()`.
         """
 
         if event_timestamp <= self.TimeConfig.get_end():
@@ -377,7 +529,34 @@ class PersistentTimeWindowMatrix(PersistentNamedMatrix):
             )
             raise
 
-        return column_idx
+        return (column_idx + self.TimeConfig.get_head()) % self.Array.shape[1]
+
+    def get_physical_column(self, column_idx):
+        """
+        Maps a logical column index (0 is the oldest column) to the column index in `Array`.
+        The columns form a ring buffer, the oldest one is at `TimeConfig.get_head()`.
+        """
+        return (column_idx + self.TimeConfig.get_head()) % self.Array.shape[1]
+
+    def get_array(self):
+        """
+        Returns a copy of `Array` with columns ordered in time, from the oldest to the newest one.
+        """
+        return np.roll(self.Array, -self.TimeConfig.get_head(), axis=1)
+
+    def add_many(self, row_names, timestamps, values, op="add", field=None):
+        """
+        Writes a batch of values into the matrix at once.
+        Rows are resolved (and added, when missing) by `row_names`, columns by `timestamps` in seconds.
+        Values with timestamps outside of the time window are counted as early or late and skipped.
+
+        `op` is one of "add" (sums values into cells), "max" (keeps the maximum)
+        and "set" (overwrites cells, the last value wins). Empty (NaN) cells are ignored by "add" and "max".
+        `field` selects a field of a structured `dtype`.
+
+        :return: the number of values written into the matrix.
+        """
+        return _add_many(self, row_names, timestamps, values, op, field)
 
     def advance(self, target_ts):
         """
@@ -424,6 +603,14 @@ class PersistentTimeWindowMatrix(PersistentNamedMatrix):
         self.WarmingUpCount.flush(saved_indexes)
         return closed_indexes, saved_indexes
 
+    def _move_rows(self, source, target):
+        super()._move_rows(source, target)
+        self.WarmingUpCount.move(source, target)
+
+    def _truncate_rows(self, rows):
+        super()._truncate_rows(rows)
+        self.WarmingUpCount.truncate(rows)
+
     async def on_clock_tick(self):
         """
         React on timer's tick and advance the window.
@@ -445,38 +632,27 @@ class PersistentTimeWindowMatrix(PersistentNamedMatrix):
 
     def add_column(self):
         """
-        Adds new time column to the matrix and deletes the first one, simulating
-        the time flow. `Start` and `End` attributes are advanced as well.
+        Reuses the oldest time column for the new one, simulating the time flow.
+        The column is zeroed in place in the memory-mapped file and the head of the ring buffer moves forward.
+        `Start` and `End` attributes are advanced as well.
         """
 
         self.TimeConfig.add_start(self.TimeConfig.get_resolution())
         self.TimeConfig.add_end(self.TimeConfig.get_resolution())
 
+        head = self.TimeConfig.get_head()
+        self.TimeConfig.set_head((head + 1) % self.Array.shape[1])
+        self.Start = self.TimeConfig.get_start()
+        self.End = self.TimeConfig.get_end()
+
         if self.Array.shape[0] == 0:
             return
 
-        column = np.zeros(
-            (
-                self.Array.shape[0],
-                1,
-            )
-            + self.Array.shape[2:],
-            dtype=self.Array.dtype,
-        )
-        array = np.zeros(self.Array.shape, dtype=self.DType)
-        array[:] = self.Array[:]
-
-        array = np.hstack((array, column))
-        array = np.delete(array, 0, axis=1)
-
-        self.Array = np.memmap(
-            self.ArrayPath, dtype=self.DType, mode="w+", shape=array.shape
-        )
-        self.Array[:] = array[:]
+        self.Array[:, head] = 0
+        self._decrease_warming_up_count()
 
-        open_rows = list(
-            set(range(0, self.Array.shape[0])) - self.ClosedRows.get_rows()
-        )
-        self.WarmingUpCount.decrease(open_rows)
-        self.Start = self.TimeConfig.get_start()
-        self.End = self.TimeConfig.get_end()
+    def _decrease_warming_up_count(self):
+        if len(self.ClosedRows) == 0:
+            self.WarmingUpCount.decrease(slice(None))
+        else:
+            self.WarmingUpCount.decrease(~self.ClosedRows.get_mask(self.Array.shape[0]))
@@ -1,14 +1,18 @@
+from .changelog import ChangeLog
 from .closedrows import ClosedRows, PersistentClosedRows
 from .index import Index, PersistentIndex
+from .memmap import grow_memmap
 from .timeconfig import TimeConfig, PersistentTimeConfig
 from .warmingupcount import WarmingUpCount, PersistentWarmingUpCount
 
 
 __all__ = [
+    "ChangeLog",
     "ClosedRows",
     "PersistentClosedRows",
     "Index",
     "PersistentIndex",
+    "grow_memmap",
     "TimeConfig",
     "PersistentTimeConfig",
     "WarmingUpCount",
@@ -0,0 +1,43 @@
+import numpy as np
+
+
+class ChangeLog(object):
+    """
+    Collects indexes of rows that were added, closed or modified since the last `pop()`.
+    Created by `Matrix.create_change_log()`, every consumer of changes should have its own.
+    """
+
+    def __init__(self):
+        self.Rows = []
+        self.Full = False
+
+    def add(self, rows):
+        if self.Full:
+            return
+
+        if isinstance(rows, np.ndarray):
+            self.Rows.extend(rows.tolist())
+        else:
+            self.Rows.append(rows)
+
+    def reset(self):
+        """
+        Row indexes are no longer valid (e.g. after `Matrix.flush()`), everything has to be reloaded.
+        """
+        self.Rows = []
+        self.Full = True
+
+    def pop(self):
+        """
+        :return: sorted NumPy array of changed rows, or `None` when everything has changed.
+        """
+        if self.Full:
+            self.Full = False
+            return None
+
+        rows = np.unique(np.array(self.Rows, dtype=np.intp))
+        self.Rows = []
+        return rows
+
+    def __len__(self):
+        return len(self.Rows)
@@ -1,48 +1,148 @@
 import numpy as np
 import os
 
+from .memmap import grow_memmap
+
 
 class ClosedRows(object):
+    """
+    Free list of closed (reusable) row indexes of a matrix.
+
+    The indexes are kept in a NumPy array used as a stack, so that many rows can be
+    added or taken at once. A bitmap of closed rows answers `in` queries.
+    Rows are handed out from the lowest index, rows closed later are reused first.
+    """
+
     def __init__(self, max_len=None):
-        self.CR = set()
         if max_len is None:
             max_len = float("inf")
 
         self.MaxLen = max_len
+        self.Stack = np.empty(16, dtype="i8")
+        self.Count = 0
+        self.Closed = np.zeros(16, dtype=bool)
+
+    def _reserve(self, count):
+        if self.Count + count > self.Stack.shape[0]:
+            stack = np.empty(
+                max(self.Count + count, 2 * self.Stack.shape[0]), dtype=self.Stack.dtype
+            )
+            stack[: self.Count] = self.Stack[: self.Count]
+            self.Stack = stack
+
+    def _mark(self, size):
+        if size > self.Closed.shape[0]:
+            closed = np.zeros(max(size, 2 * self.Closed.shape[0]), dtype=bool)
+            closed[: self.Closed.shape[0]] = self.Closed
+            self.Closed = closed
 
     def pop(self):
-        return self.CR.pop()
+        if self.Count == 0:
+            raise KeyError("pop from empty closed rows")
+
+        self.Count -= 1
+        element = int(self.Stack[self.Count])
+        self.Closed[element] = False
+        return element
+
+    def pop_many(self, count):
+        """
+        Takes up to `count` rows at once, returns a NumPy array of their indexes.
+        """
+        count = min(count, self.Count)
+        elements = self.Stack[self.Count - count : self.Count][::-1].copy()
+        self.Count -= count
+        self.Closed[elements] = False
+        return elements
 
     def get_rows(self):
-        return self.CR
+        """
+        Returns a set of closed rows, prefer `get_indexes()` or `get_mask()` on large matrices.
+        """
+        return set(self.get_indexes().tolist())
+
+    def get_indexes(self):
+        return self.Stack[: self.Count].copy()
+
+    def get_mask(self, size, start=0):
+        """
+        Returns a boolean array of rows from `start` to `size`, where closed rows are True.
+        """
+        self._mark(size)
+        return self.Closed[start:size].copy()
 
     def add(self, element):
-        if len(self.CR) == self.MaxLen:
+        if element in self:
+            return
+
+        if self.Count == self.MaxLen:
             raise RuntimeError("Maximum size exceeded")
 
-        self.CR.add(element)
+        self._reserve(1)
+        self._mark(element + 1)
+        self.Stack[self.Count] = element
+        self.Count += 1
+        self.Closed[element] = True
 
     def __contains__(self, element):
-        if element in self.CR:
-            return True
-        return False
+        if element is None or element < 0 or element >= self.Closed.shape[0]:
+            return False
+        return bool(self.Closed[element])
 
     def serialize(self):
-        return list(self.get_rows())
+        return self.get_indexes().tolist()
 
     def deserialize(self, data):
-        self.CR = set(data)
+        self.flush()
+        indexes = np.unique(np.asarray(data, dtype="i8"))[::-1]
+        self._push(indexes)
+
+    def _push(self, indexes, bottom=False):
+        count = indexes.shape[0]
+        if count == 0:
+            return
+
+        self._reserve(count)
+        self._mark(int(indexes.max()) + 1)
+        if bottom:
+            self.Stack[count : self.Count + count] = self.Stack[: self.Count].copy()
+            self.Stack[:count] = indexes
+        else:
+            self.Stack[self.Count : self.Count + count] = indexes
+        self.Count += count
+        self.Closed[indexes] = True
 
     def __len__(self):
-        return len(self.CR)
+        return self.Count
 
     def extend(self, start, stop):
-        self.CR |= frozenset(range(start, stop))
-        if len(self.CR) >= self.MaxLen:
+        # New rows go under the rows closed so far and in a reverse order, so that the lowest row is taken first
+        self._push(np.arange(stop - 1, start - 1, -1, dtype="i8"), bottom=True)
+        if self.Count >= self.MaxLen:
             raise RuntimeError("Maximum size exceeded")
 
+    def swap(self, opened, closed):
+        """
+        Opens closed rows `opened` and closes the same number of rows `closed` instead.
+        """
+        positions = np.flatnonzero(np.isin(self.Stack[: self.Count], opened))
+        self.Stack[positions] = closed
+        self.Closed[opened] = False
+        self.Closed[closed] = True
+
+    def truncate(self, size):
+        """
+        Forgets closed rows from `size` on, when the matrix is truncated to `size` rows.
+        """
+        stack = self.Stack[: self.Count]
+        stack = stack[stack < size]
+        self.Count = stack.shape[0]
+        self.Stack[: self.Count] = stack
+        self.Closed = self.Closed[:size].copy()
+
     def flush(self, size=None):
-        self.CR = set()
+        self.Count = 0
+        self.Closed = np.zeros(max(16, size or 0), dtype=bool)
 
 
 class PersistentClosedRows(ClosedRows):
@@ -52,32 +152,41 @@ class PersistentClosedRows(ClosedRows):
         self.Path = path
         if os.path.exists(self.Path):
             self.CRBit = np.memmap(self.Path, dtype=self.DType, mode="readwrite")
-            for i in range(len(self.CRBit)):
-                if self.CRBit[i] == 0:
-                    self.CR.add(i)
+            self._push(np.flatnonzero(self.CRBit == 0)[::-1])
         else:
             if size is None:
                 raise RuntimeError("The size should correspond to array size")
-            self.CR.add(0)
             self.ones(size)
+            self.add(0)
 
     def pop(self):
         element = super().pop()
         self.CRBit[element] = 1
         return element
 
+    def pop_many(self, count):
+        elements = super().pop_many(count)
+        self.CRBit[elements] = 1
+        return elements
+
     def add(self, element):
         super().add(element)
         self.CRBit[element] = 0
 
     def extend(self, start, stop):
-        cr_ = np.zeros(self.CRBit.shape[0], dtype=self.DType)
-        cr_[:] = self.CRBit[:]
-        cr_.resize(stop, refcheck=False)
-        self.CRBit = np.memmap(self.Path, dtype=self.DType, mode="w+", shape=cr_.shape)
-        self.CRBit[:] = cr_[:]
+        # New rows are closed, which is the zero filled by the file system
+        self.CRBit = grow_memmap(self.CRBit, self.Path, (stop,))
         super().extend(start, stop)
 
+    def swap(self, opened, closed):
+        super().swap(opened, closed)
+        self.CRBit[opened] = 1
+        self.CRBit[closed] = 0
+
+    def truncate(self, size):
+        super().truncate(size)
+        self.CRBit = grow_memmap(self.CRBit, self.Path, (size,))
+
     def flush(self, size):
         super().flush(size)
         self.ones(size)
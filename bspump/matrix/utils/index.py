@@ -2,6 +2,8 @@ import numpy as np
 import os
 import collections
 
+from .memmap import grow_memmap
+
 
 class Index(object):
     def __init__(self):
@@ -25,21 +27,47 @@ class Index(object):
         self.N2IMap[name] = index
         self.I2NMap[index] = name
 
+    def add_rows(self, names, indexes):
+        for name, index in zip(names, indexes.tolist()):
+            self.N2IMap[name] = index
+            self.I2NMap[index] = name
+
     def flush(self, indexes):
+        """
+        Renumbers rows after the rows at `indexes` were removed from the matrix.
+        A row keeps its position relative to other rows, same as in `Array.take()`.
+
+        :return: sorted list of former indexes of rows that were kept.
+        """
+        closed = np.unique(np.fromiter(indexes, dtype="i8"))
+        old = np.fromiter(self.N2IMap.values(), dtype="i8", count=len(self.N2IMap))
+        saved = ~np.isin(old, closed)
+        new = old - np.searchsorted(closed, old)
+
         n2imap = collections.OrderedDict()
         i2nmap = collections.OrderedDict()
-        i = 0
-        saved_indexes = []
-        for row_name, row_index in self.N2IMap.items():
-            if row_index not in indexes:
+        for row_name, keep, i in zip(self.N2IMap.keys(), saved.tolist(), new.tolist()):
+            if keep:
                 n2imap[row_name] = i
                 i2nmap[i] = row_name
-                saved_indexes.append(row_index)
-                i += 1
 
         self.N2IMap = n2imap
         self.I2NMap = i2nmap
-        return saved_indexes
+        return np.sort(old[saved]).tolist()
+
+    def move_rows(self, source, target):
+        """
+        Renames rows, the name of the row `source[i]` is given to the row `target[i]`.
+        """
+        for src, dst in zip(source.tolist(), target.tolist()):
+            row_name = self.I2NMap.pop(src, None)
+            if row_name is None:
+                continue
+            self.N2IMap[row_name] = dst
+            self.I2NMap[dst] = row_name
+
+    def truncate(self, size):
+        pass
 
     def serialize(self):
         return {
@@ -72,11 +100,11 @@ class PersistentIndex(Index):
 
         if os.path.exists(self.Path):
             self.Map = np.memmap(self.Path, dtype=self.DType, mode="readwrite")
-            for i in range(len(self.Map)):
-                value = self.Map[i]
-                if value != "":
-                    self.I2NMap[i] = value
-                    self.N2IMap[value] = i
+            indexes = np.flatnonzero(self.Map != "")
+            names = self.Map[indexes].tolist()
+            indexes = indexes.tolist()
+            self.I2NMap.update(zip(indexes, names))
+            self.N2IMap.update(zip(names, indexes))
         else:
             if size is None:
                 raise RuntimeError("The size should correspond to array size")
@@ -93,12 +121,20 @@ class PersistentIndex(Index):
         super().add_row(name, index)
         self.Map[index] = name
 
+    def add_rows(self, names, indexes):
+        super().add_rows(names, indexes)
+        self.Map[indexes] = names
+
     def extend(self, size):
-        map_ = np.zeros(self.Map.shape[0], dtype=self.DType)
-        map_[:] = self.Map[:]
-        map_.resize(size, refcheck=False)
-        self.Map = np.memmap(self.Path, dtype=self.DType, mode="w+", shape=map_.shape)
-        self.Map[:] = map_[:]
+        self.Map = grow_memmap(self.Map, self.Path, (size,))
+
+    def move_rows(self, source, target):
+        super().move_rows(source, target)
+        self.Map[target] = self.Map[source]
+        self.Map[source] = ""
+
+    def truncate(self, size):
+        self.Map = grow_memmap(self.Map, self.Path, (size,))
 
     def flush(self, closed_indexes):
         saved_indexes = super().flush(closed_indexes)
@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+
+
+def grow_memmap(array, path, shape, fill=None):
+    """
+    Grows the memory-mapped `array` stored in `path` to `shape` along the first axis.
+
+    The file is extended in place and mapped again, existing rows are neither read nor rewritten.
+    New rows are zeroed by the file system, unless `fill` is given.
+    A smaller `shape` truncates the file.
+
+    :return: new `np.memmap` of the `shape`.
+    """
+    dtype = array.dtype
+    current = array.shape[0]
+    if isinstance(array, np.memmap):
+        array.flush()
+    del array
+
+    size = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+    with open(path, "r+b") as f:
+        os.ftruncate(f.fileno(), size)
+
+    array = np.memmap(path, dtype=dtype, mode="r+", shape=tuple(shape))
+    if fill is not None:
+        array[current:] = fill
+    return array
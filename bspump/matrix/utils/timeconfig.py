@@ -9,12 +9,14 @@ class TimeConfig(object):
             ("columns", "i8"),
             ("start", "f8"),
             ("end", "f8"),
+            ("head", "i8"),  # Physical index of the oldest column
         ]
         self.TC = np.zeros(1, dtype=self.DType)
         self.TC["resolution"][0] = resolution
         self.TC["columns"][0] = columns
         self.TC["start"][0] = start
         self.TC["end"][0] = start - (resolution * columns)
+        self.TC["head"][0] = 0
 
     def get_resolution(self):
         return self.TC["resolution"][0]
@@ -28,6 +30,12 @@ class TimeConfig(object):
     def get_end(self):
         return self.TC["end"][0]
 
+    def get_head(self):
+        return int(self.TC["head"][0])
+
+    def set_head(self, head):
+        self.TC["head"][0] = head
+
     def set_resolution(self, resolution):
         self.TC["resolution"][0] = resolution
 
@@ -49,8 +57,20 @@ class PersistentTimeConfig(TimeConfig):
         super().__init__(resolution, columns, start)
         self.Path = path
         if os.path.exists(self.Path):
+            if os.path.getsize(self.Path) != np.dtype(self.DType).itemsize:
+                self._migrate()
             self.TC = np.memmap(self.Path, dtype=self.DType, mode="readwrite")
         else:
             tc = np.memmap(self.Path, dtype=self.DType, mode="w+", shape=(1,))
             tc[:] = self.TC[:]
             self.TC = tc
+
+    def _migrate(self):
+        """
+        Adds the `head` field to a time config stored before the matrix became a ring buffer.
+        """
+        old = np.fromfile(self.Path, dtype=self.DType[:-1], count=1)
+        tc = np.zeros(1, dtype=self.DType)
+        for name, _ in self.DType[:-1]:
+            tc[name][0] = old[name][0]
+        tc.tofile(self.Path)
@@ -1,6 +1,8 @@
 import numpy as np
 import os
 
+from .memmap import grow_memmap
+
 
 class WarmingUpCount(object):
     def __init__(self, size):
@@ -23,6 +25,15 @@ class WarmingUpCount(object):
     def flush(self, indexes):
         self.WUC = self.WUC.take(indexes, axis=0)
 
+    def move(self, source, target):
+        self.WUC[target] = self.WUC[source]
+
+    def truncate(self, size):
+        try:
+            self.WUC.resize(size, refcheck=False)
+        except ValueError:
+            self.WUC = self.WUC[:size].copy()
+
     def create(self, size):
         pass
 
@@ -40,20 +51,15 @@ class PersistentWarmingUpCount(WarmingUpCount):
             self.create(size)
 
     def extend(self, size, value):
-        start = self.WUC.shape[0]
-        end = size
-        wuc = np.empty(self.WUC.shape[0], dtype=self.DType)
-        wuc[:] = np.nan
-        wuc[:] = self.WUC[:]
-        wuc.resize(size, refcheck=False)
-        self.WUC = np.memmap(self.Path, dtype=self.DType, mode="w+", shape=wuc.shape)
-        self.WUC[:] = wuc[:]
-        self.WUC[start:end] = value
+        self.WUC = grow_memmap(self.WUC, self.Path, (size,), fill=value)
 
     def flush(self, indexes):
         super().flush(indexes)
         self.create(self.WUC.shape[0])
 
+    def truncate(self, size):
+        self.WUC = grow_memmap(self.WUC, self.Path, (size,))
+
     def create(self, size):
         wuc = np.memmap(self.Path, dtype=self.DType, mode="w+", shape=(size,))
         wuc[:] = self.WUC[:]
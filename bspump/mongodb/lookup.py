@@ -26,6 +26,9 @@ class MongoDBLookup(MappingLookup, AsyncLookupMixin):
 
             *key* - field name to match
 
+            *batch_window* - seconds to collect cache misses into a single `$in` query (default is 0, disabled)
+
+            *batch_size* - maximum number of keys in a single query (default is 100)
 
             Example:
 
@@ -152,6 +155,24 @@ class MongoDBLookup(MappingLookup, AsyncLookupMixin):
             query
         )
 
+    async def _fetch_one(self, key):
+        return await self._find_one(self.build_query(key))
+
+    def build_many_query(self, keys):
+        """
+        Override this method together with `build_query()` to build your own query of many keys.
+        """
+        return {self.Key: {"$in": keys}}
+
+    async def _find_many(self, keys):
+        values = {}
+        cursor = self.Connection.Client[self.Database][self.Collection].find(
+            self.build_many_query(keys)
+        )
+        async for document in cursor:
+            values.setdefault(document.get(self.Key), document)
+        return values
+
     async def _changestream(self):
         try:
             async with self.Connection.Client[self.Database][
@@ -175,8 +196,7 @@ class MongoDBLookup(MappingLookup, AsyncLookupMixin):
             value = self.Cache[key]
             self.CacheCounter.add("hit", 1)
         except KeyError:
-            query = self.build_query(key)
-            value = await self._find_one(query)
+            value = await self.fetch(key)
             if value is not None:
                 self.Cache[key] = value
                 self.CacheCounter.add("miss", 1)
@@ -2,6 +2,10 @@ from bspump import Sink
 import asyncio
 import logging
 
+import bson
+import bson.raw_bson
+import pymongo.errors
+
 
 L = logging.getLogger(__name__)
 
@@ -19,11 +23,22 @@ class MongoDBSink(Sink):
     inside of this database in the sink itself by modifying the ConfigDefaults while instantiating
     the class.
 
+    Events are collected into batches per collection, that are written by `insert_many(ordered=False)`.
+    A batch is sent when it reaches "bulk_max_size" documents or "bulk_max_bytes" bytes of BSON,
+    or "bulk_linger" seconds after its first document. Up to "bulk_concurrency" batches are written concurrently.
+    Documents are encoded into BSON when they are added to a batch, the `_id` is then assigned by the server.
+    Documents that failed are counted by the "fail" value of the "mongodb.insert" metric, the rest is written.
+
     """
 
     ConfigDefaults = {
         "output_queue_max_size": 100,
         "collection": "collection",  # default collection, if not specified inside context
+        "bulk_max_size": 1000,  # Maximum number of documents in a batch
+        "bulk_max_bytes": 8 * 1024 * 1024,  # Maximum size of documents in a batch
+        "bulk_linger": 0.1,  # Seconds to wait for more documents, before a batch is sent
+        "bulk_concurrency": 4,  # Maximum number of batches written concurrently
+        "fail_log_max_size": 20,  # Maximum number of errors logged for a batch
     }
 
     def __init__(self, app, pipeline, connection, id=None, config=None):
@@ -31,6 +46,7 @@ class MongoDBSink(Sink):
         # We make use of a connection and pipeline, defined in a different place of the pump.
         self.Connection = pipeline.locate_connection(app, connection)
         self.Pipeline = pipeline
+        self.Loop = app.Loop
 
         self._output_queue = asyncio.Queue()
         self._output_queue_max_size = int(self.Config["output_queue_max_size"])
@@ -38,6 +54,33 @@ class MongoDBSink(Sink):
         assert self._output_queue_max_size >= 1, "Output queue max size invalid"
         self._conn_future = None
 
+        self.BulkMaxSize = int(self.Config["bulk_max_size"])
+        self.BulkMaxBytes = int(self.Config["bulk_max_bytes"])
+        self.BulkLinger = float(self.Config["bulk_linger"])
+        self.BulkSemaphore = asyncio.Semaphore(int(self.Config["bulk_concurrency"]))
+        self.FailLogMaxSize = int(self.Config["fail_log_max_size"])
+        self.Batches = {}  # Collection name -> [documents, size, deadline]
+        self.InFlight = set()
+
+        metrics_service = app.get_service("asab.MetricsService")
+        self.InsertMetric = metrics_service.create_counter(
+            "mongodb.insert",
+            tags={"sink": self.Id},
+            init_values={
+                "ok": 0,
+                "fail": 0,
+                "bulk": 0,
+            },
+        )
+        self.QueueMetric = metrics_service.create_gauge(
+            "mongodb.outputqueue",
+            tags={"sink": self.Id},
+            init_values={
+                "size": 0,
+                "inflight": 0,
+            },
+        )
+
         self._on_health_check("Connection.open!")
         # This part subscribes to outside events used to control the flow of the whole pump.
         # Depending on the specific event, a related class method gets called.
@@ -46,6 +89,9 @@ class MongoDBSink(Sink):
         app.PubSub.subscribe("Application.exit!", self._on_exit)
 
     def _on_health_check(self, message_type):
+        self.QueueMetric.set("size", self._output_queue.qsize())
+        self.QueueMetric.set("inflight", len(self.InFlight))
+
         # At this point we examine the state of the _conn_future instance variable, queueing _outfluxing
         # in case it is None, returning early if the future is not done and resetting _conn_future to None otherwise.
         if self._conn_future is not None:
@@ -87,11 +133,26 @@ class MongoDBSink(Sink):
         db = self.Connection.Client[self.Connection.Database]
 
         while True:
-            # Here is where we await the event (which in this case contains the data we want to save to the database)
-            # to be pulled out of the queue and saved to a local variable.
-            context, event = await self._output_queue.get()
+            # Wait for the next event, but not longer than until the oldest batch is due
+            timeout = None
+            if len(self.Batches) > 0:
+                deadline = min(batch[2] for batch in self.Batches.values())
+                timeout = max(0.0, deadline - self.Loop.time())
+
+            try:
+                context, event = await asyncio.wait_for(
+                    self._output_queue.get(), timeout
+                )
+            except asyncio.TimeoutError:
+                await self._send_due(db)
+                continue
 
             if event is None:
+                # Stop, send what has been collected and wait for all batches
+                for name in list(self.Batches.keys()):
+                    await self._send(db, name)
+                if len(self.InFlight) > 0:
+                    await asyncio.wait(list(self.InFlight))
                 break
 
             # We check the queue size and remove throttling if the size is smaller than its defined max size.
@@ -99,20 +160,94 @@ class MongoDBSink(Sink):
                 self.Pipeline.throttle(self, False)
 
             # Obtain the collection to put the obtained item to
-            collection = db[context.get("collection", self.Collection)]
-
-            # At this point, we check what kind of item we pulled from the queue. If its None, it means we
-            # reached what was inserted by _on_application_stop and we break the loop immediately.
-            # If this is not the case we continue determining the type of the item and proceed accordingly,
-            # including raising a type error, if the type is unexpected.
+            name = context.get("collection", self.Collection)
 
             if type(event) == dict:
-                await collection.insert_one(event)
-                self._output_queue.task_done()
+                await self._add(db, name, event)
             elif type(event) == list and len(event) > 0:
-                await collection.insert_many(event)
-                self._output_queue.task_done()
+                for document in event:
+                    await self._add(db, name, document)
             else:
-                raise TypeError(
-                    f"Only dict or list of dicts allowed, {type(event)} supplied"
+                L.error(
+                    "Only dict or list of dicts allowed, {} supplied".format(
+                        type(event)
+                    )
+                )
+                self.InsertMetric.add("fail", 1)
+
+            self._output_queue.task_done()
+
+    async def _add(self, db, name, document):
+        try:
+            document = bson.raw_bson.RawBSONDocument(bson.encode(document))
+        except Exception as e:
+            L.error("Failed to encode the document into BSON: {}".format(e))
+            self.InsertMetric.add("fail", 1)
+            return
+
+        size = len(document.raw)
+        batch = self.Batches.get(name)
+        if batch is not None and batch[1] + size > self.BulkMaxBytes:
+            await self._send(db, name)
+            batch = None
+
+        if batch is None:
+            batch = [[], 0, self.Loop.time() + self.BulkLinger]
+            self.Batches[name] = batch
+
+        batch[0].append(document)
+        batch[1] += size
+        if len(batch[0]) >= self.BulkMaxSize:
+            await self._send(db, name)
+
+    async def _send_due(self, db):
+        now = self.Loop.time()
+        for name, batch in list(self.Batches.items()):
+            if batch[2] <= now:
+                await self._send(db, name)
+
+    async def _send(self, db, name):
+        documents, _, _ = self.Batches.pop(name)
+        if len(documents) == 0:
+            return
+
+        # Wait for a free slot, which applies the back pressure to the queue
+        await self.BulkSemaphore.acquire()
+        task = asyncio.ensure_future(self._write(db[name], documents))
+        self.InFlight.add(task)
+        task.add_done_callback(self._on_written)
+
+    def _on_written(self, task):
+        self.InFlight.discard(task)
+        self.BulkSemaphore.release()
+        if not task.cancelled() and task.exception() is not None:
+            L.error("Unexpected error of a MongoDB bulk: {}".format(task.exception()))
+
+    async def _write(self, collection, documents):
+        self.InsertMetric.add("bulk", 1)
+        try:
+            result = await collection.insert_many(documents, ordered=False)
+
+        except pymongo.errors.BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+            errors = e.details.get("writeErrors", [])
+            self.InsertMetric.add("ok", inserted)
+            self.InsertMetric.add("fail", len(documents) - inserted)
+            for error in errors[: self.FailLogMaxSize]:
+                L.error(
+                    "Failed to insert a document into '{}': {}".format(
+                        collection.name, error.get("errmsg")
+                    )
                 )
+            return
+
+        except Exception as e:
+            self.InsertMetric.add("fail", len(documents))
+            L.error(
+                "Failed to insert {} documents into '{}': {}".format(
+                    len(documents), collection.name, e
+                )
+            )
+            return
+
+        self.InsertMetric.add("ok", len(result.inserted_ids))
@@ -1,10 +1,9 @@
 import logging
 import os
 import json
-from asab.timer import Timer
 import pyarrow as pa
 import pyarrow.parquet as pq
-import pandas as pd
+from bspump.asab import Timer
 from bspump.abc.sink import Sink
 
 #
@@ -32,8 +31,21 @@ class ParquetSink(Sink):
                             "type": "float"
                     }
             }
+
+    Events are buffered by columns (a list of values per column) and every "rows_in_chunk" rows
+    are converted into an Arrow record batch, that is written as a single row group of the Parquet file.
+    Columns of string, bool, float, int and bytearray types are typed by the schema, other types are inferred.
+    Columns of the file are given by the first written batch, values of other columns are not written.
     """
 
+    ArrowTypes = {
+        "string": pa.string(),
+        "bool": pa.bool_(),
+        "float": pa.float64(),
+        "int": pa.int64(),
+        "bytearray": pa.binary(),
+    }
+
     ConfigDefaults = {
         "rows_in_chunk": 1000,
         "rollover_mechanism": "rows",  # or time
@@ -50,14 +62,21 @@ class ParquetSink(Sink):
         self.Counter = metrics_service.create_counter(
             "counter", tags={}, init_values={"parquet.error": 0}
         )
+        self.ThroughputCounter = metrics_service.create_eps_counter(
+            "parquet.throughput",
+            tags={"sink": self.Id},
+            init_values={"rows": 0, "bytes": 0},
+        )
         self.Gauge = metrics_service.create_gauge(
             "gauge",
             tags={},
             init_values={"parquet.missing_attributes": 0, "parquet.new_attributes": 0},
         )
 
-        self.Frames = []
-        self.ChunkSize = self.Config["rows_in_chunk"]
+        self.Columns = {}  # Column name -> list of values
+        self.ColumnTypes = {}
+        self.RowCount = 0
+        self.ChunkSize = int(self.Config["rows_in_chunk"])
         self.Index = 0
         self.RolloverMechanism = self.Config["rollover_mechanism"]
         self.FileNameTemplate = self.Config["file_name_template"]
@@ -91,24 +110,27 @@ class ParquetSink(Sink):
                 print(str(schema_is_valid))
                 if schema_is_valid:
                     self.Schema = schema
+                    self.ColumnTypes = {
+                        name: self.ArrowTypes.get(descr["type"])
+                        for name, descr in schema.items()
+                    }
                 else:
                     self.SchemaDefined = False
 
         if self.RolloverMechanism == "rows":
-            if self.Config["rows_per_file"] % self.ChunkSize != 0:
-                self.ChunksPerFile = int(
-                    round(self.Config["rows_per_file"] / self.ChunkSize)
-                )
+            rows_per_file = int(self.Config["rows_per_file"])
+            if rows_per_file % self.ChunkSize != 0:
+                self.ChunksPerFile = int(round(rows_per_file / self.ChunkSize))
                 L.warning(
                     "rows_per_file % rows_in_chunk needs to be zero. rows_per_file was rounded"
                 )
-            elif self.Config["rows_per_file"] < self.ChunkSize:
+            elif rows_per_file < self.ChunkSize:
                 self.ChunksPerFile = 1
                 L.warning(
                     "rows_per_file needs to be equal or greater than rows_in_chunk, rows_per_file changed to rows_in_chunk value"
                 )
             else:
-                self.ChunksPerFile = int(self.Config["rows_per_file"] / self.ChunkSize)
+                self.ChunksPerFile = int(rows_per_file / self.ChunkSize)
             self.Chunks = 0
 
         elif self.RolloverMechanism == "time":
@@ -200,8 +222,7 @@ class ParquetSink(Sink):
         if new_attrs_count > 0:
             self.NewSet = self.NewSet.union([k for k in event])
 
-        df = pd.DataFrame([data])
-        return df
+        return data
 
     def build_filename(self, postfix=""):
         return (
@@ -218,30 +239,85 @@ class ParquetSink(Sink):
 
     def process(self, context, event):
         if self.SchemaDefined:
-            df = self.apply_schema(event)
+            row = self.apply_schema(event)
         else:
-            df = pd.DataFrame([event])
-        self.Frames.append(df)
+            row = event
+        self.append(row)
 
-        if self.RolloverMechanism == "rows" and (len(self.Frames) >= self.ChunkSize):
-            self.Chunks = self.Chunks + 1
-            if self.Chunks >= self.ChunksPerFile:
-                self.rotate()
+        # The buffer is bounded by the chunk size in every rollover mode
+        if self.RowCount >= self.ChunkSize:
+            if self.RolloverMechanism == "rows":
+                self.Chunks = self.Chunks + 1
+                if self.Chunks >= self.ChunksPerFile:
+                    self.rotate()
 
             self.flush()
 
+    def append(self, row):
+        """
+        Appends values of the `row` to the columns, missing values are None.
+        """
+        count = self.RowCount
+        for name, value in row.items():
+            column = self.Columns.get(name)
+            if column is None:
+                column = [None] * count
+                self.Columns[name] = column
+            column.append(value)
+
+        self.RowCount = count + 1
+        if len(row) < len(self.Columns):
+            for column in self.Columns.values():
+                if len(column) == count:
+                    column.append(None)
+
+    def build_batch(self):
+        """
+        Converts the buffered columns into an Arrow record batch.
+        Once the file is open, the batch is aligned to its schema.
+        """
+        if self._pq_writer is None:
+            names = list(self.Columns.keys())
+            arrays = [
+                pa.array(self.Columns[name], type=self.ColumnTypes.get(name))
+                for name in names
+            ]
+            return pa.RecordBatch.from_arrays(arrays, names=names)
+
+        schema = self._pq_writer.schema
+        new = set(self.Columns.keys()).difference(schema.names)
+        if len(new) > 0:
+            self.NewSet = self.NewSet.union(new)
+
+        arrays = []
+        for field in schema:
+            values = self.Columns.get(field.name)
+            if values is None:
+                arrays.append(pa.nulls(self.RowCount, type=field.type))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
     def flush(self):
-        if len(self.Frames) != 0:
-            table = pa.Table.from_pandas(pd.concat(self.Frames))
+        if self.RowCount == 0:
+            return
+
+        try:
+            batch = self.build_batch()
             if self._pq_writer is None:
                 self._pq_writer = pq.ParquetWriter(
-                    self.build_filename("-open"), table.schema
+                    self.build_filename("-open"), batch.schema
                 )
-            try:
-                self._pq_writer.write_table(table=table)
-            except Exception as e:
-                L.warning(e)
-            self.Frames = []
+            self._pq_writer.write_batch(batch)
+        except Exception as e:
+            self.Counter.add("parquet.error", 1)
+            L.warning(e)
+        else:
+            self.ThroughputCounter.add("rows", batch.num_rows)
+            self.ThroughputCounter.add("bytes", batch.nbytes)
+
+        self.Columns = {}
+        self.RowCount = 0
 
     async def rotate_async(self):
         self.rotate()
@@ -252,11 +328,13 @@ class ParquetSink(Sink):
         """
 
         self.flush()
-        del self._pq_writer
+        if self._pq_writer is not None:
+            self._pq_writer.close()
         self._pq_writer = None
 
         current_fname = self.build_filename("-open")
-        os.rename(current_fname, current_fname[:-5])
+        if os.path.exists(current_fname):
+            os.rename(current_fname, current_fname[:-5])
 
         if self.RolloverMechanism == "rows":
             self.Chunks = 0
@@ -13,6 +13,7 @@ import bspump.asab
 from bspump.asab.alert import Alert
 from .abc.connection import Connection
 from .abc.generator import Generator
+from .abc.processor import ProcessorBase, ProcessorProfiler
 from .abc.sink import Sink
 from .abc.source import Source
 from .analyzer import Analyzer
@@ -52,6 +53,7 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
         "async_concurency_limit": 1000,  # TODO concurrency
         "reset_profiler": True,
         "stop_on_errors": True,
+        "profiler_sampling": 1,  # Measure the duration of every N-th run of a processor
     }
 
     def __init__(self, app, id=None, config=None):
@@ -89,6 +91,8 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
         self.AsyncFutures = []
         self.AsyncConcurencyLimit = int(self.Config["async_concurency_limit"])
         self.ResetProfiler = self.Config.getboolean("reset_profiler")
+        self.ProfilerSampling = int(self.Config["profiler_sampling"])
+        assert self.ProfilerSampling >= 1
         assert self.AsyncConcurencyLimit > 1
 
         # This object serves to identify the throttler, because list cannot be used as a throttler
@@ -138,6 +142,7 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
         self.ProcessorsCounter = {}
 
         app.PubSub.subscribe("Metrics.flush!", self._on_metrics_flush)
+        app.PubSub.subscribe("Application.tick!", self._on_tick)
 
         # Pipeline logger
         self.L = PipelineLogger(
@@ -185,6 +190,34 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
         """
         return self._throttles
 
+    def _on_tick(self, event_type):
+        self.flush_profiler()
+
+    def flush_profiler(self):
+        """
+        Moves values accumulated by processors' profilers into the processor and profiler metrics.
+
+        The duration is extrapolated from the sampled runs when `profiler_sampling` is greater than 1.
+
+        """
+        for processor in self.iter_processors():
+            profiler = processor.Profiler
+            if profiler.Run == 0 and profiler.EventDrop == 0:
+                continue
+
+            run, drop, duration = profiler.flush()
+
+            counter = self.ProcessorsCounter.get(processor.Id)
+            if counter is not None:
+                counter.add("event.in", run)
+                counter.add("event.out", run)
+                counter.add("event.drop", drop)
+
+            counter = self.ProfilerCounter.get(processor.Id)
+            if counter is not None:
+                counter.add("duration", duration)
+                counter.add("run", run)
+
     def _on_metrics_flush(self, event_type):
         """
         Description: Pipeline is ...
@@ -195,6 +228,8 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
 
         :return: xxxx
         """
+        self.flush_profiler()
+
         for field in self.MetricsCounter.Storage["fieldset"]:
             values = field["values"]
             if values["event.in"] == 0:
@@ -466,9 +501,17 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
         :return:
         """
         for processor in self.Processors[depth]:
-            t0 = time.perf_counter()
+            profiler = processor.Profiler
+            profiler.Run += 1
+            profiler.Countdown -= 1
+            if profiler.Countdown == 0:
+                # Sample the duration of this run
+                profiler.Countdown = profiler.SamplingRate
+                t0 = time.perf_counter()
+            else:
+                t0 = None
+
             try:
-                self.ProcessorsCounter[processor.Id].add("event.in", 1)
                 event = processor.process(context, event)
                 processor.EventCount += 1
                 if (
@@ -486,31 +529,149 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
             except SystemExit as e:
                 raise e
             except BaseException as e:
-                self.ProcessorsCounter[processor.Id].add("event.drop", 1)
+                profiler.EventDrop += 1
                 if depth > 0:
                     raise  # Handle error on the top depth
                 self.set_error(context, event, e)
                 event = None  # Event is discarted
 
             finally:
-                self.ProcessorsCounter[processor.Id].add("event.out", 1)
-                self.ProfilerCounter[processor.Id].add(
-                    "duration", time.perf_counter() - t0
-                )
-                self.ProfilerCounter[processor.Id].add("run", 1)
+                if t0 is not None:
+                    profiler.Duration += time.perf_counter() - t0
+                    profiler.Sampled += 1
 
             if event is None:  # Event has been consumed on the way
                 if len(self.Processors) == (depth + 1):
                     if isinstance(processor, Sink):
-                        # self.ProcessorsCounter[processor.Id].add('event.out', 1)
                         self.MetricsEPSCounter.add("eps.out", 1)
                         self.MetricsCounter.add("event.out", 1)
                     else:
-                        self.ProcessorsCounter[processor.Id].add("event.drop", 1)
+                        profiler.EventDrop += 1
                         self.MetricsEPSCounter.add("eps.drop", 1)
                         self.MetricsCounter.add("event.drop", 1)
                 return
 
+        self._do_sink(event, context)
+
+    def _do_process_batch(self, events, depth, context, start=0):
+        """
+        Batch counterpart of `_do_process()`.
+
+        Events are passed through every processor of the given depth as a list, so that the metrics,
+        the profiler and the MQTT bookkeeping is paid once per batch and processor instead of once per event.
+        All events of the batch share the same `context`.
+
+        When an event fails and the error makes the pipeline not ready, the rest of the batch is deferred,
+        like events of a source that wait for the pipeline to be ready again.
+        `start` is the index of the processor to continue with the deferred events.
+
+        :return: None or a tuple `(start, events, context)` of deferred events
+        """
+        deferred = None
+        processors = self.Processors[depth]
+        for index in range(start, len(processors)):
+            processor = processors[index]
+            profiler = processor.Profiler
+            t0 = time.perf_counter()
+            count = len(events)
+
+            if type(processor).process_batch is ProcessorBase.process_batch:
+                # Processor doesn't implement its own batch processing,
+                # keep the per-event error isolation of the process() method
+                events, processed, remaining = self._process_batch_per_event(
+                    processor, events, depth, context
+                )
+                if len(remaining) > 0:
+                    deferred = (index, remaining, context)
+                    count -= len(remaining)
+            else:
+                try:
+                    events = processor.process_batch(context, events)
+                    processed = count
+                except SystemExit as e:
+                    raise e
+                except BaseException as e:
+                    profiler.EventDrop += count
+                    if depth > 0:
+                        raise  # Handle error on the top depth
+                    self.set_error(context, events, e)
+                    events = []  # Batch is discarted
+                    processed = 0
+
+            processor.EventCount += processed
+            profiler.Run += count
+            profiler.Duration += time.perf_counter() - t0
+            profiler.Sampled += count
+
+            if (
+                self.MQTTService
+                and len(events) > 0
+                and self.PublishingProcessors.get(processor.Id, 0) > 0
+            ):
+                for event in events[: self.PublishingProcessors[processor.Id]]:
+                    self.MQTTService.publish_event(
+                        self.Id,
+                        processor,
+                        event,
+                        self.PublishingProcessors[processor.Id],
+                    )
+                    self.PublishingProcessors[processor.Id] -= 1
+
+            consumed = count - len(events)
+            if consumed > 0 and len(self.Processors) == (depth + 1):
+                if isinstance(processor, Sink):
+                    self.MetricsEPSCounter.add("eps.out", consumed)
+                    self.MetricsCounter.add("event.out", consumed)
+                else:
+                    profiler.EventDrop += consumed
+                    self.MetricsEPSCounter.add("eps.drop", consumed)
+                    self.MetricsCounter.add("event.drop", consumed)
+
+            if len(events) == 0:  # All events have been consumed on the way
+                return deferred
+
+        for event in events:
+            self._do_sink(event, context)
+
+        return deferred
+
+    def _process_batch_per_event(self, processor, events, depth, context):
+        """
+        Processes the batch by calling `process()` of the processor for each event.
+        A failing event is discarded and reported by `set_error()`, the rest of the batch continues,
+        unless the error made the pipeline not ready.
+
+        :return: tuple of the list of events that have not been consumed by the processor,
+                the number of successfully processed events and the list of events that were not processed
+        """
+        result = []
+        processed = 0
+        for i, event in enumerate(events):
+            try:
+                event = processor.process(context, event)
+            except SystemExit as e:
+                raise e
+            except BaseException as e:
+                processor.Profiler.EventDrop += 1
+                if depth > 0:
+                    raise  # Handle error on the top depth
+                self.set_error(context, event, e)
+                if not self.is_ready():
+                    return result, processed, events[i + 1 :]
+                continue  # Event is discarted
+
+            processed += 1
+            if event is not None:
+                result.append(event)
+
+        return result, processed, []
+
+    def _do_sink(self, event, context):
+        """
+        Passes the event that went through all processors to the first matching conditional sink.
+
+        :return:
+        """
         if self.Sinks:
             for c, s in self.Sinks:
                 if c(event):
@@ -519,7 +680,6 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
                         event = e
                         break
             else:
-                event = None
                 return
 
         assert event is not None
@@ -586,6 +746,74 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
 
         self.inject(context, event, depth=0)
 
+    def inject_batch(self, context, events, depth):
+        """
+        Injects a batch of events into the :meth:`Pipeline <bspump.Pipeline()>`'s depth defined by the depth attribute.
+        The context is copied once and shared by all events of the batch.
+
+        **Parameters**
+
+        context : dict
+                        Information propagated through the :meth:`Pipeline <bspump.Pipeline()>`.
+
+        events : list
+                        List of events to be processed.
+
+        depth : int
+                        Level of depth.
+
+        :note: For normal operations, it is highly recommended to use process_batch method instead.
+
+        :return: None or events deferred by an error, see `_do_process_batch()`
+
+        """
+        if context is None:
+            context = self._context.copy()
+        else:
+            context = context.copy()
+            context.update(self._context)
+
+        return self._do_process_batch(events, depth, context)
+
+    async def process_batch(self, events, context=None):
+        """
+        Process_batch method serves to inject a batch of events into the :meth:`Pipeline <bspump.Pipeline()>`'s depth 0,
+        while incrementing the event in metric.
+
+        The per-event overhead of the :meth:`Pipeline <bspump.Pipeline()>` (context copy, metrics, profiling)
+        is amortized over the whole batch. All events of the batch share the same context.
+
+        **Parameters**
+
+        events : list
+                        List of events, each in the same format as accepted by the process method.
+
+        context : dict, default None
+                        Context shared by all events in the batch.
+
+        :hint: Processors can implement `process_batch()` to handle the whole batch at once.
+
+        """
+
+        while not self.is_ready():
+            await self.ready()
+
+        if not isinstance(events, list):
+            events = list(events)
+
+        if len(events) == 0:
+            return
+
+        self.MetricsEPSCounter.add("eps.in", len(events))
+        self.MetricsCounter.add("event.in", len(events))
+
+        deferred = self.inject_batch(context, events, depth=0)
+        while deferred is not None:
+            # The rest of the batch continues, when the error is cleared
+            await self.ready()
+            start, events, context = deferred
+            deferred = self._do_process_batch(events, 0, context, start)
+
     def create_eps_counter(self):
         """
         Creates a dictionary with information about the :meth:`Pipeline <bspump.Pipeline()>`. It contains eps (events per second), warnings and errors.
@@ -765,6 +993,8 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
 
         :return:
         """
+        processor.Profiler = ProcessorProfiler(self.ProfilerSampling)
+
         self.ProfilerCounter[processor.Id] = self.MetricsService.create_counter(
             "bspump.pipeline.profiler",
             tags={
@@ -945,6 +1175,8 @@ class Pipeline(abc.ABC, bspump.asab.Configurable):
 
         :return:
         """
+        self.flush_profiler()
+
         rest = {
             "Id": self.Id,
             "Ready": self.is_ready(),
@@ -22,7 +22,7 @@ class PostgreSQLLookup(MappingLookup, AsyncLookupMixin):
     PostgreSQLLookup also has a simple cache to reduce a number of database hits.
 
     PostgreSQLLookup allows to specify custom cache strategy via `cache` parameter, as shown in the example below.
-    LRUCacheDict removes last used elements, if the time they were lastly used exceeds the specified `max_duration` or the cache dictionary exceeds `max_size`.
+    LRUCacheDict removes least recently used elements, if the cache dictionary exceeds `max_size` (or `max_bytes`), and elements older than `max_duration`.
     For more information, please see: https://en.wikipedia.org/wiki/Cache_replacement_policies#Least_recently_used_(LRU)
 
     First, it is needed to create PostgreSQLLookup instance and register it inside the BSPump service:
@@ -46,6 +46,10 @@ class PostgreSQLLookup(MappingLookup, AsyncLookupMixin):
 
             from="Orders INNER JOIN Customers ON Orders.CustomerID=Customers.CustomerID"
 
+    Concurrent misses of the same key share a single query. If the configuration option "batch_window" is set (in seconds),
+    misses collected during the window are obtained by a single "query_find_many" query of up to "batch_size" keys.
+    The "statement" must then select the key column, so that the records can be matched with their keys.
+
     The PostgreSQLLookup can be then located and used inside a custom enricher:
 
             class AsyncEnricher(bspump.Generator):
@@ -71,6 +75,7 @@ class PostgreSQLLookup(MappingLookup, AsyncLookupMixin):
         "from": "",  # Specify the FROM object, which can be a table or a query string
         "key": "",  # Specify key name used for search
         "query_find_one": "SELECT {} FROM {} WHERE {}=%s;",  # Specify query string to find one record in database using key
+        "query_find_many": "SELECT {} FROM {} WHERE {} = ANY(%s);",  # Specify query string to find records of many keys, used by batching
         "query_count": 'SELECT COUNT(*) as "count" FROM {};',  # Specify query string to count number of records in the database
         "query_iter": "SELECT {} FROM {};",  # Specify general query string for the iterator
     }
@@ -84,6 +89,7 @@ class PostgreSQLLookup(MappingLookup, AsyncLookupMixin):
         self.Key = self.Config["key"]
 
         self.QueryFindOne = self.Config["query_find_one"]
+        self.QueryFindMany = self.Config["query_find_many"]
         self.QueryCount = self.Config["query_count"]
         self.QueryIter = self.Config["query_iter"]
 
@@ -125,6 +131,38 @@ class PostgreSQLLookup(MappingLookup, AsyncLookupMixin):
                         return None
                     raise e
 
+    async def _find_many(self, keys):
+        query = self.QueryFindMany.format(self.Statement, self.From, self.Key)
+        async with self.Connection.acquire() as connection:
+            async with connection.cursor(
+                cursor_factory=psycopg2.extras.RealDictCursor
+            ) as cursor_async:
+                try:
+                    await cursor_async.execute(query, (list(keys),))
+                    rows = await cursor_async.fetchall()
+                    return self._rows_by_key(rows)
+                except (
+                    psycopg2.OperationalError,
+                    psycopg2.ProgrammingError,
+                    psycopg2.InternalError,
+                ) as e:
+                    if e.pgcode in self.Connection.RetryErrors:
+                        L.warning(
+                            "Recoverable error '{}' ({}) occurred in PostgreSQLLookup. Skipping lookup.".format(
+                                e.pgerror, e.pgcode
+                            )
+                        )
+                        return {}
+                    raise e
+
+    def _rows_by_key(self, rows):
+        # The key may be qualified by a table name, while the column of the row is not
+        column = self.Key.rsplit(".", 1)[-1]
+        values = {}
+        for row in rows:
+            values.setdefault(row.get(column), row)
+        return values
+
     async def _count(self):
         query = self.QueryCount.format(self.From)
         async with self.Connection.acquire() as connection:
@@ -144,7 +182,7 @@ class PostgreSQLLookup(MappingLookup, AsyncLookupMixin):
             value = self.Cache[key]
             self.CacheCounter.add("hit", 1)
         except KeyError:
-            value = await self._find_one(key)
+            value = await self.fetch(key)
             self.Cache[key] = value
             self.CacheCounter.add("miss", 1)
 
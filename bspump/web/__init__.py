@@ -86,14 +86,48 @@ async def lookup(request):
     if (request_etag is not None) and (request_etag == response_etag):
         raise aiohttp.web.HTTPNotModified()
 
+    headers = {"ETag": response_etag}
+    version = getattr(lookup, "Version", None)
+    if version is not None:
+        headers["X-Lookup-Version"] = version
+
     return aiohttp.web.Response(
         body=data,
         status=200,
-        headers={"ETag": response_etag},
+        headers=headers,
         content_type="application/octet-stream",
     )
 
 
+@noauth
+async def lookup_delta(request):
+    """
+    Returns changes of the lookup since the version given by the `since` query parameter,
+    410 Gone if they are no longer available.
+    """
+    lookup_id = request.match_info.get("lookup_id")
+    app = request.app["app"]
+    svc = app.get_service("bspump.PumpService")
+
+    try:
+        lookup = svc.locate_lookup(lookup_id)
+    except KeyError:
+        raise aiohttp.web.HTTPNotFound()
+
+    if not hasattr(lookup, "get_delta"):
+        raise aiohttp.web.HTTPNotImplemented()
+
+    since = request.query.get("since")
+    if since is None:
+        raise aiohttp.web.HTTPBadRequest()
+
+    delta = lookup.get_delta(since)
+    if delta is None:
+        raise aiohttp.web.HTTPGone()
+
+    return json_response(request, delta)
+
+
 @noauth
 async def manifest(request):
     """
@@ -149,6 +183,7 @@ def initialize_web(container):
     container.WebApp.router.add_get("/bspump/v1/lookup", lookup_list)
     container.WebApp.router.add_get("/bspump/v1/lookup/{lookup_id}", lookup)
     container.WebApp.router.add_get("/bspump/v1/lookup/{lookup_id}/meta", lookup_meta)
+    container.WebApp.router.add_get("/bspump/v1/lookup/{lookup_id}/delta", lookup_delta)
 
     container.WebApp.router.add_get("/bspump/v1/manifest", manifest)
 
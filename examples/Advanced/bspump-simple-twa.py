@@ -71,7 +71,8 @@ class MyTimeWindowAnalyzer(bspump.analyzer.TimeWindowAnalyzer):
             return
 
         # selecting part of matrix specified in configuration
-        x = self.TimeWindow.Array[:, :]
+        # Columns ordered from the oldest to the newest one
+        x = self.TimeWindow.get_array()
 
         for row in range(0, len(x)):
             for column in range(0, len(x[row])):
@@ -89,10 +89,16 @@ class MyTimeSeriesPredictor(bspump.timeseries.TimeSeriesPredictor):
         self.TimeWindow.add_row("One and only row")
 
     def get_sample(self, column):
+        # The column points into the ring buffer, the sample is taken from the preceding columns in time
+        head = self.TimeWindow.TimeConfig.get_head()
+        column = (column - head) % self.TimeWindow.Array.shape[1]
         if (column - self.Model.WindowSize) < 0:
             return None
 
-        sample = self.TimeWindow.Array[0, (column - self.Model.WindowSize) : column]
+        columns = self.TimeWindow.get_physical_column(
+            np.arange(column - self.Model.WindowSize, column)
+        )
+        sample = self.TimeWindow.Array[0, columns]
         # if np.any(sample['count'] == 0): # not ready
         # 	return None
 
@@ -115,16 +121,17 @@ class MyTimeSeriesPredictor(bspump.timeseries.TimeSeriesPredictor):
         self.TimeWindow.Array[0, column]["predicted"] = value
 
     def alarm(self):
+        array = self.TimeWindow.get_array()
         error = tf.keras.metrics.mean_absolute_error(
-            self.TimeWindow.Array[0, :]["value"],
-            self.TimeWindow.Array[0, :]["predicted"],
+            array[0, :]["value"],
+            array[0, :]["predicted"],
         ).numpy()
         print("mean absolute error", error)
 
     async def analyze(self, message_type):
         print("Analyzing...")
         self.alarm()
-        predicted = self.TimeWindow.Array[0, :]["predicted"].tolist()
+        predicted = self.TimeWindow.get_array()[0, :]["predicted"].tolist()
         with open("examples/timeseries/exported.json", "w") as f:
             json.dump({"predicted": predicted}, f)
 
@@ -142,10 +142,11 @@ class MyTimeWindowAnalyzer(bspump.analyzer.TimeWindowAnalyzer):
             return
 
         # selecting part of matrix specified in configuration
-        x = self.TimeWindow.Array[:, :]
+        # Columns ordered from the oldest to the newest one
+        x = self.TimeWindow.get_array()
 
-        # if any of time slots is 0
-        if np.any(x == 0):
+        # if any of time slots is 0 (or NaN, columns added by advancing the window are not filled)
+        if np.any((x == 0) | np.isnan(x)):
             print("Alarm!")
 
 
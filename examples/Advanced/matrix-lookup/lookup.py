@@ -59,10 +59,10 @@ class MyMatrixLookup(bspump.lookup.MatrixLookup):
         if len(set_channel) == 0:
             return None
         # ee = time.time()
-        try:
-            intersect = list(set_timestamp & set_channel)[0]
-        except Exception:
+        intersect = np.intersect1d(set_timestamp, set_channel)
+        if len(intersect) == 0:
             return None
+        intersect = intersect[0]
 
         b = self.Matrix.Array["programname"][intersect]
         # end = time.time()
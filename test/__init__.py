@@ -1,11 +1,18 @@
+from .aggregation import *
 from .analyzer import *
 from .common import *
 from .crypto import *
+from .elasticsearch import *
 from .file import *
 from .filter import *
 from .kafka import *
+from .cache import *
+from .lookup import *
 from .matrix import *
+from .mongodb import *
+from .parquet import *
 from .declarative import *
 from .integrity import *
 from .test_config_defaults import *
 from .test_metrics_service import *
+from .test_pipeline import *
@@ -0,0 +1,101 @@
+import numpy as np
+
+import bspump.matrix
+import bspump.unittest
+from bspump.aggregation import HyperLogLog
+
+
+class TestHyperLogLog(bspump.unittest.TestCase):
+    def test_add_many(self):
+        hll = HyperLogLog()
+        values = list(range(20000)) + ["a{}".format(i) for i in range(10000)]
+
+        scalar = hll.create_dense()
+        for value in values:
+            hll.add(value, scalar)
+
+        batch = hll.create_dense()
+        hll.add_many(np.arange(20000), batch)
+        hll.add_many(values[20000:], batch)
+
+        np.testing.assert_array_equal(scalar, batch)
+        self.assertLess(hll.compute_error(30000, hll.count(batch)), 5)
+
+    def test_merge(self):
+        hll = HyperLogLog()
+        a = hll.add_many(np.arange(0, 6000), hll.create_dense())
+        b = hll.add_many(np.arange(4000, 10000), hll.create_dense())
+        merged = hll.merge(a.copy(), b)
+        expected = hll.add_many(np.arange(10000), hll.create_dense())
+        np.testing.assert_array_equal(merged, expected)
+
+    def test_sparse(self):
+        hll = HyperLogLog()
+        sparse = hll.add_many(["x", "y", "z", "x"], hll.create_sparse())
+        self.assertEqual(len(sparse), 3)
+        self.assertEqual(hll.count(sparse), 3)
+
+        dense = hll.add_many(["x", "y", "z"], hll.create_dense())
+        np.testing.assert_array_equal(hll.to_dense(sparse), dense)
+
+        # Merge of sparse registers stays sparse, until it grows over the limit
+        other = hll.add_many(["w"], hll.create_sparse())
+        self.assertEqual(hll.count(hll.merge(sparse, other)), 4)
+        registers = hll.add_many(np.arange(2 * hll.sparse_limit), sparse)
+        self.assertIsInstance(registers, np.ndarray)
+
+    def test_sparse_add(self):
+        hll = HyperLogLog()
+        values = ["a{}".format(i) for i in range(100)]
+        registers = hll.create_sparse()
+        for value in values:
+            registers = hll.add(value, registers)
+        self.assertEqual(hll.count_many(registers), hll.count(registers))
+        np.testing.assert_array_equal(
+            hll.to_dense(registers), hll.add_many(values, hll.create_dense())
+        )
+
+        # Registers are converted to dense ones over the limit
+        for value in range(2 * hll.sparse_limit):
+            registers = hll.add(value, registers)
+        self.assertIsInstance(registers, np.ndarray)
+
+    def test_mixed_values(self):
+        hll = HyperLogLog()
+        values = [1, "1", 2.5, "a"]
+        scalar = hll.create_dense()
+        for value in values:
+            hll.add(value, scalar)
+        np.testing.assert_array_equal(scalar, hll.add_many(values, hll.create_dense()))
+        self.assertEqual(hll.count(scalar), 4)
+
+    def test_count_many_large_range(self):
+        hll = HyperLogLog(m=16)
+        array = np.full((2, 16), 56, dtype=np.uint8)
+        array[1] = 1
+        self.assertEqual(
+            hll.count_many(array).tolist(), [hll.count(array[0]), hll.count(array[1])]
+        )
+
+    def test_time_window_matrix(self):
+        hll = HyperLogLog()
+        matrix = bspump.matrix.TimeWindowMatrix(
+            self.App, dtype=hll.dtype, columns=3, resolution=60
+        )
+        first = matrix.add_row("first")
+        second = matrix.add_row("second")
+
+        values = np.arange(1000)
+        rows = np.where(values < 100, first, second)
+        hll.add_to_rows(values, rows, matrix.Array[:, 0])
+        hll.add_many(np.arange(50, 150), matrix.Array[first, 1])
+
+        counts = hll.count_many(matrix.Array[:, 0])
+        self.assertAlmostEqual(counts[first], 100, delta=15)
+        self.assertAlmostEqual(counts[second], 900, delta=135)
+        self.assertAlmostEqual(
+            hll.count_many(matrix.Array.max(axis=1))[first], 150, delta=25
+        )
+
+        matrix.add_column()
+        self.assertEqual(hll.count(matrix.Array[first, 0]), 0)
@@ -0,0 +1,62 @@
+import bspump.analyzer
+import bspump.unittest
+
+
+class ThresholdAnalyzer(bspump.analyzer.ThresholdAnalyzer):
+    def __init__(self, app, pipeline, id=None, config=None):
+        super().__init__(app, pipeline, id=id, config=config)
+        self.Alarms = []
+
+    def alarm(self, x, y, count, index):
+        for c in range(count):
+            self.Alarms.append((x[index - c], y[index - c]))
+
+
+class TestThresholdAnalyzer(bspump.unittest.ProcessorTestCase):
+    def test_analyze_ring_buffer(self):
+        self.set_up_processor(
+            ThresholdAnalyzer,
+            config={"upper_bound": 10, "columns": 4, "resolution": 1},
+        )
+        analyzer = self.Pipeline.Processor
+        matrix = analyzer.TimeWindow
+        row = matrix.add_row("server")
+        matrix.WarmingUpCount.assign(row, 0)
+
+        # The head of the ring buffer moves, the newest column is the last one in the time order
+        matrix.add_column()
+        matrix.add_column()
+        for column, value in enumerate([11, 1, 12, 13]):
+            matrix.Array[row, matrix.get_physical_column(column)] = value
+
+        analyzer.analyze()
+        self.assertEqual(sorted(analyzer.Alarms), [(row, 0), (row, 2), (row, 3)])
+        # The last exceedance of the row is the newest one
+        self.assertEqual(analyzer.Alarms[0], (row, 3))
+
+    def test_process_batch_rows(self):
+        self.set_up_processor(
+            ThresholdAnalyzer,
+            config={
+                "upper_bound": 10,
+                "columns": 4,
+                "resolution": 1,
+                "event_attribute": "server",
+                "event_value": "value",
+            },
+        )
+        analyzer = self.Pipeline.Processor
+        matrix = analyzer.TimeWindow
+        now = matrix.TimeConfig.get_start() - 0.5
+        events = [
+            {"server": "a", "value": 1, "@timestamp": now},
+            {"server": "late", "value": 2, "@timestamp": 0},
+            {"server": "b", "value": 3, "@timestamp": now},
+        ]
+        self.assertEqual(analyzer.process_batch(None, events), events)
+
+        # Like evaluate(), rows are added for late events too, in the order of events
+        self.assertEqual(
+            [matrix.get_row_index(name) for name in ["a", "late", "b"]], [0, 1, 2]
+        )
+        self.assertEqual(matrix.Array[[0, 2], matrix.get_column(now)].tolist(), [1, 3])
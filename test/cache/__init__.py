@@ -0,0 +1 @@
+from .test_lrucachedict import *
@@ -0,0 +1,100 @@
+import bspump.unittest
+from bspump.cache import LRUCacheDict, FrequencySketch
+
+
+class TestLRUCacheDict(bspump.unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.Now = 1000.0
+        self.App.time = lambda: self.Now
+
+    def test_lru(self):
+        cache = LRUCacheDict(self.App, max_size=3)
+        cache["a"] = 1
+        cache["b"] = 2
+        cache["c"] = 3
+        self.assertEqual(cache["a"], 1)
+        cache["d"] = 4
+        self.assertEqual(sorted(cache), ["a", "c", "d"])
+        with self.assertRaises(KeyError):
+            cache["b"]
+        self.assertEqual(dict(cache.items()), {"a": 1, "c": 3, "d": 4})
+
+    def test_ttl(self):
+        cache = LRUCacheDict(
+            self.App, max_size=10, max_duration=10, negative_duration=2
+        )
+        cache["a"] = 1
+        cache["missing"] = None
+        self.Now += 1
+        cache["b"] = 2
+        self.assertIsNone(cache["missing"])
+
+        self.Now += 2
+        self.assertNotIn("missing", cache)
+        self.assertEqual(cache["a"], 1)
+
+        # Expired elements are removed on write
+        self.Now += 7
+        cache["c"] = 3
+        self.assertEqual(sorted(cache), ["b", "c"])
+
+        cache = LRUCacheDict(self.App, max_duration=10, negative_duration=0)
+        cache["missing"] = None
+        self.assertEqual(len(cache), 0)
+
+    def test_max_bytes(self):
+        cache = LRUCacheDict(self.App, max_size=None, max_bytes=100, sizeof=len)
+        cache["a"] = "x" * 40
+        cache["b"] = "x" * 40
+        self.assertEqual(cache.Bytes, 80)
+        cache["c"] = "x" * 40
+        self.assertEqual(sorted(cache), ["b", "c"])
+        cache["b"] = "x" * 10
+        self.assertEqual(cache.Bytes, 50)
+        del cache["c"]
+        self.assertEqual(cache.Bytes, 10)
+
+    def test_slru(self):
+        cache = LRUCacheDict(self.App, max_size=5, policy="slru")
+        for key in "abcde":
+            cache[key] = key
+        cache["a"]
+        cache["b"]
+
+        # A scan of new keys doesn't evict the keys used more than once
+        for key in "fghij":
+            cache[key] = key
+        self.assertIn("a", cache)
+        self.assertIn("b", cache)
+        self.assertEqual(len(cache), 5)
+
+    def test_tinylfu(self):
+        cache = LRUCacheDict(self.App, max_size=2, admission="tinylfu")
+        for _ in range(3):
+            for key in "ab":
+                try:
+                    cache[key]
+                except KeyError:
+                    cache[key] = key
+
+        # Key accessed once is not admitted
+        with self.assertRaises(KeyError):
+            cache["c"]
+        cache["c"] = "c"
+        self.assertNotIn("c", cache)
+        self.assertEqual(sorted(cache), ["a", "b"])
+
+
+class TestFrequencySketch(bspump.unittest.TestCase):
+    def test_estimate(self):
+        sketch = FrequencySketch(16)
+        for _ in range(5):
+            sketch.increment("a")
+        sketch.increment("b")
+        self.assertEqual(sketch.estimate("a"), 5)
+        self.assertGreaterEqual(sketch.estimate("b"), 1)
+        self.assertLessEqual(sketch.estimate("b"), 5)
+
+        sketch.reset()
+        self.assertEqual(sketch.estimate("a"), 2)
@@ -1,4 +1,5 @@
 from .test_bytes import *
+from .test_cow import *
 from .test_flatten import *
 from .test_hexlify import *
 from .test_iterator import *
@@ -0,0 +1,79 @@
+import copy
+import unittest
+
+import bspump.common
+
+
+class TestCopyOnWrite(unittest.TestCase):
+    def setUp(self):
+        self.Event = {
+            "person": {"name": "John", "tags": [{"id": 1}]},
+            "count": 1,
+        }
+        self.Original = copy.deepcopy(self.Event)
+
+    def test_copy_on_write_isolation(self):
+        first = bspump.common.copy_on_write(self.Event)
+        second = bspump.common.copy_on_write(self.Event)
+
+        first["person"]["tags"][0]["id"] = 2
+        first["count"] = 2
+        second.get("person")["name"] = "Jane"
+        for tag in second["person"]["tags"]:
+            tag["new"] = True
+
+        self.assertEqual(self.Event, self.Original)
+        self.assertEqual(
+            first, {"person": {"name": "John", "tags": [{"id": 2}]}, "count": 2}
+        )
+        self.assertEqual(
+            second,
+            {"person": {"name": "Jane", "tags": [{"id": 1, "new": True}]}, "count": 1},
+        )
+        self.assertIsInstance(first, dict)
+
+    def test_copy_on_write_of_copy_on_write(self):
+        first = bspump.common.copy_on_write(self.Event)
+        first["person"]["tags"].append({"id": 2})
+
+        second = bspump.common.copy_on_write(first)
+        second["person"]["tags"][1]["id"] = 3
+
+        self.assertEqual(first["person"]["tags"], [{"id": 1}, {"id": 2}])
+        self.assertEqual(second["person"]["tags"], [{"id": 1}, {"id": 3}])
+        self.assertEqual(self.Event, self.Original)
+
+    def test_deepcopy(self):
+        event = copy.deepcopy(bspump.common.copy_on_write(self.Event))
+        self.assertIs(type(event), dict)
+        self.assertEqual(event, self.Original)
+
+    def test_copy_idioms(self):
+        event = bspump.common.copy_on_write(self.Event)
+        for copied in (dict(event), {**event}, copy.copy(event), event.copy()):
+            copied["person"]["name"] = "Jane"
+            copied["person"]["tags"][0]["id"] = 2
+
+        self.assertEqual(self.Event, self.Original)
+        self.assertIsInstance(copy.copy(event), bspump.common.CopyOnWriteDict)
+
+    def test_materialized_counter(self):
+        class Counter(object):
+            def __init__(self):
+                self.Values = {}
+
+            def add(self, name, value):
+                self.Values[name] = self.Values.get(name, 0) + value
+
+        counter = Counter()
+        event = bspump.common.copy_on_write(self.Event, counter)
+        self.assertEqual(counter.Values, {})
+
+        event["count"] = 2
+        event["person"]["name"] = "Jane"
+        event["person"]["name"] = "Joe"
+        self.assertEqual(counter.Values, {"copy.materialized": 1})
+
+        event["person"]["tags"][0]["id"] = 2
+        self.assertEqual(counter.Values, {"copy.materialized": 3})
+        self.assertEqual(self.Event, self.Original)
@@ -0,0 +1,2 @@
+from .test_connection import *
+from .test_lookup import *
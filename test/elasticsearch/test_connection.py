@@ -0,0 +1,118 @@
+import gzip
+import json
+
+import bspump.unittest
+from bspump.elasticsearch import ElasticSearchConnection
+from bspump.elasticsearch.data_feeder import data_feeder_index
+
+
+class FakeResponse(object):
+    def __init__(self, status, body):
+        self.status = status
+        self.Body = body
+
+    async def json(self):
+        return self.Body
+
+
+class FakeSession(object):
+    def __init__(self, responses):
+        self.Responses = responses
+        self.Requests = []
+
+    async def post(self, url, data, headers, timeout):
+        if headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        else:
+            data = b"".join([item async for item in data])
+        lines = data.decode("utf-8").splitlines()
+        self.Requests.append((url, [json.loads(line) for line in lines[1::2]]))
+        return self.Responses.pop(0)
+
+
+class TestElasticSearchConnection(bspump.unittest.TestCase):
+    def create_bulk(self, connection, count):
+        connection.consume("index", data_feeder_index({"n": 0}, "0"))
+        bulk = connection._bulks.pop("index")
+        for n in range(1, count):
+            bulk.consume(data_feeder_index({"n": n}, str(n)))
+        return bulk
+
+    def test_item_retry(self):
+        connection = ElasticSearchConnection(
+            self.App, "ESConnection", config={"compression": "gzip"}
+        )
+        bulk = self.create_bulk(connection, 3)
+        session = FakeSession(
+            [
+                FakeResponse(
+                    200,
+                    {
+                        "errors": True,
+                        "items": [
+                            {"index": {"status": 201}},
+                            {"index": {"status": 429, "error": {}}},
+                            {"index": {"status": 400, "error": {}}},
+                        ],
+                    },
+                ),
+                FakeResponse(200, {"errors": False}),
+            ]
+        )
+
+        done = self.App.Loop.run_until_complete(
+            bulk.upload("http://es:9200/", session, 10)
+        )
+        self.assertFalse(done)
+        self.assertTrue(bulk.Throttled)
+        self.assertEqual(len(bulk.Items), 1)
+
+        done = self.App.Loop.run_until_complete(
+            bulk.upload("http://es:9200/", session, 10)
+        )
+        self.assertTrue(done)
+        self.assertEqual(session.Requests[1][1], [{"n": 1}])
+        self.assertIn("items.*.status", session.Requests[0][0])
+
+        insert = connection.InsertMetric._actuals
+        self.assertEqual(insert["ok"], 2)
+        self.assertEqual(insert["fail"], 1)
+        self.assertEqual(insert["retry"], 1)
+
+    def test_round_robin(self):
+        connection = ElasticSearchConnection(
+            self.App,
+            "ESConnection",
+            config={"url": "http://a:9200/ http://b:9200/", "loader_per_url": 2},
+        )
+
+        async def acquire(count):
+            return [(await connection._acquire_node()).Url for _ in range(count)]
+
+        urls = self.App.Loop.run_until_complete(acquire(4))
+        self.assertEqual(urls, ["http://a:9200/", "http://b:9200/"] * 2)
+        self.assertTrue(all(node.InFlight == 2 for node in connection._nodes))
+
+    def test_tune(self):
+        connection = ElasticSearchConnection(
+            self.App,
+            "ESConnection",
+            config={
+                "bulk_out_max_size": 1000,
+                "bulk_out_min_size": 100,
+                "bulk_target_latency": 1.0,
+            },
+        )
+        bulk = self.create_bulk(connection, 1)
+
+        connection._tune(bulk, 2.0)
+        self.assertEqual(connection.BulkSize, 500)
+
+        bulk.Capacity = 0
+        connection._tune(bulk, 0.1)
+        self.assertEqual(connection.BulkSize, 625)
+
+        bulk.Throttled = True
+        for _ in range(5):
+            connection._tune(bulk, 0.1)
+        self.assertEqual(connection.BulkSize, 100)
@@ -0,0 +1,55 @@
+import bspump.unittest
+from bspump.elasticsearch import ElasticSearchConnection, ElasticSearchLookup
+
+
+class FakeResponse(object):
+    def __init__(self, body):
+        self.status = 200
+        self.Body = body
+
+    async def json(self):
+        return self.Body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class FakeSession(object):
+    def __init__(self):
+        self.closed = False
+        self.Requests = 0
+
+    def post(self, url, **kwargs):
+        self.Requests += 1
+        return FakeResponse({"hits": {"hits": [{"_source": {"user": "a"}}]}})
+
+    async def close(self):
+        self.closed = True
+
+
+class TestElasticSearchLookup(bspump.unittest.TestCase):
+    def test_session_reuse(self):
+        connection = ElasticSearchConnection(self.App, "ESConnection")
+        sessions = []
+
+        def get_session():
+            sessions.append(FakeSession())
+            return sessions[-1]
+
+        connection.get_session = get_session
+        lookup = ElasticSearchLookup(
+            self.App, connection, "ESLookup", config={"index": "i", "key": "user"}
+        )
+
+        for _ in range(3):
+            value = self.App.Loop.run_until_complete(lookup._find_one("a"))
+            self.assertEqual(value, {"user": "a"})
+        self.assertEqual(len(sessions), 1)
+        self.assertEqual(sessions[0].Requests, 3)
+
+        self.App.Loop.run_until_complete(lookup._on_exit("Application.exit!"))
+        self.assertTrue(sessions[0].closed)
+        self.assertIsNone(lookup.Session)
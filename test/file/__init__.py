@@ -1 +1,4 @@
 from .test_fileblocksink import *
+from .test_filelinesource import *
+from .test_watchscan import *
+from .test_filejsonsource import *
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+
+import bspump.unittest
+from bspump import Pipeline
+from bspump.file import FileJSONSource
+from bspump.file.filejsonsource import JSONArrayParser, NDJSONParser
+from bspump.trigger import PubSubTrigger
+from bspump.unittest import UnitTestSink
+
+
+RECORDS = [
+    {"id": i, "text": 'a "quoted" ]}, \\{[' * (i % 3), "nested": [i, [{"x": "]"}]]}
+    for i in range(200)
+] + [1, "\\", None, [], {}]
+
+
+class FileJSONPipeline(Pipeline):
+    def __init__(self, app, config):
+        super().__init__(app, "FileJSONPipeline")
+        self.PubSub.subscribe("bspump.pipeline.cycle_end!", self._on_finished)
+        self.Source = FileJSONSource(app, self, config=config).on(
+            PubSubTrigger(app, "Application.run!", app.PubSub)
+        )
+        self.Sink = UnitTestSink(app, self)
+        self.build(self.Source, self.Sink)
+
+    def _on_finished(self, event_name, pipeline):
+        # The counter is reset, when metrics are flushed at the exit
+        self.StreamCounts = dict(self.Source.StreamCounter._actuals)
+        self.App.stop()
+
+
+class TestFileJSONSource(bspump.unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.Dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.Dir)
+        super().tearDown()
+
+    def execute(self, config):
+        svc = self.App.get_service("bspump.PumpService")
+        config = dict(config, path=os.path.join(self.Dir, "*"))
+        pipeline = FileJSONPipeline(self.App, config)
+        svc.add_pipeline(pipeline)
+        self.App.run()
+        return [event for _, event in pipeline.Sink.Output], pipeline
+
+    def test_stream_array(self):
+        with open(os.path.join(self.Dir, "a.json"), "w") as f:
+            json.dump(RECORDS, f, indent=1)
+
+        events, pipeline = self.execute(
+            {"stream": "array", "read_ahead": 2, "read_ahead_block_size": 100}
+        )
+        self.assertEqual(events, RECORDS)
+        self.assertEqual(pipeline.StreamCounts["records"], len(RECORDS))
+        self.assertEqual(
+            pipeline.StreamCounts["bytes"],
+            os.path.getsize(os.path.join(self.Dir, "a.json-processed")),
+        )
+
+    def test_stream_ndjson_batches(self):
+        with open(os.path.join(self.Dir, "a.json"), "w") as f:
+            f.write("\n".join(json.dumps(record) for record in RECORDS))
+
+        events, _ = self.execute(
+            {"stream": "ndjson", "batch_size": 7, "read_ahead_block_size": 64}
+        )
+        self.assertEqual(events, RECORDS)
+
+    def test_stream_invalid(self):
+        with open(os.path.join(self.Dir, "a.json"), "w") as f:
+            f.write('{"not": "an array"}')
+
+        events, _ = self.execute({"stream": "array"})
+        self.assertEqual(events, [])
+        self.assertEqual(os.listdir(self.Dir), ["a.json-failed"])
+
+
+class TestJSONArrayParser(bspump.unittest.TestCase):
+    def feed(self, parser, data, size):
+        records = []
+        for i in range(0, len(data), size):
+            records.extend(parser.feed(data[i : i + size]))
+        records.extend(parser.close())
+        return records
+
+    def test_split(self):
+        data = json.dumps(RECORDS).encode("utf-8")
+        for size in [1, 2, 3, 17, len(data)]:
+            self.assertEqual(self.feed(JSONArrayParser(), data, size), RECORDS)
+
+        ndjson = b"\n".join(json.dumps(record).encode("utf-8") for record in RECORDS)
+        for size in [1, 5, len(ndjson)]:
+            self.assertEqual(self.feed(NDJSONParser(), ndjson, size), RECORDS)
+
+    def test_empty(self):
+        self.assertEqual(self.feed(JSONArrayParser(), b" [ ]\n", 1), [])
+
+    def test_errors(self):
+        for data in [b"", b"[1", b"[1,]", b"[1] 2", b'{"a": 1}', b"1 [2]"]:
+            with self.assertRaises(ValueError):
+                self.feed(JSONArrayParser(), data, 2)
@@ -0,0 +1,144 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+import bspump.unittest
+from bspump import Pipeline
+from bspump.file import FileLineSource
+from bspump.trigger import PubSubTrigger
+from bspump.unittest import UnitTestSink
+
+
+class FileLinePipeline(Pipeline):
+    def __init__(self, app, config):
+        super().__init__(app, "FileLinePipeline")
+        self.PubSub.subscribe("bspump.pipeline.cycle_end!", self._on_finished)
+        self.Source = FileLineSource(app, self, config=config).on(
+            PubSubTrigger(app, "Application.run!", app.PubSub)
+        )
+        self.Sink = UnitTestSink(app, self)
+        self.build(self.Source, self.Sink)
+
+    def _on_finished(self, event_name, pipeline):
+        self.App.stop()
+
+
+class TestFileLineSource(bspump.unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.Dir = tempfile.mkdtemp()
+        self.CheckpointDir = tempfile.mkdtemp()
+        self.Checkpoints = os.path.join(self.CheckpointDir, "checkpoints.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.Dir)
+        shutil.rmtree(self.CheckpointDir)
+        super().tearDown()
+
+    def execute(self, config):
+        svc = self.App.get_service("bspump.PumpService")
+        config = dict(config, path=os.path.join(self.Dir, "*"), files_per_cycle=2)
+        pipeline = FileLinePipeline(self.App, config)
+        svc.add_pipeline(pipeline)
+        self.App.run()
+        return pipeline.Sink.Output
+
+    def write_files(self):
+        with open(os.path.join(self.Dir, "a.log"), "wb") as f:
+            f.writelines(b"a%d\n" % i for i in range(1000))
+        with gzip.open(os.path.join(self.Dir, "b.log.gz"), "wb") as f:
+            f.writelines(b"b%d\n" % i for i in range(1000))
+
+    def test_read_ahead(self):
+        self.write_files()
+        output = self.execute({"read_ahead": 2, "read_ahead_block_size": 100})
+        lines = [event for _, event in output]
+        expected = [b"a%d\n" % i for i in range(1000)]
+        expected += [b"b%d\n" % i for i in range(1000)]
+        self.assertEqual(sorted(lines), sorted(expected))
+        # Lines of a file keep their order
+        self.assertEqual([line for line in lines if line[:1] == b"b"], expected[1000:])
+        self.assertEqual(
+            sorted(os.listdir(self.Dir)), ["a.log-processed", "b.log.gz-processed"]
+        )
+
+    def write_checkpoint(self, filename, offset, line):
+        path = os.path.join(self.Dir, filename)
+        with open(self.Checkpoints, "w") as f:
+            json.dump(
+                [
+                    {
+                        "path": path,
+                        "inode": os.stat(path + "-locked").st_ino,
+                        "offset": offset,
+                        "line": line,
+                    }
+                ],
+                f,
+            )
+
+    def test_mmap_resume(self):
+        # The pump crashed after 500 lines of a locked file
+        with open(os.path.join(self.Dir, "a.log-locked"), "wb") as f:
+            f.writelines(b"a%d\n" % i for i in range(1000))
+            f.write(b"last")
+        offset = len(b"".join(b"a%d\n" % i for i in range(500)))
+        self.write_checkpoint("a.log", offset, 500)
+
+        output = self.execute(
+            {"mmap": True, "batch_size": 7, "checkpoint_path": self.Checkpoints}
+        )
+        lines = [event for _, event in output]
+        self.assertEqual(lines, [b"a%d\n" % i for i in range(500, 1000)] + [b"last"])
+        self.assertEqual(os.listdir(self.Dir), ["a.log-processed"])
+        with open(self.Checkpoints) as f:
+            self.assertEqual(json.load(f), [])
+
+    def test_resume_compressed(self):
+        with gzip.open(os.path.join(self.Dir, "b.log.gz-locked"), "wb") as f:
+            f.writelines(b"b%d\n" % i for i in range(1000))
+        self.write_checkpoint("b.log.gz", 0, 990)
+
+        output = self.execute({"checkpoint_path": self.Checkpoints})
+        lines = [event for _, event in output]
+        self.assertEqual(lines, [b"b%d\n" % i for i in range(990, 1000)])
+
+    def test_checkpoint_on_failure(self):
+        with open(os.path.join(self.Dir, "a.log"), "wb") as f:
+            f.writelines(b"a%d\n" % i for i in range(1000))
+
+        class FailingSource(FileLineSource):
+            async def process(self, event, context=None):
+                if event == b"a300\n":
+                    raise RuntimeError("Failed")
+
+        pipeline = Pipeline(self.App, "FailingPipeline")
+        source = FailingSource(
+            self.App,
+            pipeline,
+            config={
+                "path": os.path.join(self.Dir, "*"),
+                "post": "noop",
+                "checkpoint_path": self.Checkpoints,
+            },
+        )
+        filename = os.path.join(self.Dir, "a.log")
+        self.App.Loop.run_until_complete(source.lock_and_read_file(filename))
+
+        with open(self.Checkpoints) as f:
+            checkpoint = json.load(f)[0]
+        self.assertEqual(checkpoint["path"], filename)
+        self.assertEqual(checkpoint["inode"], os.stat(filename).st_ino)
+        self.assertEqual(checkpoint["line"], 300)
+        self.assertEqual(
+            checkpoint["offset"], len(b"".join(b"a%d\n" % i for i in range(300)))
+        )
+
+    def test_read_ahead_batches(self):
+        self.write_files()
+        output = self.execute(
+            {"read_ahead": 2, "read_ahead_block_size": 100, "batch_size": 7}
+        )
+        self.assertEqual(len(output), 2000)
@@ -0,0 +1,70 @@
+import asyncio
+import os
+import shutil
+import tempfile
+
+import bspump.unittest
+from bspump import Pipeline
+from bspump.file import FileLineSource
+
+
+class TestFileWatcher(bspump.unittest.TestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.Dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.Dir)
+        super().tearDown()
+
+    def write(self, name):
+        with open(os.path.join(self.Dir, name), "wb") as f:
+            f.write(b"line\n")
+
+    def test_watch(self):
+        self.write("1")
+        self.write("2-processed")
+        self.write("3-failed")
+
+        pipeline = Pipeline(self.App, "WatchPipeline")
+        source = FileLineSource(
+            self.App,
+            pipeline,
+            config={
+                "path": os.path.join(self.Dir, "*"),
+                "discovery": "watch",
+                "files_per_cycle": 10,
+            },
+        )
+
+        async def run():
+            filenames = await source.watch_files()
+            self.assertEqual(filenames, [os.path.join(self.Dir, "1")])
+            watcher = source.Watchers[0]
+            self.assertEqual(watcher.Counts["all_files"], 3)
+
+            # New files are discovered by filesystem events, without scanning
+            self.write("4")
+            os.rename(
+                os.path.join(self.Dir, "1"), os.path.join(self.Dir, "1-processed")
+            )
+            for _ in range(100):
+                if len(watcher.Ready) > 0 and watcher.Counts["processed"] == 2:
+                    break
+                await asyncio.sleep(0.05)
+
+            filenames = await source.watch_files()
+            self.assertEqual(filenames, [os.path.join(self.Dir, "4")])
+            self.assertEqual(
+                watcher.Counts,
+                {
+                    "processed": 2,
+                    "failed": 1,
+                    "locked": 0,
+                    "unprocessed": 1,
+                    "all_files": 4,
+                },
+            )
+            source._on_exit("Application.exit!")
+
+        self.App.Loop.run_until_complete(run())
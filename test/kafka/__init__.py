@@ -1 +1,2 @@
 from .test_kafkasink import *
+from .test_kafkasource import *
@@ -0,0 +1,121 @@
+from unittest.mock import patch
+
+import bspump
+import bspump.unittest
+from bspump.kafka import KafkaConnection, KafkaSource
+from bspump.unittest import UnitTestSink
+
+
+class FakeMessage(object):
+    def __init__(self, topic, partition, offset, value):
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._value = value
+
+    def error(self):
+        return None
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def value(self):
+        return self._value
+
+    def key(self):
+        return None
+
+    def headers(self):
+        return None
+
+
+class FakeConsumer(object):
+    Batches = []
+    Stored = []
+
+    def __init__(self, config, logger=None):
+        self.Config = config
+        self.Batches = list(FakeConsumer.Batches)
+
+    def subscribe(self, topics):
+        pass
+
+    def consume(self, num_messages, timeout):
+        if len(self.Batches) == 0:
+            return []
+        return self.Batches.pop(0)
+
+    def store_offsets(self, offsets):
+        FakeConsumer.Stored.extend((tp.topic, tp.partition, tp.offset) for tp in offsets)
+
+    def unsubscribe(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class KafkaSourcePipeline(bspump.Pipeline):
+    def __init__(self, app, config):
+        super().__init__(app, "KafkaSourcePipeline")
+        self.Source = KafkaSource(app, self, "KafkaConnection", config=config)
+        self.Sink = UnitTestSink(app, self)
+        self.build(self.Source, self.Sink)
+        self.Expected = 0
+        self.PubSub.subscribe("bspump.pipeline.start!", self._on_start)
+
+    def _on_start(self, event_name, pipeline):
+        self.App.PubSub.subscribe("Application.tick!", self._on_tick)
+
+    def _on_tick(self, event_name):
+        if self.Source.EventCount >= self.Expected:
+            self.App.stop()
+
+
+class TestKafkaSource(bspump.unittest.TestCase):
+    def execute(self, config):
+        FakeConsumer.Stored = []
+        FakeConsumer.Batches = [
+            [
+                FakeMessage("t", 0, 10, b"a"),
+                FakeMessage("t", 0, 11, b"b"),
+                FakeMessage("t", 1, 5, b"c"),
+            ],
+            [FakeMessage("t", 0, 12, b"d")],
+        ]
+
+        svc = self.App.get_service("bspump.PumpService")
+        svc.add_connection(KafkaConnection(self.App, "KafkaConnection"))
+        self.Pipeline = KafkaSourcePipeline(self.App, config)
+        self.Pipeline.Expected = 4
+        svc.add_pipeline(self.Pipeline)
+
+        with patch("confluent_kafka.Consumer", FakeConsumer):
+            self.App.run()
+
+        return self.Pipeline.Sink.Output
+
+    def test_consume(self):
+        output = self.execute({"topic": "t"})
+        self.assertEqual([event for context, event in output], [b"a", b"b", b"c", b"d"])
+        self.assertEqual([context["_kafka_offset"] for context, event in output], [10, 11, 5, 12])
+        self.assertEqual(
+            sorted(FakeConsumer.Stored), [("t", 0, 12), ("t", 0, 13), ("t", 1, 6)]
+        )
+
+    def test_consume_process_batch(self):
+        output = self.execute({"topic": "t", "process_batch": "true"})
+        self.assertEqual([event for context, event in output], [b"a", b"b", b"c", b"d"])
+        self.assertEqual(
+            [(context["_kafka_partition"], context["_kafka_offset"]) for context, event in output],
+            [(0, 10), (0, 10), (1, 5), (0, 12)],
+        )
+        self.assertEqual(
+            sorted(FakeConsumer.Stored), [("t", 0, 12), ("t", 0, 13), ("t", 1, 6)]
+        )
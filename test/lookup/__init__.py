@@ -0,0 +1,5 @@
+from .test_ipgeolookup import *
+from .test_matrixlookup import *
+from .test_asynclookup import *
+from .test_snapshotlookup import *
+from .test_dictionarylookup import *
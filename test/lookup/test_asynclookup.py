@@ -0,0 +1,70 @@
+import asyncio
+
+import bspump.unittest
+from bspump.abc.lookup import AsyncLookupMixin
+
+
+class FakeAsyncLookup(AsyncLookupMixin):
+    def __init__(self, app, config=None):
+        super().__init__(app, id="FakeAsyncLookup", config=config)
+        self.Queries = []
+
+    async def get(self, key):
+        return await self.fetch(key)
+
+    async def _find_one(self, key):
+        self.Queries.append([key])
+        await asyncio.sleep(0.01)
+        return key * 2 if key > 0 else None
+
+
+class FakeBatchAsyncLookup(FakeAsyncLookup):
+    async def _find_many(self, keys):
+        self.Queries.append(sorted(keys))
+        await asyncio.sleep(0.01)
+        return {key: key * 2 for key in keys if key > 0}
+
+
+class TestAsyncLookupMixin(bspump.unittest.TestCase):
+    def gather(self, lookup, keys):
+        return self.App.Loop.run_until_complete(
+            asyncio.gather(*[lookup.get(key) for key in keys])
+        )
+
+    def test_coalescing(self):
+        lookup = FakeAsyncLookup(self.App, config={"source_url": "file:/nonexistent"})
+        values = self.gather(lookup, [1, 2, 1, 1, -1])
+        self.assertEqual(values, [2, 4, 2, 2, None])
+        self.assertEqual(sorted(lookup.Queries), [[-1], [1], [2]])
+        self.assertEqual(lookup.InFlight, {})
+
+        # The key is queried again, once the query is over
+        self.gather(lookup, [1])
+        self.assertEqual(len(lookup.Queries), 4)
+
+    def test_batching(self):
+        lookup = FakeBatchAsyncLookup(
+            self.App,
+            config={
+                "source_url": "file:/nonexistent",
+                "batch_window": 0.01,
+                "batch_size": 3,
+            },
+        )
+        values = self.gather(lookup, [1, 2, 1, 3, 4, -1])
+        self.assertEqual(values, [2, 4, 2, 6, 8, None])
+        self.assertEqual(lookup.Queries, [[1, 2, 3], [-1, 4]])
+        self.assertEqual(lookup.InFlight, {})
+        self.assertEqual(lookup.PendingKeys, [])
+
+    def test_batching_error(self):
+        class FailingLookup(FakeBatchAsyncLookup):
+            async def _find_many(self, keys):
+                raise RuntimeError("failed")
+
+        lookup = FailingLookup(
+            self.App, config={"source_url": "file:/nonexistent", "batch_window": 0.01}
+        )
+        with self.assertRaises(RuntimeError):
+            self.gather(lookup, [1, 1])
+        self.assertEqual(lookup.InFlight, {})
@@ -0,0 +1,164 @@
+import json
+import os
+import tempfile
+
+import bspump.unittest
+from bspump.abc.lookup import DictionaryLookup, iter_json_object
+
+
+class TestDictionaryLookupDelta(bspump.unittest.TestCase):
+    def create_master(self, directory, **config):
+        path = os.path.join(directory, "lookup.json")
+        with open(path, "w") as f:
+            json.dump({"a": 1, "b": 2}, f)
+        config["source_url"] = path
+        return DictionaryLookup(self.App, "MasterLookup", config=config)
+
+    def test_master_delta(self):
+        with tempfile.TemporaryDirectory() as directory:
+            master = self.create_master(directory)
+            base = master.Version
+            self.assertTrue(self.App.Loop.run_until_complete(master.load()))
+
+        loaded = master.Version
+        self.assertEqual(master.get_delta(base)["upserts"], {"a": 1, "b": 2})
+
+        master.set({"a": 1, "b": 3, "c": 4})
+        master.set({"b": 3, "c": 4})
+        delta = master.get_delta(loaded)
+        self.assertEqual(delta["version"], master.Version)
+        self.assertEqual(delta["upserts"], {"b": 3, "c": 4})
+        self.assertEqual(delta["deletes"], ["a"])
+
+        # No changes, no new version
+        version = master.Version
+        master.set({"b": 3, "c": 4})
+        self.assertEqual(master.Version, version)
+        self.assertEqual(master.get_delta(version)["upserts"], {})
+
+        self.assertIsNone(master.get_delta("unknown:1"))
+
+    def test_journal_size(self):
+        with tempfile.TemporaryDirectory() as directory:
+            master = self.create_master(directory, delta_journal_size=2)
+        base = master.Version
+        for i in range(3):
+            master.set({"x": i})
+        self.assertIsNone(master.get_delta(base))
+        self.assertEqual(len(master.Journal), 2)
+
+    def test_slave_delta(self):
+        slave = DictionaryLookup(
+            self.App,
+            "SlaveLookup",
+            config={"source_url": "http://localhost:1/bspump/v1/lookup/MasterLookup"},
+        )
+        self.assertFalse(slave.is_master())
+        deltas = []
+
+        async def load():
+            slave.Provider.Version = "e:1"
+            return json.dumps({"a": 1, "b": 2}).encode("utf-8")
+
+        async def load_delta(version):
+            deltas.append(version)
+            return {"version": "e:2", "upserts": {"c": 3}, "deletes": ["a"]}
+
+        slave.Provider.load = load
+        slave.Provider.load_delta = load_delta
+
+        self.assertTrue(self.App.Loop.run_until_complete(slave.load()))
+        self.assertEqual(slave.Version, "e:1")
+        self.assertEqual(deltas, [])
+
+        self.assertTrue(self.App.Loop.run_until_complete(slave.load()))
+        self.assertEqual(deltas, ["e:1"])
+        self.assertEqual(slave.Version, "e:2")
+        self.assertEqual(dict(slave.Dictionary), {"b": 2, "c": 3})
+
+        # The delta is not available, keys deleted on the master disappear with the full load
+        async def load_no_delta(version):
+            return None
+
+        async def load_full():
+            slave.Provider.Version = "f:1"
+            return json.dumps({"c": 3, "d": 4}).encode("utf-8")
+
+        slave.Provider.load = load_full
+        slave.Provider.load_delta = load_no_delta
+        self.assertTrue(self.App.Loop.run_until_complete(slave.load()))
+        self.assertEqual(slave.Version, "f:1")
+        self.assertEqual(dict(slave.Dictionary), {"c": 3, "d": 4})
+
+    def test_slave_cache_version(self):
+        slave = DictionaryLookup(
+            self.App,
+            "CachedLookup",
+            config={"source_url": "http://localhost:1/bspump/v1/lookup/MasterLookup"},
+        )
+        provider = slave.Provider
+        with tempfile.TemporaryDirectory() as directory:
+            provider.UseCache = True
+            provider.CachePath = os.path.join(directory, "lookup.cache")
+            provider.ETag = "etag"
+            provider.Version = "e:1"
+            provider.save_to_cache(b"{}")
+
+            provider.ETag = None
+            provider.Version = None
+            self.assertEqual(provider.load_from_cache(), b"{}")
+        self.assertEqual(provider.ETag, "etag")
+        self.assertEqual(provider.Version, "e:1")
+
+
+class TestDictionaryLookupLoad(bspump.unittest.TestCase):
+    def test_iter_json_object(self):
+        text = ' { "a" : [1, {"b": null}] ,"c":"}",\n"d" : {} }'
+        self.assertEqual(dict(iter_json_object(text)), json.loads(text))
+        self.assertEqual(list(iter_json_object("{}")), [])
+        for malformed in ("[1]", '{"a" 1}', '{"a": 1 "b": 2}', "{1: 2}"):
+            with self.assertRaises(ValueError):
+                list(iter_json_object(malformed))
+
+    def test_load_off_loop(self):
+        data = {str(i): {"value": i} for i in range(1000)}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "lookup.json")
+            with open(path, "w") as f:
+                json.dump(data, f)
+            lookup = DictionaryLookup(self.App, "LoadLookup", {"source_url": path})
+            previous = lookup.Dictionary
+            self.assertTrue(self.App.Loop.run_until_complete(lookup.load()))
+
+        self.assertEqual(lookup.Dictionary, data)
+        self.assertIsNot(lookup.Dictionary, previous)
+        self.assertGreater(lookup.OffLoopDuration, 0.0)
+        self.assertEqual(len(lookup.Journal), 1)
+
+    def test_load_concurrent_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "lookup.json")
+            with open(path, "w") as f:
+                json.dump({"a": 1, "b": 2, "c": 3}, f)
+            lookup = DictionaryLookup(self.App, "ChangedLookup", {"source_url": path})
+            self.assertTrue(self.App.Loop.run_until_complete(lookup.load()))
+            loaded = lookup.Version
+
+            with open(path, "w") as f:
+                json.dump({"a": 1, "b": 20, "c": 3}, f)
+
+            execute_off_loop = lookup.execute_off_loop
+
+            async def change_and_execute_off_loop(func, *args):
+                # Changes made on the loop while the data are built are newer than the data
+                lookup.apply_delta({"upserts": {"a": 10}, "deletes": ["c"]})
+                return await execute_off_loop(func, *args)
+
+            lookup.execute_off_loop = change_and_execute_off_loop
+            self.assertTrue(self.App.Loop.run_until_complete(lookup.load()))
+
+        self.assertEqual(lookup.Dictionary, {"a": 10, "b": 20})
+        delta = lookup.get_delta(loaded)
+        self.assertEqual(delta["upserts"], {"a": 10, "b": 20})
+        self.assertEqual(delta["deletes"], ["c"])
+        self.assertGreater(lookup.OnLoopDuration, 0.0)
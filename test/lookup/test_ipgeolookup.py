@@ -0,0 +1,72 @@
+import os
+import tempfile
+
+import bspump.lookup
+import bspump.unittest
+
+
+DATABASE = """\
+16777216,16777471,US,United States of America,California,Los Angeles,34.052230,-118.243680
+16777472,16778239,CN,China,Fujian,Fuzhou,26.061390,119.306110
+16778240,16779263,AU,Australia,Victoria,Melbourne,-37.814000,144.963320
+16779264,16781311,CN,China,Guangdong,Guangzhou,23.116670,113.250000
+2130706432,2130706432,-,-,-,-,0.0,0.0
+281470698520576,281470698520831,US,United States of America,California,Los Angeles,34.052230,-118.243680
+"""
+
+
+class TestIPGeoLookup(bspump.unittest.TestCase):
+    def create_lookup(self, directory, **config):
+        path = os.path.join(directory, "db.csv")
+        with open(path, "w") as f:
+            f.write(DATABASE)
+        config["path"] = path
+        return bspump.lookup.IPGeoLookup(self.App, config=config)
+
+    def test_lookup_location(self):
+        with tempfile.TemporaryDirectory() as directory:
+            lookup = self.create_lookup(directory)
+            self.assertTrue(self.App.Loop.run_until_complete(lookup.load()))
+            # The CSV file is parsed in a thread and a reload replaces the tables
+            self.assertGreater(lookup.OffLoopDuration, 0.0)
+            self.assertTrue(self.App.Loop.run_until_complete(lookup.load()))
+
+        self.assertEqual(lookup.lookup_location_ipv4("1.0.0.0")["city"], "Los Angeles")
+        self.assertEqual(lookup.lookup_location_ipv4("1.0.3.255")["city"], "Fuzhou")
+        self.assertEqual(lookup.lookup_location("1.0.4.1")["city"], "Melbourne")
+        self.assertEqual(lookup.lookup_location("1.0.8.0")["city"], "Guangzhou")
+        self.assertIsNone(lookup.lookup_location("1.0.16.0"))
+        self.assertIsNone(lookup.lookup_location("0.255.255.255"))
+        self.assertEqual(
+            lookup.lookup_location("127.0.0.0"), {"lat": None, "lon": None}
+        )
+        self.assertIsNone(lookup.lookup_location("127.0.0.1"))
+        self.assertEqual(lookup.lookup_location_ipv6("::ffff:1.0.0.1")["country"], "US")
+
+        # Equal locations are shared
+        self.assertEqual(len(lookup.Locations), 5)
+
+        self.assertEqual(
+            [
+                None if location is None else location.get("city")
+                for location in lookup.lookup_locations(
+                    ["1.0.1.0", "10.0.0.1", "1.0.0.255", "127.0.0.0"]
+                )
+            ],
+            ["Fuzhou", None, "Los Angeles", None],
+        )
+
+    def test_lookup_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = os.path.join(directory, "cache")
+            lookup = self.create_lookup(directory, cache=cache)
+            self.App.Loop.run_until_complete(lookup.load())
+            self.assertTrue(os.path.exists(os.path.join(cache, "starts.npy")))
+
+            lookup = bspump.lookup.IPGeoLookup(
+                self.App, config={"path": lookup.Config["path"], "cache": cache}
+            )
+            # The cache must be used instead of the CSV file
+            lookup._parse_location = None
+            self.App.Loop.run_until_complete(lookup.load())
+            self.assertEqual(lookup.lookup_location("1.0.2.0")["city"], "Fuzhou")
@@ -0,0 +1,89 @@
+import numpy as np
+
+import bspump.lookup
+import bspump.matrix
+import bspump.unittest
+
+
+class TestMatrixLookupIndexes(bspump.unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.Matrix = bspump.matrix.SessionMatrix(
+            self.App,
+            dtype=[("channel", "i8"), ("start", "i8"), ("end", "i8")],
+            config={"max_closed_rows_capacity": 1},
+        )
+        for name, event in (
+            ("a", (1, 0, 10)),
+            ("b", (2, 10, 20)),
+            ("c", (1, 20, 30)),
+            ("d", (3, 0, 30)),
+        ):
+            self.Matrix.add_row(name)
+            self.Matrix.store(name, event)
+
+    def rows(self, array):
+        return sorted(self.Matrix.get_row_name(row) for row in array.tolist())
+
+    def test_bitmap_index(self):
+        index = bspump.lookup.BitMapIndex("channel", self.Matrix)
+        change_log = self.Matrix.create_change_log()
+        self.assertIsInstance(index.search(1), np.ndarray)
+        self.assertEqual(self.rows(index.search(1)), ["a", "c"])
+        self.assertEqual(self.rows(index.search(4)), [])
+
+        self.Matrix.store("b", (1, 10, 20))
+        self.Matrix.close_row("c")
+        self.Matrix.add_row("e")
+        self.Matrix.store("e", (4, 0, 5))
+        changed_rows = change_log.pop()
+        # The row of "c" is reused by "e"
+        self.assertEqual(len(changed_rows), 2)
+        index.update(self.Matrix, changed_rows)
+
+        self.assertEqual(self.rows(index.search(1)), ["a", "b"])
+        self.assertEqual(self.rows(index.search(2)), [])
+        self.assertEqual(self.rows(index.search(4)), ["e"])
+
+    def test_bitmap_index_several_changes(self):
+        index = bspump.lookup.BitMapIndex("channel", self.Matrix)
+        change_log = self.Matrix.create_change_log()
+
+        # Values of several changed rows are inserted at the same position
+        self.Matrix.store("a", (9, 0, 10))
+        self.Matrix.store("c", (7, 20, 30))
+        self.Matrix.store("d", (8, 0, 30))
+        index.update(self.Matrix, change_log.pop())
+
+        self.assertEqual(index.Values.tolist(), [2, 7, 8, 9])
+        self.assertEqual(self.rows(index.search(7)), ["c"])
+        self.assertEqual(self.rows(index.search(8)), ["d"])
+        self.assertEqual(self.rows(index.search(9)), ["a"])
+
+    def test_range_indexes(self):
+        index = bspump.lookup.TreeRangeIndex("start", "end", self.Matrix)
+        change_log = self.Matrix.create_change_log()
+        self.assertEqual(self.rows(index.search(5)), ["a", "d"])
+        self.assertEqual(self.rows(index.search(10)), ["b", "d"])
+        self.assertEqual(self.rows(index.search(30)), [])
+
+        self.Matrix.close_row("d")
+        index.update(self.Matrix, change_log.pop())
+        self.assertEqual(self.rows(index.search(25)), ["c"])
+
+        index = bspump.lookup.SliceIndex("start", "end", self.Matrix)
+        self.assertEqual(index.Resolution, 10)
+        self.assertEqual(self.rows(index.search(15)), ["b"])
+
+    def test_range_index_several_changes(self):
+        index = bspump.lookup.TreeRangeIndex("start", "end", self.Matrix)
+        change_log = self.Matrix.create_change_log()
+
+        self.Matrix.store("a", (1, 50, 60))
+        self.Matrix.store("b", (2, 40, 45))
+        index.update(self.Matrix, change_log.pop())
+
+        self.assertEqual(index.Starts.tolist(), [0, 20, 40, 50])
+        self.assertEqual(self.rows(index.search(42)), ["b"])
+        self.assertEqual(self.rows(index.search(55)), ["a"])
+        self.assertEqual(self.rows(index.search(5)), ["d"])
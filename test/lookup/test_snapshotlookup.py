@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+
+import bspump.lookup
+import bspump.unittest
+
+
+class TestLookupSnapshot(bspump.unittest.TestCase):
+    def test_write_read(self):
+        data = {"a": 1, "žluťoučký": {"kůň": [1, 2]}, "": None}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test.snapshot")
+            bspump.lookup.LookupSnapshot.write(path, data)
+            snapshot = bspump.lookup.LookupSnapshot(path)
+
+            self.assertEqual(len(snapshot), 3)
+            self.assertEqual(snapshot["žluťoučký"], {"kůň": [1, 2]})
+            self.assertIsNone(snapshot[""])
+            self.assertIn("a", snapshot)
+            self.assertNotIn("b", snapshot)
+            self.assertNotIn(1, snapshot)
+            with self.assertRaises(KeyError):
+                snapshot["b"]
+            self.assertEqual(sorted(snapshot), sorted(data))
+
+            bspump.lookup.LookupSnapshot.write(path, {})
+            self.assertEqual(len(bspump.lookup.LookupSnapshot(path)), 0)
+
+
+class TestSnapshotLookup(bspump.unittest.TestCase):
+    def test_shared_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "lookup.json")
+            with open(source, "w") as f:
+                json.dump({"a": {"x": 1}, "b": {"x": 2}}, f)
+
+            config = {"source_url": source, "snapshot_dir": directory}
+            master = bspump.lookup.SnapshotLookup(self.App, "SnapshotLookup", config)
+            self.assertTrue(self.App.Loop.run_until_complete(master.load()))
+            self.assertEqual(master["b"], {"x": 2})
+            self.assertEqual(len(master), 2)
+            # The data are parsed and written in a thread
+            self.assertGreater(master.OffLoopDuration, 0.0)
+
+            # Another process maps the published snapshot without loading the source
+            os.unlink(source)
+            worker = bspump.lookup.SnapshotLookup(self.App, "SnapshotLookup", config)
+            self.assertTrue(self.App.Loop.run_until_complete(worker.load()))
+            self.assertEqual(worker.SnapshotVersion, master.SnapshotVersion)
+            self.assertEqual(dict(worker.items()), {"a": {"x": 1}, "b": {"x": 2}})
+            self.assertFalse(self.App.Loop.run_until_complete(worker.load()))
+
+            # New version is swapped in, the old one keeps working while mapped
+            old = worker.Snapshot
+            master.set({"c": {"x": 3}})
+            self.assertTrue(worker.map_current())
+            self.assertEqual(list(worker), ["c"])
+            self.assertEqual(old["a"], {"x": 1})
+            self.assertEqual(
+                sorted(f for f in os.listdir(directory) if f.endswith(".snapshot")),
+                ["SnapshotLookup.{}.snapshot".format(master.SnapshotVersion)],
+            )
+            self.assertEqual(
+                [f for f in os.listdir(directory) if f.endswith(".tmp")], []
+            )
@@ -79,3 +79,25 @@ class TestMatrix(bspump.unittest.TestCase):
 
         row["f1"] = "Ahoj"
         row["f2"] = 64
+
+
+class TestClosedRows(unittest.TestCase):
+    def test_closed_rows(self):
+        closed_rows = bspump.matrix.utils.ClosedRows()
+        closed_rows.extend(0, 10)
+        self.assertEqual(len(closed_rows), 10)
+        self.assertEqual(closed_rows.pop(), 0)
+        self.assertEqual(closed_rows.pop_many(3).tolist(), [1, 2, 3])
+        self.assertNotIn(2, closed_rows)
+        self.assertIn(4, closed_rows)
+        self.assertNotIn(None, closed_rows)
+
+        closed_rows.add(2)
+        self.assertEqual(
+            closed_rows.get_mask(10).tolist(),
+            [False, False, True, False] + [True] * 6,
+        )
+        self.assertEqual(closed_rows.pop(), 2)
+
+        closed_rows.deserialize(closed_rows.serialize())
+        self.assertEqual(closed_rows.get_rows(), set(range(4, 10)))
@@ -1,5 +1,7 @@
 import unittest
 import collections
+import os
+import tempfile
 import time
 
 import bspump
@@ -81,3 +83,25 @@ class TestNamedMatrix(bspump.unittest.TestCase):
             index = matrix.add_row(name)
             name_obtained = matrix.get_row_name(i)
             self.assertEqual(name, name_obtained)
+
+
+class TestPersistentNamedMatrix(bspump.unittest.TestCase):
+    def test_matrix_grow(self):
+        with tempfile.TemporaryDirectory() as path:
+            matrix = bspump.matrix.PersistentNamedMatrix(
+                app=self.App, dtype="i8", config={"path": path}
+            )
+            for i in range(20):
+                index = matrix.add_row(str(i))
+                matrix.Array[index] = i
+
+            self.assertEqual(
+                os.path.getsize(os.path.join(path, "array.dat")),
+                matrix.Array.shape[0] * 8,
+            )
+
+            matrix = bspump.matrix.PersistentNamedMatrix(
+                app=self.App, dtype="i8", config={"path": path}
+            )
+            for i in range(20):
+                self.assertEqual(matrix.Array[matrix.get_row_index(str(i))], i)
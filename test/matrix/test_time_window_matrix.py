@@ -1,5 +1,7 @@
 import time
 
+import numpy as np
+
 import bspump
 import bspump.analyzer
 import bspump.unittest
@@ -31,11 +33,89 @@ class TestTimeWindowMatrix(bspump.unittest.TestCase):
         self.assertEqual(matrix.TimeConfig.get_end(), end + matrix.Resolution)
         self.assertEqual(matrix.WarmingUpCount.WUC[0], warming_up - 1)
 
-        self.assertEqual(matrix.Array[row_index, 0], second_col)
-        self.assertEqual(matrix.Array[row_index, 1], third_col)
-        self.assertEqual(matrix.Array[row_index, 2], 0)
+        array = matrix.get_array()
+        self.assertEqual(array[row_index, 0], second_col)
+        self.assertEqual(array[row_index, 1], third_col)
+        self.assertTrue(np.isnan(array[row_index, 2]))
         self.assertEqual(matrix.Array.shape[1], num_columns)
 
+    def test_matrix_add_column_ring_buffer(self):
+        matrix = bspump.matrix.TimeWindowMatrix(
+            app=self.App, resolution=1, columns=3, clock_driven=False
+        )
+        row_index = matrix.add_row("abc")
+        array = matrix.Array
+        matrix.Array[row_index, :] = [4, 5, 6]
+
+        matrix.add_column()
+        matrix.add_column()
+
+        # The array is not reallocated, the oldest columns are reused in place
+        self.assertIs(matrix.Array, array)
+        self.assertEqual(matrix.TimeConfig.get_head(), 2)
+
+        newest = matrix.get_column(matrix.TimeConfig.get_start() - 0.5)
+        self.assertEqual(newest, 1)
+        matrix.Array[row_index, newest] = 8
+
+        np.testing.assert_array_equal(matrix.get_array()[row_index], [6, np.nan, 8])
+
+    def test_matrix_add_rows(self):
+        matrix = bspump.matrix.TimeWindowMatrix(
+            app=self.App,
+            columns=3,
+            clock_driven=False,
+            config={"max_closed_rows_capacity": 1},
+        )
+        indexes = matrix.add_rows(["a", "b", "c", "d"])
+        self.assertEqual(indexes.tolist(), [0, 1, 2, 3])
+        self.assertEqual(matrix.Array.shape[0], len(matrix.WarmingUpCount))
+        matrix.Array[indexes, 0] = [1, 2, 3, 4]
+
+        matrix.close_row("b")
+        self.assertIn(1, matrix.ClosedRows)
+
+        # The closed row is reused first
+        self.assertEqual(matrix.add_rows(["e"]).tolist(), [1])
+        matrix.Array[1, 0] = 5
+
+        matrix.close_row("a")
+        matrix.flush()
+        for name, value in (("c", 3), ("d", 4), ("e", 5)):
+            self.assertEqual(matrix.Array[matrix.get_row_index(name), 0], value)
+
+    def test_matrix_incremental_compaction(self):
+        matrix = bspump.matrix.TimeWindowMatrix(
+            app=self.App,
+            columns=3,
+            clock_driven=False,
+            config={"compaction": "incremental", "compaction_rows": 2},
+        )
+        names = [str(i) for i in range(30)]
+        indexes = matrix.add_rows(names)
+        matrix.Array[indexes, 0] = np.arange(30)
+
+        for i in range(0, 10):
+            matrix.close_row(str(i))
+
+        # Closing rows doesn't rebuild the matrix
+        self.assertTrue(matrix.Compacting)
+        self.assertEqual(matrix.Array.shape[0], 30)
+
+        self.assertFalse(matrix.compact(2))
+        self.assertAlmostEqual(
+            matrix.Gauge._field["values"]["compaction.progress"], 0.2
+        )
+
+        while matrix.Compacting:
+            matrix.compact(2)
+
+        self.assertEqual(matrix.Array.shape[0], 20)
+        self.assertEqual(len(matrix.WarmingUpCount), 20)
+        self.assertEqual(len(matrix.ClosedRows), 0)
+        for i in range(10, 30):
+            self.assertEqual(matrix.Array[matrix.get_row_index(str(i)), 0], i)
+
     def test_matrix_add_row(self):
         matrix = bspump.matrix.TimeWindowMatrix(
             app=self.App, columns=3, clock_driven=False
@@ -94,3 +174,28 @@ class TestTimeWindowMatrix(bspump.unittest.TestCase):
         target_ts = matrix.TimeConfig.get_start() + 0.5 * matrix.Resolution
         added = matrix.advance(target_ts)
         self.assertGreater(added, 0)
+
+    def test_matrix_add_many(self):
+        matrix = bspump.matrix.TimeWindowMatrix(
+            app=self.App, resolution=1, columns=5, clock_driven=False
+        )
+        end = matrix.TimeConfig.get_end()
+
+        written = matrix.add_many(
+            ["a", "a", "b", "b", "a"],
+            [end + 0.5, end + 0.5, end + 1.5, end - 1, end + 100],
+            [1, 2, 3, 4, 5],
+            op="add",
+        )
+        self.assertEqual(written, 3)
+
+        a = matrix.get_row_index("a")
+        b = matrix.get_row_index("b")
+        self.assertEqual(matrix.Array[a, 0], 3)
+        self.assertEqual(matrix.Array[b, 1], 3)
+
+        matrix.add_many(["a", "a"], [end + 0.5, end + 0.5], [10, 4], op="max")
+        self.assertEqual(matrix.Array[a, 0], 10)
+
+        matrix.add_many(["b"], [end + 1.5], [7], op="set")
+        self.assertEqual(matrix.Array[b, 1], 7)
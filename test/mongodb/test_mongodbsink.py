@@ -0,0 +1,98 @@
+import asyncio
+
+import bson
+import pymongo.errors
+
+import bspump
+import bspump.unittest
+from bspump.abc.connection import Connection
+from bspump.mongodb import MongoDBSink
+
+
+class FakeCollection(object):
+    def __init__(self, name, inserts):
+        self.name = name
+        self.Inserts = inserts
+
+    async def insert_many(self, documents, ordered=True):
+        await asyncio.sleep(0.01)
+        documents = [bson.decode(document.raw) for document in documents]
+        self.Inserts.append((self.name, ordered, documents))
+        failed = [i for i, document in enumerate(documents) if document.get("fail")]
+        if len(failed) > 0:
+            raise pymongo.errors.BulkWriteError(
+                {
+                    "nInserted": len(documents) - len(failed),
+                    "writeErrors": [
+                        {"index": i, "errmsg": "duplicate"} for i in failed
+                    ],
+                }
+            )
+
+
+class FakeConnection(Connection):
+    def __init__(self, app):
+        super().__init__(app, "FakeMongoDBConnection")
+        self.Database = "db"
+        self.Inserts = []
+        self.Client = {"db": self}
+
+    def __getitem__(self, name):
+        return FakeCollection(name, self.Inserts)
+
+
+class TestMongoDBSink(bspump.unittest.TestCase):
+    def execute(self, events, **config):
+        connection = FakeConnection(self.App)
+        pipeline = bspump.Pipeline(self.App, "MongoDBPipeline")
+        sink = MongoDBSink(self.App, pipeline, connection, config=config)
+
+        async def run():
+            for context, event in events:
+                sink.process(context, event)
+            sink._on_application_stop("Application.stop!", 1)
+            await sink._conn_future
+
+        self.App.Loop.run_until_complete(run())
+        return connection.Inserts, sink
+
+    def test_batches(self):
+        events = [({}, {"n": i}) for i in range(5)]
+        events.append(({"collection": "other"}, [{"n": 5}, {"n": 6}]))
+        inserts, sink = self.execute(events, bulk_max_size=2)
+
+        batches = [(name, [d["n"] for d in documents]) for name, _, documents in inserts]
+        self.assertEqual(
+            sorted(batches),
+            [
+                ("collection", [0, 1]),
+                ("collection", [2, 3]),
+                ("collection", [4]),
+                ("other", [5, 6]),
+            ],
+        )
+        self.assertTrue(all(ordered is False for _, ordered, _ in inserts))
+        self.assertEqual(len(sink.InFlight), 0)
+
+    def test_partial_failure(self):
+        events = [({}, {"n": 0}), ({}, {"n": 1, "fail": True}), ({}, {"n": 2})]
+        inserts, sink = self.execute(events)
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(sink.InsertMetric._actuals["ok"], 2)
+        self.assertEqual(sink.InsertMetric._actuals["fail"], 1)
+
+    def test_linger(self):
+        connection = FakeConnection(self.App)
+        pipeline = bspump.Pipeline(self.App, "MongoDBPipeline")
+        sink = MongoDBSink(
+            self.App, pipeline, connection, config={"bulk_linger": 0.05}
+        )
+
+        async def run():
+            sink.process({}, {"n": 0})
+            await asyncio.sleep(0.2)
+            self.assertEqual(len(connection.Inserts), 1)
+            sink._on_application_stop("Application.stop!", 1)
+            await sink._conn_future
+
+        self.App.Loop.run_until_complete(run())
@@ -0,0 +1 @@
+from .test_parquetsink import *
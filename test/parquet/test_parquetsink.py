@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+
+import pyarrow.parquet as pq
+
+import bspump
+import bspump.unittest
+from bspump.parquet import ParquetSink
+
+
+class TestParquetSink(bspump.unittest.TestCase):
+    def create_sink(self, directory, **config):
+        config["file_name_template"] = os.path.join(directory, "sink{index}.parquet")
+        pipeline = bspump.Pipeline(self.App, "ParquetPipeline")
+        return ParquetSink(self.App, pipeline, config=config)
+
+    def test_schema(self):
+        with tempfile.TemporaryDirectory() as directory:
+            schema = os.path.join(directory, "schema.json")
+            with open(schema, "w") as f:
+                json.dump({"name": {"type": "string"}, "age": {"type": "int"}}, f)
+
+            sink = self.create_sink(
+                directory, schema_file=schema, rows_in_chunk=2, rows_per_file=4
+            )
+            events = [
+                {"name": "a", "age": "1"},
+                {"name": 2},
+                {"name": "c", "age": 3, "extra": True},
+                {"name": "d", "age": 4.0},
+            ]
+            for event in events:
+                sink.process(None, event)
+
+            path = os.path.join(directory, "sink0000.parquet")
+            table = pq.read_table(path)
+            self.assertEqual(pq.ParquetFile(path).num_row_groups, 2)
+
+        self.assertEqual(str(table.schema.field("age").type), "int64")
+        self.assertEqual(
+            table.to_pylist(),
+            [
+                {"name": "a", "age": 1},
+                {"name": "2", "age": None},
+                {"name": "c", "age": 3},
+                {"name": "d", "age": 4},
+            ],
+        )
+        self.assertEqual(sink.NewSet, {"extra"})
+
+    def test_schemaless(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sink = self.create_sink(directory, rows_in_chunk=2, rows_per_file=4)
+            for event in [{"a": 1}, {"b": "x"}, {"a": 3, "c": 1.5}, {"b": "y"}]:
+                sink.process(None, event)
+
+            table = pq.read_table(os.path.join(directory, "sink0000.parquet"))
+
+        self.assertEqual(
+            table.to_pylist(),
+            [
+                {"a": 1, "b": None},
+                {"a": None, "b": "x"},
+                {"a": 3, "b": None},
+                {"a": None, "b": "y"},
+            ],
+        )
+        self.assertEqual(sink.NewSet, {"c"})
+
+    def test_time_rollover_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sink = self.create_sink(
+                directory, rows_in_chunk=2, rollover_mechanism="time"
+            )
+            for n in range(5):
+                sink.process(None, {"n": n})
+            # Full chunks are written before the file is rotated by the timer
+            self.assertEqual(sink.RowCount, 1)
+            sink.rotate()
+            sink._writing_timer.stop()
+
+            path = os.path.join(directory, "sink0000.parquet")
+            self.assertEqual(pq.ParquetFile(path).num_row_groups, 3)
+            table = pq.read_table(path)
+
+        self.assertEqual(table.column("n").to_pylist(), [0, 1, 2, 3, 4])
@@ -0,0 +1,119 @@
+import bspump.unittest
+from bspump import Processor, Pipeline
+from bspump.abc.source import TriggerSource
+from bspump.trigger import PubSubTrigger
+from bspump.unittest import UnitTestSink
+
+
+class BatchUnitTestSource(TriggerSource):
+    def __init__(self, app, pipeline, id=None, config=None):
+        super().__init__(app, pipeline, id=id, config=config)
+        self.Input = []
+
+    async def cycle(self, *args, **kwags):
+        await self.process_batch(self.Input, context={"batch": True})
+
+
+class UpperProcessor(Processor):
+    def process(self, context, event):
+        if event == "error":
+            raise Exception()
+        if event == "drop":
+            return None
+        return event.upper()
+
+
+class BatchUpperProcessor(UpperProcessor):
+    def process_batch(self, context, events):
+        self.Batches = getattr(self, "Batches", 0) + 1
+        return [event.upper() for event in events if event != "drop"]
+
+
+class RecoveringProcessor(UpperProcessor):
+    def __init__(self, app, pipeline, id=None, config=None):
+        super().__init__(app, pipeline, id=id, config=config)
+        self.ReadyEvents = []
+
+    def process(self, context, event):
+        if event == "error":
+            # The error is cleared later, e.g. when the failing service recovers
+            self.Pipeline.Loop.call_later(
+                0.05, self.Pipeline.set_error, None, None, None
+            )
+        self.ReadyEvents.append((event, self.Pipeline.is_ready()))
+        return super().process(context, event)
+
+
+class BatchPipeline(Pipeline):
+    def __init__(self, app, processor, id=None, config=None):
+        super().__init__(app, id, config)
+        self.PubSub.subscribe("bspump.pipeline.cycle_end!", self._on_finished)
+        self.Source = BatchUnitTestSource(app, self).on(
+            PubSubTrigger(app, "Application.run!", app.PubSub)
+        )
+        self.Processor = processor(app, self)
+        self.Sink = UnitTestSink(app, self)
+        self.build(self.Source, self.Processor, self.Sink)
+
+    def handle_error(self, exception, context, event):
+        # Errors of the recovering processor stop the pipeline
+        return not isinstance(self.Processor, RecoveringProcessor)
+
+    def _on_finished(self, event_name, pipeline):
+        self.App.stop()
+
+
+class TestPipelineBatch(bspump.unittest.TestCase):
+    def execute(self, processor, events):
+        svc = self.App.get_service("bspump.PumpService")
+        self.Pipeline = BatchPipeline(self.App, processor)
+        self.Pipeline.Source.Input = events
+        svc.add_pipeline(self.Pipeline)
+        self.App.run()
+        return self.Pipeline.Sink.Output
+
+    def test_process_batch(self):
+        output = self.execute(UpperProcessor, ["a", "drop", "b"])
+        self.assertEqual([event for context, event in output], ["A", "B"])
+        self.assertTrue(all(context["batch"] for context, event in output))
+        self.assertEqual(self.Pipeline.Processor.EventCount, 3)
+
+    def test_process_batch_error_isolation(self):
+        output = self.execute(UpperProcessor, ["a", "error", "b"])
+        self.assertEqual([event for context, event in output], ["A", "B"])
+
+    def test_process_batch_error_deferral(self):
+        output = self.execute(RecoveringProcessor, ["a", "error", "b", "c"])
+        self.assertEqual([event for context, event in output], ["A", "B", "C"])
+        # The rest of the batch waits until the error is cleared
+        self.assertEqual(
+            self.Pipeline.Processor.ReadyEvents,
+            [("a", True), ("error", True), ("b", True), ("c", True)],
+        )
+        self.assertEqual(self.Pipeline.Processor.EventCount, 3)
+
+    def test_process_batch_override(self):
+        output = self.execute(BatchUpperProcessor, ["a", "drop", "b"])
+        self.assertEqual([event for context, event in output], ["A", "B"])
+        self.assertEqual(self.Pipeline.Processor.Batches, 1)
+
+
+class TestPipelineProfiler(bspump.unittest.ProcessorTestCase):
+    def test_profiler_flush(self):
+        self.set_up_processor(UpperProcessor)
+        self.Pipeline.Processor.Profiler.SamplingRate = 2
+        self.Pipeline.Processor.Profiler.Countdown = 2
+
+        output = self.execute([(None, "a"), (None, "b"), (None, "c"), (None, "d")])
+        self.assertEqual([event for context, event in output], ["A", "B", "C", "D"])
+
+        # The profiler is flushed into the metrics when the application exits
+        profiler = self.Pipeline.Processor.Profiler
+        self.assertEqual(profiler.Run, 0)
+
+        values = self.Pipeline.ProcessorsCounter["UpperProcessor"].Storage["fieldset"][0]["values"]
+        self.assertEqual(values["event.in"], 4)
+        self.assertEqual(values["event.out"], 4)
+        values = self.Pipeline.ProfilerCounter["UpperProcessor"].Storage["fieldset"][0]["values"]
+        self.assertEqual(values["run"], 4)
+        self.assertGreater(values["duration"], 0.0)